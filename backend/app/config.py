@@ -1,5 +1,6 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     """
@@ -11,16 +12,108 @@ class Settings(BaseSettings):
     openai_model: str = "gpt-4o"
     openai_temperature: float = 0.7
     
+    # Embedding Provider (openai | local)
+    # เปลี่ยน provider/โมเดลแล้วต้อง ingest ใหม่ เพราะขนาด vector ของ collection เปลี่ยน
+    embedding_provider: str = "openai"
+    openai_embedding_model: str = "text-embedding-ada-002"
+    local_embedding_model: str = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    local_embedding_device: str = "cpu"
+    local_embedding_backend: str = "torch"  # torch | onnx | openvino
+    local_embedding_batch_size: int = 32
+    local_embedding_threads: int = 2
+    
     # Qdrant Configuration
     qdrant_url: str = "http://localhost:6333"
     qdrant_collection_name: str = "tax_knowledge"
+    qdrant_prefer_grpc: bool = False  # True = ใช้ gRPC (port qdrant_grpc_port) แทน REST
+    qdrant_grpc_port: int = 6334
+    qdrant_timeout_seconds: int = 10
+    qdrant_pool_size: int = 32  # จำนวน HTTP connection สูงสุด (REST)
+    qdrant_keepalive_seconds: float = 30.0
+    qdrant_retry_initial_seconds: float = 1.0
+    qdrant_retry_max_seconds: float = 30.0
+    qdrant_health_check_interval_seconds: float = 15.0
+    qdrant_collection_info_ttl_seconds: float = 10.0
+
+    # Qdrant Collection Storage / Index (มีผลตอนสร้าง collection ยกเว้น search ef / rescore)
+    # วัดผลกับข้อมูลจริงด้วย scripts/benchmark_quantization.py ก่อนเปลี่ยนค่า
+    qdrant_quantization: str = "none"  # none | scalar (int8) | binary
+    qdrant_quantization_always_ram: bool = True  # เก็บ vector ที่ quantize แล้วไว้ใน RAM
+    qdrant_quantization_rescore: bool = True  # rescore ด้วย vector เต็มหลังค้นด้วย vector ที่ quantize
+    qdrant_quantization_oversampling: float = 2.0
+    qdrant_on_disk_vectors: bool = False  # เก็บ vector เต็มบนดิสก์ (memmap) ลด RAM
+    qdrant_on_disk_payload: bool = False
+    qdrant_hnsw_m: int = 16
+    qdrant_hnsw_ef_construct: int = 100
+    qdrant_search_ef: Optional[int] = None  # None = ใช้ค่าของ Qdrant
     
     # RAG Configuration
     rag_top_k: int = 5
     rag_chunk_size: int = 1000
     rag_chunk_overlap: int = 200
+    hybrid_search_enabled: bool = True  # BM25 + vector (RRF) ถ้ามี lexical index จากการ ingest
+    hybrid_candidates: int = 20  # จำนวนผลของแต่ละวิธีก่อนนำมารวม
+    rrf_k: int = 60
+    lexical_index_path: str = "data/index/tax_knowledge_bm25.json"
+    # Context Assembly (MMR + รวม chunk ที่ซ้อนกัน + token budget)
+    context_mmr_enabled: bool = True
+    context_mmr_lambda: float = 0.7  # 1.0 = เน้นความเกี่ยวข้องอย่างเดียว
+    context_duplicate_threshold: float = 0.95  # cosine ที่ถือว่าเป็นเนื้อหาซ้ำ
+    context_token_budget: int = 1500
+    # ค้นหาล่วงหน้าต่อ (ช่วงรายได้, ความเสี่ยง) แทนการค้นหาทุก request (ใช้รายได้ตัวแทนของช่วง ไม่ใช่รายได้จริง)
+    # เปิดเมื่อ scripts/benchmark_precomputed_retrieval.py แสดง recall ที่ยอมรับได้กับข้อมูลจริง
+    rag_precompute_enabled: bool = False
+    # Multi-aspect Retrieval: query หลัก + query ย่อยต่อหมวดลดหย่อน/ประเภทเงินได้/ความเสี่ยง (ค้นหาใน batch เดียว)
+    # ปิดไว้ก่อน (opt-in): เพิ่ม embedding และการค้นหา Qdrant ต่อ request
+    multi_aspect_enabled: bool = False
+    multi_aspect_max_queries: int = 6  # รวม query หลัก
+    multi_aspect_k_per_query: int = 3  # จำนวนเอกสารที่ใช้จากแต่ละ query ย่อย
+    multi_aspect_max_docs: int = 10
+    
+    # Local Vector Index (snapshot ของ collection แบบ memory-mapped)
+    local_index_mode: str = "fallback"  # off | fallback (ใช้เมื่อ Qdrant ล่ม) | primary (ไม่ค้นหาผ่าน Qdrant)
+    local_index_path: str = "data/index/tax_knowledge"
+    local_index_use_hnsw: bool = False  # ต้องติดตั้ง hnswlib
+    
+    # Ingestion (scripts/ingest_data.py)
+    ingest_manifest_path: str = "data/index/ingest_manifest.json"  # chunk ที่ ingest แล้ว (ใช้ทำ incremental)
+    ingest_queue_size: int = 256  # จำนวนเอกสาร/chunk สูงสุดที่ค้างระหว่างขั้น load → split → embed
+    ingest_pdf_workers: int = 0  # จำนวน process สำหรับดึงข้อความ PDF (0 = จำนวน CPU)
+    pdf_text_cache_dir: str = "data/cache/pdf_text"  # ข้อความรายหน้าที่ดึงแล้ว ตาม hash ของไฟล์ (ว่าง = ไม่ cache)
+    ingest_embedding_batch_size: int = 64  # chunk ต่อการเรียก embedding API หนึ่งครั้ง
+    ingest_embedding_concurrency: int = 4  # จำนวน batch ที่ embed พร้อมกัน
+    ingest_embedding_tokens_per_minute: int = 1000000  # ตาม rate limit ของบัญชี OpenAI (0 = ไม่จำกัด)
+    ingest_checkpoint_path: str = "data/cache/ingest_checkpoint.sqlite3"  # vector ที่ embed แล้วแต่ยังไม่จบรอบ (ว่าง = ไม่ใช้)
+    
+    # Embedding Cache (query embedding: LRU ในหน่วยความจำ + SQLite บนดิสก์)
+    embedding_cache_enabled: bool = True
+    embedding_cache_max_entries: int = 4096
+    embedding_cache_path: str = "data/cache/embeddings.sqlite3"  # ว่าง = ไม่ใช้ชั้นดิสก์
+    
+    # Response Cache (/api/calculate-tax)
+    response_cache_enabled: bool = True
+    response_cache_backend: str = "memory"  # memory | sqlite
+    response_cache_max_entries: int = 1024
+    response_cache_ttl_seconds: int = 3600
+    response_cache_sqlite_path: str = "data/cache/response_cache.sqlite3"
+    
+    # Semantic Plan Cache (ใช้แผนจาก LLM ของโปรไฟล์ที่ใกล้เคียงกันซ้ำ ตัวเลขยังคำนวณใหม่ทุก request)
+    semantic_cache_enabled: bool = True
+    semantic_cache_max_distance: float = 0.03  # ระยะ L2 ของ feature vector (ดู semantic_cache.request_features)
+    semantic_cache_max_entries: int = 2048
+    semantic_cache_ttl_seconds: int = 3600
+    
+    # Batch API (/api/calculate-tax/batch)
+    batch_max_items: int = 500
+    batch_llm_concurrency: int = 8
+    
+    # LLM Admission Control (จำกัดจำนวน call ไป OpenAI พร้อมกัน)
+    llm_max_concurrency: int = 16
+    llm_max_queue: int = 64
+    llm_max_queue_wait_seconds: float = 10.0
     
     # Application Settings
+    ready_requires_rag: bool = False  # True = /ready ตอบ 503 จนกว่า Qdrant จะพร้อม
     app_name: str = "AI Tax Advisor"
     app_version: str = "1.0.0"
     debug_mode: bool = False
@@ -3,19 +3,115 @@ FastAPI Main Application
 Version: Qdrant Support
 """
 
-from fastapi import FastAPI, HTTPException
+import os
+import time
+
+# ⏱️ จุดเริ่มวัดเวลา import (ก่อน import dependency ที่หนัก)
+_IMPORT_STARTED = time.perf_counter()
+
+
+def _process_started_at() -> float:
+    """
+    เวลาที่ process เริ่มทำงาน (epoch) สำหรับวัด cold start ตั้งแต่ start process
+
+    อ่าน starttime จาก /proc/self/stat (tick นับจาก boot) เทียบกับ CLOCK_BOOTTIME
+    ถ้าไม่ใช่ Linux ใช้เวลาที่เริ่ม import app.main แทน (ไม่รวมเวลาเริ่ม interpreter/uvicorn)
+    """
+    try:
+        with open("/proc/self/stat") as f:
+            # field ที่ 22 (starttime) นับหลังชื่อ process ในวงเล็บ ซึ่งอาจมีช่องว่าง
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        age = time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+        return time.time() - age
+    except (OSError, ValueError, IndexError, AttributeError):
+        return time.time()
+
+
+PROCESS_STARTED_AT = _process_started_at()
+
+import asyncio
+import json
+from contextlib import asynccontextmanager, suppress
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import ValidationError
 
-from app.models import TaxCalculationRequest, TaxCalculationResponse
+from app.models import (
+    TaxCalculationRequest,
+    TaxCalculationResult,
+    TaxCalculationResponse,
+    BatchTaxCalculationItem,
+    BatchTaxCalculationResponse,
+    InvestmentTierSaving,
+    TaxOnlyResponse
+)
 from app.services.tax_calculator import tax_calculator_service
 from app.services.rag_service import RAGService
 from app.services.ai_service import AIService
+from app.services.precomputed_retrieval import build_retrieval_query
+from app.services.aspect_queries import build_aspect_queries, merge_aspect_results
+from app.services.context_builder import assemble_context, warm_up_tokenizer
+from app.services.cache_service import create_response_cache, canonical_request_key
+from app.services.semantic_cache import create_semantic_cache
+from app.services.singleflight import SingleFlight
+from app.services.admission import AdmissionRejected
 from app.config import settings
+from app.metrics import stage_timer, render_metrics, RAG_FAILURES
+
+# Services สร้างแบบไม่เชื่อมต่อเครือข่าย (เชื่อมต่อ Qdrant ใน background ผ่าน lifespan)
+rag_service = RAGService(auto_connect=False)
+ai_service = AIService()
+response_cache = create_response_cache()
+semantic_cache = create_semantic_cache()
+plan_flights = SingleFlight()
+
+startup_state = {
+    "ready": False,
+    "import_seconds": round(time.perf_counter() - _IMPORT_STARTED, 4),
+    "startup_seconds": None
+}
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """เริ่ม/หยุด background tasks ของ services"""
+    print("=" * 50)
+    print("🚀 Initializing AI Tax Advisor API")
+    print("=" * 50)
+
+    # เชื่อมต่อ Qdrant ใน background พร้อม retry/reconnect (ไม่บล็อกการ boot)
+    rag_monitor = asyncio.create_task(rag_service.run_connection_monitor())
+    # อัปเดตข้อมูล collection ใน background เพื่อให้ /health ไม่ต้องเรียก Qdrant
+    collection_info_refresher = asyncio.create_task(rag_service.run_collection_info_refresher())
+    # โหลด tokenizer สำหรับนับ token ของ context ใน thread แยก
+    tokenizer_warm_up = asyncio.create_task(asyncio.to_thread(warm_up_tokenizer))
+
+    startup_state["startup_seconds"] = round(time.time() - PROCESS_STARTED_AT, 4)
+    startup_state["ready"] = True
+
+    print("=" * 50)
+    print(f"✅ Initialization complete (cold start {startup_state['startup_seconds'] * 1000:.0f} ms, "
+          f"imports {startup_state['import_seconds'] * 1000:.0f} ms)")
+    print("=" * 50)
+
+    yield
+
+    startup_state["ready"] = False
+    for task in (rag_monitor, collection_info_refresher, tokenizer_warm_up):
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+    await rag_service.close()
+
 
 app = FastAPI(
     title="AI Tax Advisor API",
     description="ระบบแนะนำการวางแผนภาษีด้วย AI + Qdrant RAG",
-    version="3.2-qdrant"
+    version="3.2-qdrant",
+    lifespan=lifespan
 )
 
 app.add_middleware(
@@ -26,17 +122,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize services
-print("=" * 50)
-print("🚀 Initializing AI Tax Advisor API")
-print("=" * 50)
-
-rag_service = RAGService()
-ai_service = AIService()
 
-print("=" * 50)
-print("✅ Initialization complete")
-print("=" * 50)
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected_handler(request, exc: AdmissionRejected):
+    """LLM คิวเต็ม (429) หรือรอนานเกินไป (503) → ให้ client retry ภายหลัง"""
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc), "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
 
 
 @app.get("/")
@@ -55,16 +149,292 @@ async def root():
 
 @app.get("/health")
 async def health_check():
-    """Health check with Qdrant status"""
+    """Health check with Qdrant status (ข้อมูล collection มาจาก cache ที่ refresh ใน background)"""
     qdrant_info = rag_service.get_collection_info()
     
     return {
         "status": "healthy",
         "qdrant": qdrant_info,
-        "rag_available": rag_service.is_available()
+        "rag_available": rag_service.is_available(),
+        "local_index": rag_service.local_index.stats() if rag_service.local_index else {"status": "not_loaded"},
+        "lexical_index": rag_service.lexical_index.stats() if rag_service.lexical_index else {"status": "not_loaded"},
+        "precomputed_retrieval": (
+            rag_service.precomputed.stats() if rag_service.precomputed else {"status": "disabled"}
+        ),
+        "response_cache": response_cache.stats() if response_cache else {"status": "disabled"},
+        "semantic_cache": semantic_cache.stats() if semantic_cache else {"status": "disabled"},
+        "embedding_cache": (
+            rag_service.embedding_cache.stats() if rag_service.embedding_cache else {"status": "disabled"}
+        ),
+        "coalescing": plan_flights.stats(),
+        "llm_admission": ai_service.admission.stats()
     }
 
 
+NO_RAG_CONTEXT = "ไม่มีข้อมูลจาก RAG"
+
+
+def _build_rag_query(request: TaxCalculationRequest) -> str:
+    """สร้าง query สำหรับค้นหาเอกสารจาก Qdrant"""
+    return build_retrieval_query(request.gross_income, request.risk_tolerance)
+
+
+def _build_context(retrieved_docs: list) -> str:
+    """รวมเนื้อหาเอกสารเป็น context สำหรับ prompt"""
+    if not retrieved_docs:
+        print("⚠️ RAG: No documents retrieved")
+        return NO_RAG_CONTEXT
+
+    # MMR + รวม chunk ที่ซ้อนกัน + ตัดตาม token budget (ไม่จ่าย token ซ้ำจาก chunk_overlap)
+    with stage_timer("context_assembly"):
+        context = assemble_context(retrieved_docs)
+    if not context:
+        return NO_RAG_CONTEXT
+
+    print(f"✅ RAG Context: {len(context)} characters")
+    return context
+
+
+async def _retrieve_documents(request: TaxCalculationRequest) -> list:
+    """ดึงเอกสารจาก Qdrant RAG (คืน list ว่างถ้า RAG ใช้งานไม่ได้)"""
+    if not rag_service.is_available():
+        print("⚠️ RAG not available - using AI without context")
+        RAG_FAILURES.labels(reason="unavailable").inc()
+        return []
+
+    if settings.multi_aspect_enabled:
+        return (await _retrieve_documents_multi_aspect([request]))[0]
+
+    # ผลค้นหาที่คำนวณไว้ล่วงหน้าต่อ (ช่วงรายได้, ความเสี่ยง) → ไม่ต้อง embed/ค้นหา
+    precomputed = rag_service.lookup_precomputed(request.gross_income, request.risk_tolerance)
+    if precomputed is not None:
+        return precomputed
+
+    try:
+        return await rag_service.retrieve_relevant_documents(
+            _build_rag_query(request),
+            k=settings.rag_top_k
+        )
+    except Exception as e:
+        print(f"⚠️ RAG Error: {e}")
+        RAG_FAILURES.labels(reason="retrieval_error").inc()
+        return []
+
+
+async def _retrieve_documents_multi_aspect(requests: List[TaxCalculationRequest]) -> list:
+    """
+    ค้นหาหลายประเด็นต่อ request (query หลัก + หมวดลดหย่อน/ประเภทเงินได้/ความเสี่ยง)
+
+    query ของทุก request ถูก embed และค้นหาด้วย query_batch_points ครั้งเดียว
+    query หลักที่มีผลคำนวณไว้ล่วงหน้าจะไม่ถูกค้นซ้ำ
+    """
+    aspects = [build_aspect_queries(request) for request in requests]
+    bases = [
+        rag_service.lookup_precomputed(request.gross_income, request.risk_tolerance)
+        for request in requests
+    ]
+    live = [
+        queries[1:] if base is not None else queries
+        for queries, base in zip(aspects, bases)
+    ]
+
+    flat = [query for queries in live for query in queries]
+    found = await rag_service.retrieve_relevant_documents_batch(flat, k=settings.rag_top_k) if flat else []
+
+    merged = []
+    offset = 0
+    for queries, base in zip(live, bases):
+        results = found[offset:offset + len(queries)]
+        offset += len(queries)
+        if base is not None:
+            results = [base, *results]
+        merged.append(merge_aspect_results(results))
+    print(f"🧭 Multi-aspect retrieval: {len(flat)} queries for {len(requests)} request(s) → "
+          f"{[len(docs) for docs in merged]} documents")
+    return merged
+
+
+def _build_sources(retrieved_docs: list) -> list:
+    """สรุปแหล่งที่มาของเอกสาร RAG สำหรับส่งให้ frontend"""
+    return [
+        {
+            "source": doc.metadata.get("source", "unknown"),
+            "page": doc.metadata.get("page"),
+            "snippet": doc.page_content[:200]
+        }
+        for doc in retrieved_docs
+    ]
+
+
+def _get_semantic_plans(request: TaxCalculationRequest, tax_result: TaxCalculationResult) -> Optional[dict]:
+    """
+    แผนจาก semantic cache ที่ตรวจวงเงินตามกฎหมายใหม่กับ tax_result ของ request นี้ (หรือ None)
+
+    แผนถูกเก็บจากโปรไฟล์อื่นในกลุ่มเดียวกัน วงเงินที่ขึ้นกับรายได้ (เช่น ประกันบำนาญ
+    min(200,000, 15% ของรายได้)) จึงอาจเกินสำหรับ request นี้ revalidate_plans แก้ให้อัตโนมัติ
+    """
+    if not semantic_cache:
+        return None
+    cached_plans = semantic_cache.get(request)
+    if cached_plans is None:
+        return None
+    return ai_service.revalidate_plans(cached_plans, tax_result)
+
+
+async def _generate_plans(request: TaxCalculationRequest, tax_result: TaxCalculationResult) -> dict:
+    """ขั้นตอน RAG + LLM (ผลลัพธ์ขึ้นกับ request เท่านั้น จึงรวม request ที่เหมือนกันได้)"""
+    # แผนของโปรไฟล์ที่ใกล้เคียงกัน → ไม่ต้องค้นหา/เรียก LLM (ตัวเลขคำนวณใหม่ใน _apply_plan_calculations)
+    cached_plans = _get_semantic_plans(request, tax_result)
+    if cached_plans is not None:
+        return cached_plans
+
+    # ดึงข้อมูลจาก Qdrant RAG
+    context = _build_context(await _retrieve_documents(request))
+
+    # เรียก AI เพื่อสร้างหลายแผน (จะได้แผนที่มีแค่ percentage)
+    investment_plans = await ai_service.generate_recommendations(request, tax_result, context)
+    if semantic_cache and not investment_plans.get("is_fallback"):
+        semantic_cache.set(request, investment_plans)
+    return investment_plans
+
+
+def _apply_plan_amounts(
+    plan: dict,
+    idx: int,
+    tiers: List[int],
+    tax_result: TaxCalculationResult
+) -> dict:
+    """
+    คำนวณตัวเลขของแผนที่ idx ด้วย Python เพื่อความแม่นยำ 100%
+    บังคับใช้ tier ของเงินลงทุน และคำนวณ tax saving แบบ Multi-Bracket
+    """
+    # 🎯 บังคับใช้ total_investment ตาม tier (ไม่ใช้ค่าจาก AI)
+    if idx < len(tiers):
+        total_investment = tiers[idx]
+        plan["total_investment"] = total_investment  # Override AI's value
+    else:
+        total_investment = plan.get("total_investment", 0)
+
+    # 🔧 คำนวณ tax saving อย่างถูกต้องตามหลักภาษี Progressive Tax
+    # Tax Saving = (ภาษีโดยไม่ลงทุน) - (ภาษีถ้าลงทุน)
+    # ✅ ใช้ calculate_tax_saving_accurate() แบบ Multi-Bracket (ไม่ใช่ Simple Marginal Rate!)
+    calculated_total_tax_saving = tax_calculator_service.calculate_tax_saving_accurate(
+        taxable_base=tax_result.taxable_income,
+        investment=total_investment
+    )
+
+    # แจกจ่าย tax saving ให้แต่ละ allocation ตามสัดส่วน
+    for alloc in plan.get("allocations", []):
+        percentage = alloc.get("percentage", 0)
+
+        # คำนวณ investment_amount จาก percentage
+        investment_amount = int((percentage / 100) * total_investment)
+        alloc["investment_amount"] = investment_amount
+
+        # แจกจ่าย tax_saving ตามสัดส่วน percentage
+        tax_saving = int((percentage / 100) * calculated_total_tax_saving)
+        alloc["tax_saving"] = tax_saving
+
+    # อัปเดต total_tax_saving ของแผนให้ถูกต้องตามที่คำนวณได้จริง
+    plan["total_tax_saving"] = calculated_total_tax_saving
+    return plan
+
+
+def _apply_plan_calculations(investment_plans: dict, tax_result: TaxCalculationResult) -> dict:
+    """คำนวณตัวเลขของทุกแผนที่ AI ส่งมา (ดู _apply_plan_amounts)"""
+    print("🤖 Calculating exact investment amounts and tax savings...")
+
+    # กำหนด tiers ตามรายได้ (ต้องตรงกับ AI service)
+    tiers = tax_calculator_service.get_investment_tiers(tax_result.gross_income)
+
+    # วนลูปทุกแผนที่ AI ส่งมา และบังคับใช้ tier values
+    for idx, plan in enumerate(investment_plans.get("plans", [])):
+        _apply_plan_amounts(plan, idx, tiers, tax_result)
+
+    print("✅ Calculation complete.")
+    return investment_plans
+
+
+def _sse_event(event: str, data) -> str:
+    """จัดรูปแบบข้อความ Server-Sent Events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe (แยกจาก /health ที่เป็น liveness)
+    
+    พร้อมเมื่อ lifespan startup เสร็จ และ (ถ้าตั้ง ready_requires_rag) Qdrant เชื่อมต่อแล้ว
+    """
+    rag_available = rag_service.is_available()
+    ready = startup_state["ready"] and (rag_available or not settings.ready_requires_rag)
+    rag_connect_seconds = (
+        round(rag_service.first_connected_at - PROCESS_STARTED_AT, 4)
+        if rag_service.first_connected_at else None
+    )
+
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "rag_available": rag_available,
+            "cold_start": {
+                "import_seconds": startup_state["import_seconds"],
+                "startup_seconds": startup_state["startup_seconds"],
+                "rag_connect_seconds": rag_connect_seconds
+            }
+        }
+    )
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics (latency แยกตามขั้นตอน, fallback, RAG failures)"""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+
+@app.post("/api/tax", response_model=TaxOnlyResponse)
+async def calculate_tax_only(request: TaxCalculationRequest, response: Response) -> TaxOnlyResponse:
+    """
+    คำนวณภาษีอย่างเดียว (ไม่เรียก RAG/LLM) สำหรับให้ UI คำนวณสดระหว่างพิมพ์
+    
+    คืนผลภาษี รายละเอียดการคำนวณ (รวมการเทียบวิธีที่ 1/2) และภาษีที่ประหยัดได้ของ tier เงินลงทุน
+    """
+    started = time.perf_counter()
+    try:
+        with stage_timer("tax_calculation"):
+            breakdown = tax_calculator_service.calculate_tax_breakdown(request)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    investment_tiers = [
+        InvestmentTierSaving(
+            total_investment=tier,
+            tax_saving=tax_calculator_service.calculate_tax_saving_accurate(
+                taxable_base=breakdown.taxable_income,
+                investment=tier
+            )
+        )
+        for tier in tax_calculator_service.get_investment_tiers(breakdown.gross_income)
+    ]
+
+    result = TaxOnlyResponse(
+        tax_result=TaxCalculationResult(
+            gross_income=breakdown.gross_income,
+            taxable_income=breakdown.taxable_income,
+            tax_amount=breakdown.tax_amount,
+            effective_tax_rate=breakdown.effective_tax_rate
+        ),
+        breakdown=breakdown,
+        marginal_tax_rate=tax_calculator_service.get_marginal_tax_rate(breakdown.taxable_income),
+        investment_tiers=investment_tiers
+    )
+    response.headers["Server-Timing"] = f"calc;dur={(time.perf_counter() - started) * 1000:.3f}"
+    return result
+
+
 @app.post("/api/calculate-tax", response_model=TaxCalculationResponse)
 async def calculate_tax_with_multiple_plans(
     request: TaxCalculationRequest
@@ -72,106 +442,43 @@ async def calculate_tax_with_multiple_plans(
     """
     คำนวณภาษีและรับแผนการลงทุนหลายแผน
     """
+    # 0. ตรวจ cache ก่อน (request เดียวกัน → คืน JSON เดิมทันที ไม่ต้อง embed/search/LLM)
+    request_key = canonical_request_key(request)
+    if response_cache:
+        cached = response_cache.get(request_key)
+        if cached is not None:
+            return Response(content=cached, media_type="application/json", headers={"X-Cache": "HIT"})
+
     try:
         # 1. คำนวณภาษี
-        tax_result = tax_calculator_service.calculate_tax(request)
-
-        # 2. ดึงข้อมูลจาก Qdrant RAG (ส่วนนี้เหมือนเดิม)
-        context = "ไม่มีข้อมูลจาก RAG"
-        if rag_service.is_available():
-            query = f"""
-            รายได้ {request.gross_income} บาท
-            ระดับความเสี่ยง {request.risk_tolerance}
-            ต้องการวางแผนภาษีและลงทุน
-            มีครอบครัว บุตร บิดามารดา
-            """
-            try:
-                retrieved_docs = await rag_service.retrieve_relevant_documents(
-                    query,
-                    k=settings.rag_top_k
-                )
-                if retrieved_docs:
-                    context_parts = [doc.page_content for doc in retrieved_docs if hasattr(doc, 'page_content')]
-                    if context_parts:
-                        context = "\n\n".join(context_parts)
-                        print(f"✅ RAG Context: {len(context)} characters")
-                else:
-                    print("⚠️ RAG: No documents retrieved")
-            except Exception as e:
-                print(f"⚠️ RAG Error: {e}")
-        else:
-            print("⚠️ RAG not available - using AI without context")
-
-        # 3. เรียก AI เพื่อสร้างหลายแผน (จะได้แผนที่มีแค่ percentage)
-        investment_plans = await ai_service.generate_recommendations(
-            request, tax_result, context
-        )
+        with stage_timer("tax_calculation"):
+            tax_result = tax_calculator_service.calculate_tax(request)
 
-        # ✨ =================================================================
-        # ✨ ขั้นตอนที่ 4: คำนวณตัวเลขด้วย Python เพื่อความแม่นยำ 100%
-        # ✨ =================================================================
-        print("🤖 Calculating exact investment amounts and tax savings...")
-
-        # กำหนด tiers ตามรายได้ (ต้องตรงกับ AI service)
-        gross = tax_result.gross_income
-        if gross < 600000:
-            tiers = [40000, 60000, 80000]
-        elif gross < 1000000:
-            tiers = [60000, 100000, 150000]
-        elif gross < 1500000:
-            tiers = [200000, 350000, 500000]
-        elif gross < 2000000:
-            tiers = [300000, 500000, 800000]
-        elif gross < 3000000:
-            tiers = [500000, 800000, 1200000]
-        else:
-            tiers = [800000, 1200000, 1800000]
-
-        # 🔧 คำนวณ tax saving อย่างถูกต้องตามหลักภาษี Progressive Tax
-        # Tax Saving = ภาษีที่ลดได้จากการลงทุน
-        # = (ภาษีโดยไม่ลงทุน) - (ภาษีถ้าลงทุน)
-        # ✅ ใช้ Multi-Bracket Calculation (ไม่ใช่ Simple Marginal Rate!)
-
-        # วนลูปทุกแผนที่ AI ส่งมา และบังคับใช้ tier values
-        for idx, plan in enumerate(investment_plans.get("plans", [])):
-            # 🎯 บังคับใช้ total_investment ตาม tier (ไม่ใช้ค่าจาก AI)
-            if idx < len(tiers):
-                total_investment = tiers[idx]
-                plan["total_investment"] = total_investment  # Override AI's value
-            else:
-                total_investment = plan.get("total_investment", 0)
-
-            # ✅ คำนวณ total tax saving ของแผนทั้งหมดอย่างถูกต้อง
-            # ใช้ฟังก์ชัน calculate_tax_saving_accurate() ที่คำนวณแบบ Multi-Bracket
-            calculated_total_tax_saving = tax_calculator_service.calculate_tax_saving_accurate(
-                taxable_base=tax_result.taxable_income,
-                investment=total_investment
-            )
-
-            # แจกจ่าย tax saving ให้แต่ละ allocation ตามสัดส่วน
-            for alloc in plan.get("allocations", []):
-                percentage = alloc.get("percentage", 0)
-
-                # คำนวณ investment_amount จาก percentage
-                investment_amount = int((percentage / 100) * total_investment)
-                alloc["investment_amount"] = investment_amount
-
-                # แจกจ่าย tax_saving ตามสัดส่วน percentage
-                tax_saving = int((percentage / 100) * calculated_total_tax_saving)
-                alloc["tax_saving"] = tax_saving
-
-            # อัปเดต total_tax_saving ของแผนให้ถูกต้องตามที่คำนวณได้จริง
-            plan["total_tax_saving"] = calculated_total_tax_saving
+        # 2-3. RAG + AI (request ที่เหมือนกันและกำลังทำงานอยู่จะใช้ผลลัพธ์ร่วมกัน)
+        investment_plans = await plan_flights.do(
+            request_key,
+            lambda: _generate_plans(request, tax_result)
+        )
 
-        print("✅ Calculation complete.")
-        # ✨ =================================================================
+        # 4. คำนวณตัวเลขด้วย Python เพื่อความแม่นยำ 100%
+        with stage_timer("post_processing"):
+            investment_plans = _apply_plan_calculations(investment_plans, tax_result)
 
         # 5. Return response (ตอนนี้จะมีตัวเลขที่ถูกต้องครบถ้วนแล้ว)
-        return TaxCalculationResponse(
+        response = TaxCalculationResponse(
             tax_result=tax_result,
             investment_plans=investment_plans
         )
 
+        # เก็บลง cache เฉพาะคำตอบจาก AI จริง (ไม่ cache แผนสำรอง)
+        if response_cache and not investment_plans.get("is_fallback"):
+            response_cache.set(request_key, response.model_dump_json())
+
+        return response
+
+    except AdmissionRejected:
+        raise
+
     except Exception as e:
         print(f"❌ Error: {e}")
         import traceback
@@ -179,6 +486,231 @@ async def calculate_tax_with_multiple_plans(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/api/calculate-tax/stream")
+async def calculate_tax_stream(request: TaxCalculationRequest) -> StreamingResponse:
+    """
+    คำนวณภาษีและแผนการลงทุนแบบ Server-Sent Events
+    
+    ลำดับ event:
+    - tax_result: ผลคำนวณภาษี (ส่งทันที)
+    - sources: แหล่งที่มาจาก RAG
+    - plan: แต่ละแผน (ส่งทันทีที่ LLM สร้างแผนนั้นเสร็จ พร้อมตัวเลขที่คำนวณแล้ว)
+    - done: สรุปจำนวนแผน
+    - error: เมื่อเกิดข้อผิดพลาดระหว่าง stream
+    """
+    try:
+        with stage_timer("tax_calculation"):
+            tax_result = tax_calculator_service.calculate_tax(request)
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    cache_key = canonical_request_key(request) if response_cache else None
+    cached = response_cache.get(cache_key) if cache_key else None
+
+    async def event_stream():
+        yield _sse_event("tax_result", tax_result.model_dump())
+
+        # Cache hit → ส่งแผนที่เคยคำนวณไว้ทั้งหมดทันที
+        if cached is not None:
+            cached_plans = json.loads(cached)["investment_plans"]["plans"]
+            yield _sse_event("sources", [])
+            for idx, plan in enumerate(cached_plans):
+                yield _sse_event("plan", {"index": idx, "plan": plan, "is_fallback": False})
+            yield _sse_event("done", {"plans": len(cached_plans), "is_fallback": False, "cached": True})
+            return
+
+        try:
+            tiers = tax_calculator_service.get_investment_tiers(tax_result.gross_income)
+
+            # แผนของโปรไฟล์ที่ใกล้เคียงกัน → ส่งทันทีพร้อมตัวเลขที่คำนวณใหม่
+            semantic_plans = _get_semantic_plans(request, tax_result)
+            if semantic_plans is not None:
+                yield _sse_event("sources", [])
+                for idx, plan in enumerate(semantic_plans.get("plans", [])):
+                    with stage_timer("post_processing"):
+                        plan = _apply_plan_amounts(plan, idx, tiers, tax_result)
+                    yield _sse_event("plan", {"index": idx, "plan": plan, "is_fallback": False})
+                yield _sse_event("done", {
+                    "plans": len(semantic_plans.get("plans", [])),
+                    "is_fallback": False,
+                    "cached": "semantic"
+                })
+                return
+
+            retrieved_docs = await _retrieve_documents(request)
+            yield _sse_event("sources", _build_sources(retrieved_docs))
+
+            plans = []
+            used_fallback = False
+            async for plan, is_fallback in ai_service.stream_recommendations(
+                request, tax_result, _build_context(retrieved_docs)
+            ):
+                with stage_timer("post_processing"):
+                    plan = _apply_plan_amounts(plan, len(plans), tiers, tax_result)
+                used_fallback = used_fallback or is_fallback
+                yield _sse_event("plan", {"index": len(plans), "plan": plan, "is_fallback": is_fallback})
+                plans.append(plan)
+
+            if semantic_cache and not used_fallback:
+                semantic_cache.set(request, {"plans": plans})
+
+            # เก็บลง cache ให้ /api/calculate-tax ใช้ต่อได้ (เฉพาะคำตอบจาก AI จริง)
+            if cache_key and not used_fallback:
+                response = TaxCalculationResponse(
+                    tax_result=tax_result,
+                    investment_plans={"plans": plans}
+                )
+                response_cache.set(cache_key, response.model_dump_json())
+
+            yield _sse_event("done", {"plans": len(plans), "is_fallback": used_fallback, "cached": False})
+
+        except AdmissionRejected as e:
+            yield _sse_event("error", {
+                "detail": str(e),
+                "status_code": e.status_code,
+                "retry_after": e.retry_after
+            })
+
+        except Exception as e:
+            print(f"❌ Stream Error: {e}")
+            import traceback
+            traceback.print_exc()
+            yield _sse_event("error", {"detail": str(e)})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/calculate-tax/batch", response_model=BatchTaxCalculationResponse)
+async def calculate_tax_batch(
+    payload: List[Dict[str, Any]]
+) -> BatchTaxCalculationResponse:
+    """
+    คำนวณภาษีและแผนการลงทุนของหลายโปรไฟล์ในครั้งเดียว
+    
+    - ตรวจสอบข้อมูลทีละรายการ (รายการที่ไม่ถูกต้องได้ error ของตัวเอง ไม่ทำให้ทั้ง batch ได้ 422)
+    - คำนวณภาษีทุกรายการในรอบเดียว
+    - embed + ค้นหา RAG แบบ batch (query ที่ซ้ำกันทำครั้งเดียว)
+    - เรียก LLM พร้อมกันแบบจำกัดจำนวน (batch_llm_concurrency)
+    - คืนผลตามลำดับ พร้อม error ของแต่ละรายการ
+    """
+    if len(payload) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Batch too large: {len(payload)} items (max {settings.batch_max_items})"
+        )
+
+    print(f"📦 Batch request: {len(payload)} items")
+    items: List[Optional[BatchTaxCalculationItem]] = [None] * len(payload)
+    requests: Dict[int, TaxCalculationRequest] = {}
+    for i, raw in enumerate(payload):
+        try:
+            requests[i] = TaxCalculationRequest.model_validate(raw)
+        except ValidationError as e:
+            items[i] = BatchTaxCalculationItem(index=i, success=False, error=str(e))
+    request_keys = {i: canonical_request_key(request) for i, request in requests.items()}
+    tax_results: dict = {}
+
+    # 1. ตรวจ cache และคำนวณภาษีทุกรายการ
+    for i, request in requests.items():
+        if response_cache:
+            cached = response_cache.get(request_keys[i])
+            if cached is not None:
+                items[i] = BatchTaxCalculationItem(
+                    index=i,
+                    success=True,
+                    result=TaxCalculationResponse.model_validate_json(cached)
+                )
+                continue
+        try:
+            with stage_timer("tax_calculation"):
+                tax_results[i] = tax_calculator_service.calculate_tax(request)
+        except Exception as e:
+            items[i] = BatchTaxCalculationItem(index=i, success=False, error=str(e))
+
+    # แผนของโปรไฟล์ที่ใกล้เคียงกันใน semantic cache → ไม่ต้องค้นหา/เรียก LLM
+    semantic_plans = {}
+    for i in tax_results:
+        cached_plans = _get_semantic_plans(requests[i], tax_results[i])
+        if cached_plans is not None:
+            semantic_plans[i] = cached_plans
+
+    pending = [i for i in tax_results if i not in semantic_plans]
+
+    # 2. ดึง context จาก RAG แบบ batch
+    contexts = {i: NO_RAG_CONTEXT for i in pending}
+    if pending and rag_service.is_available() and settings.multi_aspect_enabled:
+        docs_per_item = await _retrieve_documents_multi_aspect([requests[i] for i in pending])
+        for i, docs in zip(pending, docs_per_item):
+            contexts[i] = _build_context(docs)
+    elif pending and rag_service.is_available():
+        live = []
+        for i in pending:
+            precomputed = rag_service.lookup_precomputed(requests[i].gross_income, requests[i].risk_tolerance)
+            if precomputed is not None:
+                contexts[i] = _build_context(precomputed)
+            else:
+                live.append(i)
+        docs_per_item = await rag_service.retrieve_relevant_documents_batch(
+            [_build_rag_query(requests[i]) for i in live],
+            k=settings.rag_top_k
+        )
+        for i, docs in zip(live, docs_per_item):
+            contexts[i] = _build_context(docs)
+    elif pending:
+        print("⚠️ RAG not available - using AI without context")
+        RAG_FAILURES.labels(reason="unavailable").inc(len(pending))
+
+    # 3. เรียก LLM แบบจำกัดจำนวนพร้อมกัน แล้วคำนวณตัวเลขด้วย Python
+    semaphore = asyncio.Semaphore(settings.batch_llm_concurrency)
+
+    async def generate_limited(i: int) -> dict:
+        async with semaphore:
+            investment_plans = await ai_service.generate_recommendations(
+                requests[i], tax_results[i], contexts[i]
+            )
+        if semantic_cache and not investment_plans.get("is_fallback"):
+            semantic_cache.set(requests[i], investment_plans)
+        return investment_plans
+
+    async def generate(i: int):
+        try:
+            # รายการที่ซ้ำกัน (ใน batch หรือกับ request อื่นที่กำลังทำงาน) เรียก LLM ครั้งเดียว
+            if i in semantic_plans:
+                investment_plans = semantic_plans[i]
+            else:
+                investment_plans = await plan_flights.do(
+                    request_keys[i],
+                    lambda: generate_limited(i)
+                )
+            with stage_timer("post_processing"):
+                investment_plans = _apply_plan_calculations(investment_plans, tax_results[i])
+            response = TaxCalculationResponse(
+                tax_result=tax_results[i],
+                investment_plans=investment_plans
+            )
+            if response_cache and not investment_plans.get("is_fallback"):
+                response_cache.set(request_keys[i], response.model_dump_json())
+            items[i] = BatchTaxCalculationItem(index=i, success=True, result=response)
+        except Exception as e:
+            print(f"❌ Batch item {i} error: {e}")
+            items[i] = BatchTaxCalculationItem(index=i, success=False, error=str(e))
+
+    await asyncio.gather(*(generate(i) for i in tax_results))
+
+    succeeded = sum(1 for item in items if item.success)
+    print(f"✅ Batch complete: {succeeded}/{len(items)} succeeded")
+    return BatchTaxCalculationResponse(
+        results=items,
+        succeeded=succeeded,
+        failed=len(items) - succeeded
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(
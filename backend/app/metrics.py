@@ -0,0 +1,136 @@
+"""
+Prometheus Metrics
+วัด latency แยกตามขั้นตอนของ request และนับเหตุการณ์สำคัญ (fallback, RAG error)
+
+ใช้งาน:
+    with stage_timer("llm_call"):
+        response = await llm.ainvoke(prompt)
+
+ถ้ารันหลาย worker ให้ตั้ง PROMETHEUS_MULTIPROC_DIR เพื่อรวม metrics ของทุก process
+"""
+
+import os
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess
+)
+
+
+# Bucket ครอบคลุมตั้งแต่งาน CPU ระดับ sub-ms จนถึง LLM call หลายสิบวินาที
+LATENCY_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0
+)
+
+STAGES = (
+    "tax_calculation",
+    "query_embedding",
+    "qdrant_search",
+    "lexical_search",
+    "context_assembly",
+    "prompt_construction",
+    "llm_call",
+    "json_parsing",
+    "post_processing",
+)
+
+STAGE_LATENCY = Histogram(
+    "tax_advisor_stage_duration_seconds",
+    "Latency of each stage of the tax planning request path",
+    ["stage"],
+    buckets=LATENCY_BUCKETS
+)
+
+FALLBACK_PLANS = Counter(
+    "tax_advisor_fallback_plans_total",
+    "Number of responses served from fallback plans instead of the LLM",
+    ["reason"]
+)
+
+RAG_FAILURES = Counter(
+    "tax_advisor_rag_failures_total",
+    "Number of RAG retrieval failures",
+    ["reason"]
+)
+
+RESPONSE_CACHE_REQUESTS = Counter(
+    "tax_advisor_response_cache_requests_total",
+    "Response cache lookups by result",
+    ["result"]
+)
+
+CONTEXT_TOKENS = Histogram(
+    "tax_advisor_context_tokens",
+    "RAG context size in tokens before (raw) and after (assembled) context assembly",
+    ["kind"],
+    buckets=(100, 250, 500, 750, 1000, 1500, 2000, 3000, 4000, 6000, 8000)
+)
+
+EMBEDDING_CACHE_REQUESTS = Counter(
+    "tax_advisor_embedding_cache_requests_total",
+    "Query embedding cache lookups by result (memory_hit, disk_hit, miss)",
+    ["result"]
+)
+
+SEMANTIC_CACHE_REQUESTS = Counter(
+    "tax_advisor_semantic_cache_requests_total",
+    "Semantic plan cache lookups by result (hit, miss)",
+    ["result"]
+)
+
+COALESCED_REQUESTS = Counter(
+    "tax_advisor_coalesced_requests_total",
+    "Number of requests that joined an identical in-flight plan generation"
+)
+
+LLM_QUEUE_DEPTH = Gauge(
+    "tax_advisor_llm_queue_depth",
+    "Number of LLM calls waiting for an admission slot",
+    multiprocess_mode="livesum"
+)
+
+LLM_IN_FLIGHT = Gauge(
+    "tax_advisor_llm_in_flight",
+    "Number of LLM calls currently running",
+    multiprocess_mode="livesum"
+)
+
+LLM_QUEUE_WAIT = Histogram(
+    "tax_advisor_llm_queue_wait_seconds",
+    "Time spent waiting for an LLM admission slot",
+    buckets=LATENCY_BUCKETS
+)
+
+ADMISSION_REJECTIONS = Counter(
+    "tax_advisor_llm_admission_rejections_total",
+    "LLM calls rejected by admission control",
+    ["reason"]
+)
+
+# ผูก label ไว้ล่วงหน้าเพื่อไม่ต้อง lookup label ทุก request
+_STAGE_TIMERS = {stage: STAGE_LATENCY.labels(stage=stage) for stage in STAGES}
+
+
+def stage_timer(stage: str):
+    """Context manager จับเวลาของขั้นตอน (stage ต้องอยู่ใน STAGES)"""
+    return _STAGE_TIMERS[stage].time()
+
+
+def observe_stage(stage: str, seconds: float):
+    """บันทึกเวลาของขั้นตอนที่วัดเอง (เช่น LLM streaming ที่ครอบด้วย with ไม่ได้)"""
+    _STAGE_TIMERS[stage].observe(seconds)
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """สร้างข้อความ Prometheus text format สำหรับ /metrics"""
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
@@ -179,6 +179,18 @@ class TaxCalculationResult(BaseModel):
     effective_tax_rate: float
 
 
+class TaxCalculationBreakdown(BaseModel):
+    """รายละเอียดการคำนวณภาษีทุกขั้นตอน"""
+    gross_income: int = Field(..., description="รายได้รวม")
+    expense_deduction: int = Field(..., description="ค่าใช้จ่ายที่หักได้")
+    total_allowances: int = Field(..., description="ค่าลดหย่อนรวม")
+    taxable_income: int = Field(..., description="เงินได้สุทธิ")
+    tax_progressive: int = Field(..., description="ภาษีวิธีที่ 1 (อัตราก้าวหน้าจากเงินได้สุทธิ)")
+    tax_minimum: int = Field(..., description="ภาษีวิธีที่ 2 (0.5% ของเงินได้พึงประเมิน)")
+    tax_amount: int = Field(..., description="ภาษีที่ต้องชำระ (ตามวิธีที่สูงกว่า)")
+    effective_tax_rate: float = Field(..., description="อัตราภาษีเฉลี่ย %")
+
+
 class AllocationItem(BaseModel):
     """รายการการจัดสรรในแต่ละแผน"""
     category: str = Field(..., description="ประเภทการลงทุน")
@@ -210,4 +222,33 @@ class MultiplePlansResponse(BaseModel):
 class TaxCalculationResponse(BaseModel):
     """Response สำหรับ API"""
     tax_result: TaxCalculationResult = Field(..., description="ผลการคำนวณภาษี")
-    investment_plans: MultiplePlansResponse = Field(..., description="แผนการลงทุนทั้งหมด")
\ No newline at end of file
+    investment_plans: MultiplePlansResponse = Field(..., description="แผนการลงทุนทั้งหมด")
+
+
+class BatchTaxCalculationItem(BaseModel):
+    """ผลลัพธ์ของแต่ละรายการใน batch (เรียงตามลำดับ request)"""
+    index: int = Field(..., description="ลำดับของ request ใน batch")
+    success: bool = Field(..., description="คำนวณสำเร็จหรือไม่")
+    result: Optional[TaxCalculationResponse] = Field(None, description="ผลลัพธ์ (ถ้าสำเร็จ)")
+    error: Optional[str] = Field(None, description="ข้อความผิดพลาด (ถ้าไม่สำเร็จ)")
+
+
+class BatchTaxCalculationResponse(BaseModel):
+    """Response สำหรับ batch API"""
+    results: List[BatchTaxCalculationItem] = Field(..., description="ผลลัพธ์ตามลำดับ request")
+    succeeded: int = Field(..., description="จำนวนรายการที่สำเร็จ")
+    failed: int = Field(..., description="จำนวนรายการที่ผิดพลาด")
+
+
+class InvestmentTierSaving(BaseModel):
+    """ภาษีที่ประหยัดได้ของเงินลงทุนแต่ละระดับ"""
+    total_investment: int = Field(..., description="เงินลงทุนรวมของระดับนี้")
+    tax_saving: int = Field(..., description="ภาษีที่ประหยัดได้ (Multi-Bracket)")
+
+
+class TaxOnlyResponse(BaseModel):
+    """Response สำหรับ /api/tax (คำนวณภาษีอย่างเดียว ไม่เรียก RAG/LLM)"""
+    tax_result: TaxCalculationResult = Field(..., description="ผลการคำนวณภาษี")
+    breakdown: TaxCalculationBreakdown = Field(..., description="รายละเอียดการคำนวณ")
+    marginal_tax_rate: int = Field(..., description="อัตราภาษีส่วนเพิ่ม %")
+    investment_tiers: List[InvestmentTierSaving] = Field(..., description="เงินลงทุน 3 ระดับและภาษีที่ประหยัดได้")
@@ -0,0 +1,113 @@
+"""
+Admission Control สำหรับ LLM calls
+จำกัดจำนวน LLM call ที่ทำงานพร้อมกัน พร้อมคิวที่จำกัดขนาดและเวลารอ
+เพื่อไม่ให้ยิง OpenAI พร้อมกันจนโดน 429 แล้วตกไปใช้แผนสำรองทั้งหมด
+"""
+
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+
+from app.config import settings
+from app.metrics import (
+    ADMISSION_REJECTIONS,
+    LLM_IN_FLIGHT,
+    LLM_QUEUE_DEPTH,
+    LLM_QUEUE_WAIT
+)
+
+
+class AdmissionRejected(Exception):
+    """คิวเต็มหรือรอนานเกินกำหนด (API ตอบ 429/503 พร้อม Retry-After)"""
+
+    def __init__(self, reason: str, status_code: int, retry_after: int):
+        super().__init__(f"LLM admission rejected: {reason} (retry after {retry_after} s)")
+        self.reason = reason
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Semaphore + คิวแบบมีขอบเขต
+
+    - มี slot ว่าง → เข้าได้ทันที
+    - คิวเต็ม (max_queue) → AdmissionRejected 429 ทันที
+    - รอในคิวเกิน max_wait_seconds → AdmissionRejected 503
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, max_wait_seconds: float):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_wait_seconds = max_wait_seconds
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._active = 0
+        self._waiting = 0
+        # ค่าเฉลี่ยเวลาที่ถือ slot (EWMA) ใช้ประมาณ Retry-After
+        self._avg_hold_seconds = 5.0
+
+    def _retry_after(self) -> int:
+        """ประมาณเวลาที่คิวจะว่างพอ (วินาที)"""
+        rounds = (self._waiting + 1) / self.max_concurrency
+        return max(1, min(60, math.ceil(rounds * self._avg_hold_seconds)))
+
+    def _reject(self, reason: str, status_code: int):
+        ADMISSION_REJECTIONS.labels(reason=reason).inc()
+        print(f"🚦 LLM admission rejected: {reason} "
+              f"(active {self._active}/{self.max_concurrency}, queued {self._waiting}/{self.max_queue})")
+        raise AdmissionRejected(reason, status_code, self._retry_after())
+
+    @asynccontextmanager
+    async def slot(self):
+        """จอง slot สำหรับ LLM call หนึ่งครั้ง"""
+        if not self._semaphore.locked():
+            # มี slot ว่าง → acquire ได้ทันทีโดยไม่ต้องเข้าคิว
+            await self._semaphore.acquire()
+            LLM_QUEUE_WAIT.observe(0.0)
+        else:
+            if self._waiting >= self.max_queue:
+                self._reject("queue_full", 429)
+
+            self._waiting += 1
+            LLM_QUEUE_DEPTH.set(self._waiting)
+            queued_at = time.perf_counter()
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.max_wait_seconds)
+            except asyncio.TimeoutError:
+                self._reject("queue_timeout", 503)
+            finally:
+                self._waiting -= 1
+                LLM_QUEUE_DEPTH.set(self._waiting)
+                LLM_QUEUE_WAIT.observe(time.perf_counter() - queued_at)
+
+        self._active += 1
+        LLM_IN_FLIGHT.set(self._active)
+        acquired_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            held = time.perf_counter() - acquired_at
+            self._avg_hold_seconds = 0.8 * self._avg_hold_seconds + 0.2 * held
+            self._active -= 1
+            LLM_IN_FLIGHT.set(self._active)
+            self._semaphore.release()
+
+    def stats(self) -> dict:
+        return {
+            "active": self._active,
+            "queued": self._waiting,
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "max_wait_seconds": self.max_wait_seconds,
+            "avg_llm_seconds": round(self._avg_hold_seconds, 3)
+        }
+
+
+def create_admission_controller() -> AdmissionController:
+    """สร้าง AdmissionController ตาม Settings"""
+    return AdmissionController(
+        max_concurrency=settings.llm_max_concurrency,
+        max_queue=settings.llm_max_queue,
+        max_wait_seconds=settings.llm_max_queue_wait_seconds
+    )
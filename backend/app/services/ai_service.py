@@ -4,11 +4,66 @@ Version: ปี 2568 - อัปเดต ThaiESG/ThaiESGX แทน SSF
 """
 
 from langchain_openai import ChatOpenAI
+import asyncio
+import copy
 import json
-from typing import Dict, List, Any , Tuple
+import time
+from typing import Dict, List, Any , Tuple, AsyncIterator
 
 from app.models import TaxCalculationRequest, TaxCalculationResult
 from app.config import settings
+from app.metrics import stage_timer, observe_stage, FALLBACK_PLANS
+from app.services.admission import AdmissionRejected, create_admission_controller
+
+
+class PlanStreamParser:
+    """
+    Parser แบบ incremental สำหรับ JSON ที่ LLM ทยอยส่งมา ({"plans": [ {...}, {...} ]})
+    
+    ป้อนข้อความทีละ chunk ผ่าน feed() แล้วจะได้ plan ที่ปิดวงเล็บครบแล้วกลับมาทันที
+    โดยไม่ต้องรอให้ LLM ตอบจบทั้งก้อน
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self._pos = 0
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._plan_start = None
+
+    def feed(self, text: str) -> List[Dict[str, Any]]:
+        """เพิ่มข้อความและคืน plan ที่สมบูรณ์แล้วจาก chunk นี้"""
+        self.buffer += text
+        completed = []
+
+        while self._pos < len(self.buffer):
+            char = self.buffer[self._pos]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == "\\":
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                # plan แต่ละตัวคือ object ที่อยู่ใน array "plans" ของ object นอกสุด
+                if char == "{" and self._stack == ["{", "["]:
+                    self._plan_start = self._pos
+                self._stack.append(char)
+            elif char in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if char == "}" and self._stack == ["{", "["] and self._plan_start is not None:
+                    completed.append(json.loads(self.buffer[self._plan_start:self._pos + 1]))
+                    self._plan_start = None
+
+            self._pos += 1
+
+        return completed
 
 
 class AIService:
@@ -20,6 +75,7 @@ class AIService:
             temperature=0.3,
             openai_api_key=settings.openai_api_key
         )
+        self.admission = create_admission_controller()
 
     def _get_marginal_rate(self, taxable_income: int) -> int:
         """Get marginal tax rate based on taxable income"""
@@ -369,6 +425,146 @@ class AIService:
 
 ตอบเป็น JSON เท่านั้น ห้ามมี markdown หรือข้อความอื่น:"""
     
+    @staticmethod
+    def _strip_markdown(raw_response: str) -> str:
+        """ลบ markdown code blocks ออกจากคำตอบของ LLM"""
+        plans_text = raw_response.strip()
+        
+        if plans_text.startswith("```json"):
+            plans_text = plans_text[7:]
+        if plans_text.startswith("```"):
+            plans_text = plans_text[3:]
+        if plans_text.endswith("```"):
+            plans_text = plans_text[:-3]
+        
+        return plans_text.strip()
+    
+    def _validate_plan(
+        self,
+        i: int,
+        plan: Dict[str, Any],
+        tax_result: TaxCalculationResult
+    ) -> None:
+        """ตรวจสอบโครงสร้างและวงเงินตามกฎหมายของแผนที่ i (แก้ไขประกันบำนาญที่เกินวงเงินอัตโนมัติ)"""
+        required_fields = ["plan_id", "plan_name", "plan_type", "description",
+                         "total_investment", "total_tax_saving", "overall_risk", "allocations"]
+        for field in required_fields:
+            if field not in plan:
+                raise ValueError(f"Plan {i+1} missing field: {field}")
+
+        # Validate allocations
+        if not plan["allocations"]:
+            raise ValueError(f"Plan {i+1} has empty allocations")
+
+        # 🚨 Validate legal limits
+        total_investment = plan["total_investment"]
+        life_insurance_total = 0
+        health_insurance_total = 0
+        pension_insurance_total = 0
+        rmf_total = 0
+        thai_esg_total = 0
+
+        # Calculate income-based limits
+        max_pension = min(200000, int(tax_result.gross_income * 0.15))
+        max_rmf_limit = min(500000, int(tax_result.gross_income * 0.30))
+        max_pvd = min(500000, int(tax_result.gross_income * 0.15))
+        max_thai_esg_limit = min(300000, int(tax_result.gross_income * 0.30))
+
+        for j, alloc in enumerate(plan["allocations"]):
+            required_alloc_fields = ["category", "percentage", "risk_level", "pros", "cons"]
+            for field in required_alloc_fields:
+                if field not in alloc:
+                    raise ValueError(f"Plan {i+1}, Allocation {j+1} missing field: {field}")
+
+            # Check legal limits for insurance
+            category = alloc["category"]
+            category_lower = category.lower()
+            percentage = alloc["percentage"]
+            amount = int(total_investment * percentage / 100)
+
+            # ประกันชีวิต (Life Insurance)
+            if "ประกันชีวิต" in category and "สุขภาพ" not in category and "บำนาญ" not in category:
+                life_insurance_total += amount
+                if amount > 100000:
+                    print(f"⚠️ Warning: Plan {i+1} allocation '{category}' recommends {amount:,} บาท (exceeds 100,000 legal limit)")
+
+            # ประกันสุขภาพ (Health Insurance)
+            if "สุขภาพ" in category and "ประกันชีวิต" not in category:
+                health_insurance_total += amount
+                if amount > 25000:
+                    print(f"⚠️ Warning: Plan {i+1} allocation '{category}' recommends {amount:,} บาท (exceeds 25,000 legal limit)")
+
+            # Combined life + health
+            if "ประกันชีวิต" in category and "สุขภาพ" in category:
+                # This is a combined category - estimate split
+                estimated_life = int(amount * 0.8)  # Assume 80% life
+                estimated_health = int(amount * 0.2)  # Assume 20% health
+                life_insurance_total += estimated_life
+                health_insurance_total += estimated_health
+                if amount > 125000:
+                    print(f"⚠️ Warning: Plan {i+1} allocation '{category}' recommends {amount:,} บาท (exceeds combined 125,000 legal limit)")
+
+            # ประกันบำนาญ (Pension/Annuity Insurance) - CRITICAL FIX
+            if "ประกันบำนาญ" in category or "บำนาญ" in category_lower:
+                pension_insurance_total += amount
+                if amount > max_pension:
+                    print(f"🚨 ILLEGAL AMOUNT DETECTED: Plan {i+1} allocation '{category}' recommends {amount:,} บาท")
+                    print(f"   Legal limit: {max_pension:,} บาท (min of 200,000 or 15% of {tax_result.gross_income:,})")
+                    print(f"   Violation: {amount - max_pension:,} บาท over limit")
+                    print(f"   🔧 AUTO-CORRECTING to {max_pension:,} บาท")
+
+                    # AUTO-CORRECT the illegal amount
+                    old_percentage = alloc["percentage"]
+                    corrected_percentage = (max_pension / total_investment) * 100
+                    alloc["percentage"] = round(corrected_percentage, 1)
+                    alloc["investment_amount"] = max_pension
+
+                    # Recalculate tax saving based on legal amount
+                    marginal_rate = self._get_marginal_rate(tax_result.taxable_income)
+                    corrected_tax_saving = int(max_pension * marginal_rate / 100)
+                    alloc["tax_saving"] = corrected_tax_saving
+
+                    print(f"   ✅ Corrected: {old_percentage}% → {corrected_percentage:.1f}%")
+                    print(f"   ✅ Tax saving adjusted to: {corrected_tax_saving:,} บาท")
+
+                    # Update the total to use corrected amount
+                    pension_insurance_total = pension_insurance_total - amount + max_pension
+
+            # RMF
+            if "rmf" in category_lower:
+                rmf_total += amount
+                if amount > max_rmf_limit:
+                    print(f"⚠️ Warning: Plan {i+1} allocation '{category}' recommends {amount:,} บาท (exceeds {max_rmf_limit:,} legal limit)")
+
+            # ThaiESG/ThaiESGX
+            if "thaiesg" in category_lower or "esg" in category_lower:
+                thai_esg_total += amount
+                if amount > max_thai_esg_limit:
+                    print(f"⚠️ Warning: Plan {i+1} allocation '{category}' recommends {amount:,} บาท (exceeds {max_thai_esg_limit:,} legal limit)")
+
+        # Final checks
+        if life_insurance_total > 100000:
+            print(f"🚨 ERROR: Plan {i+1} total life insurance = {life_insurance_total:,} บาท (exceeds 100,000 legal limit)")
+        if health_insurance_total > 25000:
+            print(f"🚨 ERROR: Plan {i+1} total health insurance = {health_insurance_total:,} บาท (exceeds 25,000 legal limit)")
+        if pension_insurance_total > max_pension:
+            print(f"🚨 ERROR: Plan {i+1} total pension insurance = {pension_insurance_total:,} บาท (exceeds {max_pension:,} legal limit)")
+    
+    def revalidate_plans(
+        self,
+        investment_plans: Dict[str, Any],
+        tax_result: TaxCalculationResult
+    ) -> Dict[str, Any]:
+        """
+        ตรวจแผนที่สร้างไว้สำหรับโปรไฟล์อื่น (เช่นจาก semantic cache) กับ tax_result ใหม่
+
+        คืนสำเนาที่ปรับวงเงินแล้ว ไม่แก้ dict ต้นฉบับที่ cache ถืออยู่
+        """
+        revalidated = copy.deepcopy(investment_plans)
+        for i, plan in enumerate(revalidated.get("plans", [])):
+            self._validate_plan(i, plan, tax_result)
+        return revalidated
+
     async def generate_recommendations(
         self,
         request: TaxCalculationRequest,
@@ -379,161 +575,156 @@ class AIService:
     ) -> Tuple[Dict[str, Any], str]:
         """เรียก OpenAI เพื่อสร้างหลายแผนการลงทุน"""
         try:
-            prompt = self.generate_tax_optimization_prompt(
-                request, tax_result, retrieved_context, expected_plans
-            )
+            with stage_timer("prompt_construction"):
+                prompt = self.generate_tax_optimization_prompt(
+                    request, tax_result, retrieved_context, expected_plans
+                )
             
-            response = await self.llm.ainvoke(prompt)
+            async with self.admission.slot():
+                with stage_timer("llm_call"):
+                    response = await self.llm.ainvoke(prompt)
             raw_response = response.content
             
-            # Parse JSON
-            plans_text = raw_response.strip()
+            with stage_timer("json_parsing"):
+                # Parse JSON
+                plans_text = self._strip_markdown(raw_response)
+                
+                print(f"📝 AI Response (first 500 chars):")
+                print(plans_text[:500])
+                
+                result = json.loads(plans_text)
+                
+                # Validate
+                if "plans" not in result:
+                    raise ValueError("Invalid response structure - missing 'plans'")
+                
+                if len(result["plans"]) != 3:
+                    raise ValueError(f"Expected 3 plans, got {len(result['plans'])}")
+                
+                # Validate each plan
+                for i, plan in enumerate(result["plans"]):
+                    self._validate_plan(i, plan, tax_result)
             
-            # ลบ markdown code blocks
-            if plans_text.startswith("```json"):
-                plans_text = plans_text[7:]
-            if plans_text.startswith("```"):
-                plans_text = plans_text[3:]
-            if plans_text.endswith("```"):
-                plans_text = plans_text[:-3]
+            print("✅ Validation passed")
+            return result
             
-            plans_text = plans_text.strip()
+        except AdmissionRejected:
+            # ให้ API ตอบ 429/503 แทนการใช้แผนสำรอง
+            raise
             
-            print(f"📝 AI Response (first 500 chars):")
-            print(plans_text[:500])
+        except json.JSONDecodeError as e:
+            print(f"❌ JSON Parse Error: {e}")
+            print(f"Raw Response:\n{raw_response[:1000]}")
+            FALLBACK_PLANS.labels(reason="json_parse_error").inc()
+            return self._get_fallback_plans(request, tax_result)
             
-            result = json.loads(plans_text)
+        except ValueError as e:
+            print(f"❌ Validation Error: {e}")
+            FALLBACK_PLANS.labels(reason="validation_error").inc()
+            return self._get_fallback_plans(request, tax_result)
             
-            # Validate
-            if "plans" not in result:
-                raise ValueError("Invalid response structure - missing 'plans'")
+        except Exception as e:
+            print(f"❌ AI Service Error: {e}")
+            import traceback
+            traceback.print_exc()
+            FALLBACK_PLANS.labels(reason="llm_error").inc()
+            return self._get_fallback_plans(request, tax_result)
+    
+    async def stream_recommendations(
+        self,
+        request: TaxCalculationRequest,
+        tax_result: TaxCalculationResult,
+        retrieved_context: str
+    ) -> AsyncIterator[Tuple[Dict[str, Any], bool]]:
+        """
+        เรียก OpenAI แบบ streaming และส่งแต่ละแผนออกไปทันทีที่ parse ได้ครบ
+        
+        Yields:
+            (plan, is_fallback) ตามลำดับแผน ถ้า LLM ผิดพลาดกลางทาง
+            แผนที่เหลือจะมาจากแผนสำรอง
+        
+        LLM ถูกอ่านใน task แยก (_produce_streamed_plans) ที่ถือ admission slot เฉพาะระหว่างรอ LLM
+        client ที่อ่าน stream ช้าจึงไม่กิน slot และเวลาที่รอ client ไม่ถูกนับใน llm_call
+        """
+        emitted = 0
+        producer = None
+        try:
+            with stage_timer("prompt_construction"):
+                prompt = self.generate_tax_optimization_prompt(
+                    request, tax_result, retrieved_context
+                )
             
-            if len(result["plans"]) != 3:
-                raise ValueError(f"Expected 3 plans, got {len(result['plans'])}")
+            parser = PlanStreamParser()
+            plans: asyncio.Queue = asyncio.Queue()
+            producer = asyncio.create_task(self._produce_streamed_plans(prompt, tax_result, parser, plans))
+            while (plan := await plans.get()) is not None:
+                emitted += 1
+                yield plan, False
+            # แจ้ง error ของ LLM/validation (ถ้ามี) หลังส่งแผนที่ผ่านแล้วออกไปครบ
+            await producer
             
-            # Validate each plan
-            for i, plan in enumerate(result["plans"]):
-                required_fields = ["plan_id", "plan_name", "plan_type", "description",
-                                 "total_investment", "total_tax_saving", "overall_risk", "allocations"]
-                for field in required_fields:
-                    if field not in plan:
-                        raise ValueError(f"Plan {i+1} missing field: {field}")
-
-                # Validate allocations
-                if not plan["allocations"]:
-                    raise ValueError(f"Plan {i+1} has empty allocations")
-
-                # 🚨 Validate legal limits
-                total_investment = plan["total_investment"]
-                life_insurance_total = 0
-                health_insurance_total = 0
-                pension_insurance_total = 0
-                rmf_total = 0
-                thai_esg_total = 0
-
-                # Calculate income-based limits
-                max_pension = min(200000, int(tax_result.gross_income * 0.15))
-                max_rmf_limit = min(500000, int(tax_result.gross_income * 0.30))
-                max_pvd = min(500000, int(tax_result.gross_income * 0.15))
-                max_thai_esg_limit = min(300000, int(tax_result.gross_income * 0.30))
-
-                for j, alloc in enumerate(plan["allocations"]):
-                    required_alloc_fields = ["category", "percentage", "risk_level", "pros", "cons"]
-                    for field in required_alloc_fields:
-                        if field not in alloc:
-                            raise ValueError(f"Plan {i+1}, Allocation {j+1} missing field: {field}")
-
-                    # Check legal limits for insurance
-                    category = alloc["category"]
-                    category_lower = category.lower()
-                    percentage = alloc["percentage"]
-                    amount = int(total_investment * percentage / 100)
-
-                    # ประกันชีวิต (Life Insurance)
-                    if "ประกันชีวิต" in category and "สุขภาพ" not in category and "บำนาญ" not in category:
-                        life_insurance_total += amount
-                        if amount > 100000:
-                            print(f"⚠️ Warning: Plan {i+1} allocation '{category}' recommends {amount:,} บาท (exceeds 100,000 legal limit)")
-
-                    # ประกันสุขภาพ (Health Insurance)
-                    if "สุขภาพ" in category and "ประกันชีวิต" not in category:
-                        health_insurance_total += amount
-                        if amount > 25000:
-                            print(f"⚠️ Warning: Plan {i+1} allocation '{category}' recommends {amount:,} บาท (exceeds 25,000 legal limit)")
-
-                    # Combined life + health
-                    if "ประกันชีวิต" in category and "สุขภาพ" in category:
-                        # This is a combined category - estimate split
-                        estimated_life = int(amount * 0.8)  # Assume 80% life
-                        estimated_health = int(amount * 0.2)  # Assume 20% health
-                        life_insurance_total += estimated_life
-                        health_insurance_total += estimated_health
-                        if amount > 125000:
-                            print(f"⚠️ Warning: Plan {i+1} allocation '{category}' recommends {amount:,} บาท (exceeds combined 125,000 legal limit)")
-
-                    # ประกันบำนาญ (Pension/Annuity Insurance) - CRITICAL FIX
-                    if "ประกันบำนาญ" in category or "บำนาญ" in category_lower:
-                        pension_insurance_total += amount
-                        if amount > max_pension:
-                            print(f"🚨 ILLEGAL AMOUNT DETECTED: Plan {i+1} allocation '{category}' recommends {amount:,} บาท")
-                            print(f"   Legal limit: {max_pension:,} บาท (min of 200,000 or 15% of {tax_result.gross_income:,})")
-                            print(f"   Violation: {amount - max_pension:,} บาท over limit")
-                            print(f"   🔧 AUTO-CORRECTING to {max_pension:,} บาท")
-
-                            # AUTO-CORRECT the illegal amount
-                            old_percentage = alloc["percentage"]
-                            corrected_percentage = (max_pension / total_investment) * 100
-                            alloc["percentage"] = round(corrected_percentage, 1)
-                            alloc["investment_amount"] = max_pension
-
-                            # Recalculate tax saving based on legal amount
-                            marginal_rate = self._get_marginal_rate(tax_result.taxable_income)
-                            corrected_tax_saving = int(max_pension * marginal_rate / 100)
-                            alloc["tax_saving"] = corrected_tax_saving
-
-                            print(f"   ✅ Corrected: {old_percentage}% → {corrected_percentage:.1f}%")
-                            print(f"   ✅ Tax saving adjusted to: {corrected_tax_saving:,} บาท")
-
-                            # Update the total to use corrected amount
-                            pension_insurance_total = pension_insurance_total - amount + max_pension
-
-                    # RMF
-                    if "rmf" in category_lower:
-                        rmf_total += amount
-                        if amount > max_rmf_limit:
-                            print(f"⚠️ Warning: Plan {i+1} allocation '{category}' recommends {amount:,} บาท (exceeds {max_rmf_limit:,} legal limit)")
-
-                    # ThaiESG/ThaiESGX
-                    if "thaiesg" in category_lower or "esg" in category_lower:
-                        thai_esg_total += amount
-                        if amount > max_thai_esg_limit:
-                            print(f"⚠️ Warning: Plan {i+1} allocation '{category}' recommends {amount:,} บาท (exceeds {max_thai_esg_limit:,} legal limit)")
-
-                # Final checks
-                if life_insurance_total > 100000:
-                    print(f"🚨 ERROR: Plan {i+1} total life insurance = {life_insurance_total:,} บาท (exceeds 100,000 legal limit)")
-                if health_insurance_total > 25000:
-                    print(f"🚨 ERROR: Plan {i+1} total health insurance = {health_insurance_total:,} บาท (exceeds 25,000 legal limit)")
-                if pension_insurance_total > max_pension:
-                    print(f"🚨 ERROR: Plan {i+1} total pension insurance = {pension_insurance_total:,} บาท (exceeds {max_pension:,} legal limit)")
+            if emitted != 3:
+                print(f"📝 AI Response (first 500 chars):")
+                print(self._strip_markdown(parser.buffer)[:500])
+                raise ValueError(f"Expected 3 plans, got {emitted}")
             
             print("✅ Validation passed")
-            return result
+            return
+            
+        except AdmissionRejected:
+            raise
             
         except json.JSONDecodeError as e:
             print(f"❌ JSON Parse Error: {e}")
-            print(f"Raw Response:\n{raw_response[:1000]}")
-            return self._get_fallback_plans(request, tax_result)
+            FALLBACK_PLANS.labels(reason="json_parse_error").inc()
             
         except ValueError as e:
             print(f"❌ Validation Error: {e}")
-            return self._get_fallback_plans(request, tax_result)
+            FALLBACK_PLANS.labels(reason="validation_error").inc()
             
         except Exception as e:
             print(f"❌ AI Service Error: {e}")
             import traceback
             traceback.print_exc()
-            return self._get_fallback_plans(request, tax_result)
+            FALLBACK_PLANS.labels(reason="llm_error").inc()
+        
+        finally:
+            # client ตัดการเชื่อมต่อกลางทาง → หยุดเรียก LLM และคืน slot
+            if producer is not None and not producer.done():
+                producer.cancel()
+        
+        fallback = self._get_fallback_plans(request, tax_result)
+        for plan in fallback["plans"][emitted:]:
+            yield plan, True
+    
+    async def _produce_streamed_plans(
+        self,
+        prompt: str,
+        tax_result: TaxCalculationResult,
+        parser: PlanStreamParser,
+        plans: asyncio.Queue
+    ) -> None:
+        """อ่าน LLM แบบ streaming ภายใต้ admission slot แล้วส่งแผนที่ validate แล้วเข้า plans (จบด้วย None)"""
+        emitted = 0
+        try:
+            async with self.admission.slot():
+                llm_started = time.perf_counter()
+                parsing_seconds = 0.0
+                async for chunk in self.llm.astream(prompt):
+                    parse_started = time.perf_counter()
+                    parsed = parser.feed(chunk.content or "")
+                    if emitted + len(parsed) > 3:
+                        raise ValueError("Expected 3 plans, got more")
+                    for offset, plan in enumerate(parsed):
+                        self._validate_plan(emitted + offset, plan, tax_result)
+                    parsing_seconds += time.perf_counter() - parse_started
+                    for plan in parsed:
+                        emitted += 1
+                        plans.put_nowait(plan)
+                observe_stage("llm_call", time.perf_counter() - llm_started)
+                observe_stage("json_parsing", parsing_seconds)
+        finally:
+            plans.put_nowait(None)
     
     def _get_fallback_plans(
         self,
@@ -555,8 +746,9 @@ class AIService:
         else:
             base_investment = 1000000
         
-        # แผนสำรองแบบง่าย
+        # แผนสำรองแบบง่าย (is_fallback ใช้ภายในเพื่อไม่ให้ cache แผนสำรอง)
         return {
+            "is_fallback": True,
             "plans": [
                 {
                     "plan_id": "1",
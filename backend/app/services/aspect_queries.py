@@ -0,0 +1,130 @@
+"""
+Multi-aspect Queries
+query เดียวแบบกว้างๆ ("รายได้ ... ต้องการวางแผนภาษีและลงทุน มีครอบครัว ...") ทำให้ chunk
+ของค่าลดหย่อนเฉพาะเรื่องถูกเบียดออก จึงแตก request เป็น query ย่อยต่อประเด็น:
+
+- query หลัก (ตัวเดียวกับ precomputed retrieval)
+- หมวดค่าลดหย่อนที่ผู้ใช้กรอก (เรียงตามยอดเงิน)
+- ประเภทเงินได้ / วิธีหักค่าใช้จ่าย
+- ผลิตภัณฑ์ลดหย่อนภาษีตามระดับความเสี่ยง
+
+ทุก query ถูก embed และค้นหาใน batch เดียว (RAGService.retrieve_relevant_documents_batch)
+แล้วรวมผลแบบสลับกันทีละอันดับ (round-robin) ตัดเอกสารซ้ำ
+"""
+
+from typing import List, Optional
+
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.models import ExpenseMethod, IncomeType, TaxCalculationRequest
+from app.services.precomputed_retrieval import build_retrieval_query
+
+
+# หมวดค่าลดหย่อน → field ของ TaxCalculationRequest (ค่าลดหย่อนส่วนตัวได้ทุกคนจึงไม่นับ)
+DEDUCTION_GROUPS = [
+    ("ครอบครัว", ["spouse_deduction", "child_deduction", "parent_support", "disabled_support"]),
+    ("ประกันชีวิตและสุขภาพ", [
+        "life_insurance", "life_insurance_pension", "life_insurance_parents",
+        "health_insurance", "health_insurance_parents", "social_security"
+    ]),
+    ("กองทุนเพื่อการเกษียณ", ["pension_insurance", "provident_fund", "gpf", "pvd_teacher", "rmf", "nsf"]),
+    ("กองทุน ThaiESG", ["thai_esg", "thai_esgx_new", "thai_esgx_ltf"]),
+    ("มาตรการกระตุ้นเศรษฐกิจและที่อยู่อาศัย", ["stock_investment", "easy_e_receipt", "home_loan_interest"]),
+    ("เงินบริจาค", ["donation_general", "donation_education", "donation_social_enterprise", "donation_political"])
+]
+
+INCOME_TYPE_TOPICS = {
+    IncomeType.SECTION_40_1: "เงินเดือน ค่าจ้าง",
+    IncomeType.SECTION_40_2: "ค่าจ้างทำของ ค่าธรรมเนียม ค่านายหน้า",
+    IncomeType.SECTION_40_3: "ค่าแห่งกู๊ดวิลล์ ค่าลิขสิทธิ์",
+    IncomeType.SECTION_40_4: "ดอกเบี้ย เงินปันผล",
+    IncomeType.SECTION_40_5: "ค่าเช่าทรัพย์สิน",
+    IncomeType.SECTION_40_6: "วิชาชีพอิสระ",
+    IncomeType.SECTION_40_7: "การรับเหมา",
+    IncomeType.SECTION_40_8: "เงินได้จากธุรกิจ การพาณิชย์"
+}
+
+RISK_TOPICS = {
+    "low": "ความเสี่ยงต่ำ ประกันชีวิตแบบบำนาญ ประกันชีวิต กองทุนสำรองเลี้ยงชีพ กอช. RMF ตราสารหนี้",
+    "medium": "ความเสี่ยงปานกลาง RMF กองทุนผสม ThaiESG ประกันชีวิตแบบบำนาญ",
+    "high": "ความเสี่ยงสูง RMF หุ้น ThaiESG หุ้น ลงทุนหุ้นจดทะเบียนที่ออกใหม่"
+}
+
+# query ที่ต้องมีเสมอนอกจากหมวดค่าลดหย่อน (query หลัก, ประเภทเงินได้, ความเสี่ยง)
+FIXED_ASPECTS = 3
+
+
+def _deduction_queries(request: TaxCalculationRequest) -> List[str]:
+    """query ต่อหมวดค่าลดหย่อนที่มียอด > 0 (หมวดที่ยอดมากกว่ามาก่อน)"""
+    fields = TaxCalculationRequest.model_fields
+    groups = []
+    for label, names in DEDUCTION_GROUPS:
+        used = [name for name in names if getattr(request, name)]
+        if not used:
+            continue
+        total = sum(getattr(request, name) for name in used)
+        descriptions = ", ".join(fields[name].description for name in used)
+        groups.append((total, f"ค่าลดหย่อนหมวด{label}: {descriptions} เงื่อนไขและเพดานการหักลดหย่อน"))
+    groups.sort(key=lambda group: group[0], reverse=True)
+    return [query for _, query in groups]
+
+
+def _income_type_query(request: TaxCalculationRequest) -> str:
+    method = "ตามจริง" if request.expense_method == ExpenseMethod.ACTUAL else "แบบเหมา"
+    query = f"เงินได้ประเภท {request.income_type.value} {INCOME_TYPE_TOPICS[request.income_type]} การหักค่าใช้จ่าย{method}"
+    if request.income_type == IncomeType.SECTION_40_6 and request.profession_type:
+        query += f" วิชาชีพ {request.profession_type.value}"
+    return query
+
+
+def _risk_query(request: TaxCalculationRequest) -> str:
+    topic = RISK_TOPICS.get(request.risk_tolerance, f"ความเสี่ยง {request.risk_tolerance}")
+    return f"การลงทุนลดหย่อนภาษีสำหรับผู้รับ{topic}"
+
+
+def build_aspect_queries(request: TaxCalculationRequest, max_queries: Optional[int] = None) -> List[str]:
+    """
+    query ทั้งหมดของ request (ตัวแรกคือ query หลักเสมอ)
+
+    หมวดค่าลดหย่อนใช้ช่องที่เหลือจาก FIXED_ASPECTS ภายใน max_queries
+    """
+    if max_queries is None:
+        max_queries = settings.multi_aspect_max_queries
+    base = build_retrieval_query(request.gross_income, request.risk_tolerance)
+    if max_queries <= 1:
+        return [base]
+
+    deductions = _deduction_queries(request)[:max(0, max_queries - FIXED_ASPECTS)]
+    queries = [base, *deductions, _income_type_query(request), _risk_query(request)]
+    return queries[:max_queries]
+
+
+def merge_aspect_results(
+    results: List[List[Document]],
+    k_per_aspect: Optional[int] = None,
+    max_docs: Optional[int] = None
+) -> List[Document]:
+    """
+    รวมผลของแต่ละ query แบบ round-robin (อันดับ 1 ของทุก query ก่อน แล้วอันดับ 2 ...)
+
+    query หลัก (ตัวแรก) ใช้ผลทั้งหมด query ย่อยใช้ k_per_aspect อันดับแรก
+    เอกสารซ้ำ (เนื้อหาเดียวกัน) นับเฉพาะครั้งแรก
+    """
+    if k_per_aspect is None:
+        k_per_aspect = settings.multi_aspect_k_per_query
+    if max_docs is None:
+        max_docs = settings.multi_aspect_max_docs
+
+    lists = [docs if i == 0 else docs[:k_per_aspect] for i, docs in enumerate(results)]
+    merged: List[Document] = []
+    seen = set()
+    for rank in range(max((len(docs) for docs in lists), default=0)):
+        for docs in lists:
+            if rank >= len(docs) or docs[rank].page_content in seen:
+                continue
+            seen.add(docs[rank].page_content)
+            merged.append(docs[rank])
+            if len(merged) >= max_docs:
+                return merged
+    return merged
@@ -0,0 +1,197 @@
+"""
+Response Cache Service
+Cache ผลลัพธ์ของ /api/calculate-tax ตาม canonical hash ของ request
+รองรับ backend แบบ in-process (LRU dict) และ SQLite บนดิสก์
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Tuple
+
+from pydantic import BaseModel
+
+from app.config import settings
+from app.metrics import RESPONSE_CACHE_REQUESTS
+
+
+def canonical_request_key(request: BaseModel) -> str:
+    """สร้าง key จาก request ที่ validate แล้ว
+
+    ใช้ model_dump (รวมค่า default) + sort_keys เพื่อให้ payload ที่มีความหมายเท่ากัน
+    (เช่น ส่ง/ไม่ส่ง field ที่เป็นค่า default, ลำดับ key ต่างกัน) ได้ key เดียวกัน
+    """
+    canonical = json.dumps(
+        request.model_dump(mode="json"),
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class InMemoryCacheBackend:
+    """LRU cache ในหน่วยความจำของ process (OrderedDict)"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteCacheBackend:
+    """LRU cache บนดิสก์ด้วย SQLite (แชร์ได้ระหว่าง worker และอยู่รอดหลังรีสตาร์ท)"""
+
+    def __init__(self, path: str, max_entries: int):
+        self.max_entries = max_entries
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS response_cache (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_response_cache_last_access "
+            "ON response_cache (last_access)"
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at < now:
+                self._conn.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute(
+                "UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key)
+            )
+            return value
+
+    def set(self, key: str, value: str, expires_at: float):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_access) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, expires_at, time.time())
+            )
+            # ลบรายการที่ใช้งานล่าสุดนานที่สุดเมื่อเกินขนาด
+            self._conn.execute(
+                "DELETE FROM response_cache WHERE key IN ("
+                "  SELECT key FROM response_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?"
+                ")",
+                (self.max_entries,)
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM response_cache")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+
+
+class ResponseCache:
+    """Cache ผลลัพธ์ JSON พร้อม TTL และตัวนับ hit/miss"""
+
+    def __init__(self, backend, ttl_seconds: int):
+        self.backend = backend
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """คืน JSON string ที่ cache ไว้ หรือ None ถ้าไม่มี/หมดอายุ"""
+        value = self.backend.get(key)
+        if value is None:
+            self.misses += 1
+            RESPONSE_CACHE_REQUESTS.labels(result="miss").inc()
+        else:
+            self.hits += 1
+            RESPONSE_CACHE_REQUESTS.labels(result="hit").inc()
+        return value
+
+    def set(self, key: str, value: str):
+        self.backend.set(key, value, time.time() + self.ttl_seconds)
+
+    def clear(self):
+        self.backend.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "size": len(self.backend),
+            "max_entries": self.backend.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+def create_response_cache() -> Optional[ResponseCache]:
+    """สร้าง ResponseCache ตาม Settings (คืน None ถ้าปิดใช้งาน)"""
+    if not settings.response_cache_enabled:
+        return None
+
+    if settings.response_cache_backend == "sqlite":
+        backend = SQLiteCacheBackend(
+            settings.response_cache_sqlite_path,
+            settings.response_cache_max_entries
+        )
+    elif settings.response_cache_backend == "memory":
+        backend = InMemoryCacheBackend(settings.response_cache_max_entries)
+    else:
+        raise ValueError(
+            f"Unknown response_cache_backend: {settings.response_cache_backend} "
+            f"(expected 'memory' or 'sqlite')"
+        )
+
+    print(f"🗄️ Response cache: {type(backend).__name__} "
+          f"(max {settings.response_cache_max_entries} entries, TTL {settings.response_cache_ttl_seconds} s)")
+    return ResponseCache(backend, settings.response_cache_ttl_seconds)
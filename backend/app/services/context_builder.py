@@ -0,0 +1,183 @@
+"""
+Context Builder
+ประกอบ context สำหรับ prompt จากเอกสารที่ค้นได้ ให้ใช้ token น้อยที่สุดโดยไม่เสียเนื้อหา
+
+1. MMR: เรียงเอกสารตามความเกี่ยวข้องหักความซ้ำ (ใช้ vector ที่ได้มาพร้อมผลค้นหา)
+   และตัดเอกสารที่แทบซ้ำกับที่เลือกไปแล้ว
+2. รวม chunk ที่ซ้อนทับกันจากไฟล์เดียวกัน (chunk_overlap ทำให้ต้นชิ้นหลังซ้ำกับท้ายชิ้นก่อน)
+3. ตัดให้อยู่ใน token budget (นับด้วย tiktoken ของโมเดลที่ใช้จริง)
+"""
+
+from functools import lru_cache
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.metrics import CONTEXT_TOKENS
+
+# key ใน metadata ที่ RAGService ใส่ vector ของเอกสารไว้ (ไม่ส่งออกไปกับ sources)
+VECTOR_METADATA_KEY = "_vector"
+
+SEPARATOR = "\n\n"
+
+# ความยาวขั้นต่ำของส่วนที่ซ้อนทับจึงจะรวม chunk (กันการรวมเพราะขึ้นต้นด้วยคำเดียวกันโดยบังเอิญ)
+MIN_OVERLAP_CHARS = 40
+
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    try:
+        import tiktoken
+        return tiktoken.encoding_for_model(settings.openai_model)
+    except Exception as e:
+        print(f"⚠️ tiktoken encoding for {settings.openai_model} unavailable ({e}) - estimating tokens")
+        return None
+
+
+def warm_up_tokenizer():
+    """โหลด tiktoken encoding ล่วงหน้า (ครั้งแรกอาจต้องดาวน์โหลดไฟล์ จึงไม่ควรเกิดใน request แรก)"""
+    _get_encoding()
+
+
+def count_tokens(text: str) -> int:
+    """จำนวน token ตาม tokenizer ของโมเดล (ถ้าโหลดไม่ได้ใช้ค่าประมาณ 1 token ต่อ 2 ตัวอักษร)"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return (len(text) + 1) // 2
+    return len(encoding.encode(text))
+
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 2]
+    return encoding.decode(encoding.encode(text)[:max_tokens])
+
+
+def _doc_vector(doc: Document) -> Optional[np.ndarray]:
+    vector = doc.metadata.get(VECTOR_METADATA_KEY)
+    if vector is None:
+        return None
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+
+def mmr_select(docs: List[Document], lambda_mult: float, duplicate_threshold: float) -> List[Document]:
+    """
+    Maximal Marginal Relevance บนลำดับที่ค้นได้
+
+    relevance มาจากอันดับ (ผลค้นหาถูกเรียงและรวม RRF มาแล้ว) ความซ้ำคือ cosine กับเอกสารที่เลือกแล้ว
+    เอกสารที่ไม่มี vector (เช่น มาจาก BM25 อย่างเดียว) ถือว่าไม่ซ้ำกับใคร
+    """
+    if len(docs) <= 1:
+        return list(docs)
+
+    count = len(docs)
+    relevance = [1 - rank / count for rank in range(count)]
+    vectors = [_doc_vector(doc) for doc in docs]
+    max_similarity = [0.0] * count
+    remaining = list(range(count))
+    selected: List[int] = []
+
+    while remaining:
+        best = max(
+            remaining,
+            key=lambda i: lambda_mult * relevance[i] - (1 - lambda_mult) * max_similarity[i]
+        )
+        remaining.remove(best)
+        if max_similarity[best] >= duplicate_threshold:
+            continue
+        selected.append(best)
+        if vectors[best] is None:
+            continue
+        for i in remaining:
+            if vectors[i] is not None:
+                max_similarity[i] = max(max_similarity[i], float(vectors[i] @ vectors[best]))
+
+    return [docs[i] for i in selected]
+
+
+def _merge_pair(first: str, second: str) -> Optional[str]:
+    """รวม first + second ถ้าท้าย first ซ้อนกับต้น second (หรือชิ้นหนึ่งอยู่ในอีกชิ้น)"""
+    if second in first:
+        return first
+    if first in second:
+        return second
+    probe = second[:MIN_OVERLAP_CHARS]
+    if len(probe) < MIN_OVERLAP_CHARS:
+        return None
+    start = first.find(probe, max(0, len(first) - settings.rag_chunk_overlap * 2))
+    while start != -1:
+        overlap = len(first) - start
+        if second[:overlap] == first[start:]:
+            return first + second[overlap:]
+        start = first.find(probe, start + 1)
+    return None
+
+
+def merge_overlapping_chunks(docs: List[Document]) -> List[str]:
+    """รวม chunk ที่ซ้อนทับกันจากไฟล์เดียวกัน (คงลำดับตามตำแหน่งที่พบชิ้นแรกของแต่ละกลุ่ม)"""
+    texts: List[str] = []
+    sources: List[Optional[str]] = []
+    for doc in docs:
+        text = doc.page_content
+        source = doc.metadata.get("source")
+        target = None
+        if source is not None:
+            # chunk ใหม่อาจเชื่อมหลายส่วนเข้าด้วยกัน (เช่น ได้ชิ้นที่ 2 และ 4 มาก่อนชิ้นที่ 3)
+            i = 0
+            while i < len(texts):
+                if i != target and sources[i] == source:
+                    current = text if target is None else texts[target]
+                    combined = _merge_pair(texts[i], current) or _merge_pair(current, texts[i])
+                    if combined is not None:
+                        if target is None:
+                            target = i
+                        else:
+                            del texts[i], sources[i]
+                            target = target if target < i else target - 1
+                        texts[target] = combined
+                        i = 0
+                        continue
+                i += 1
+        if target is None:
+            texts.append(text)
+            sources.append(source)
+    return texts
+
+
+def assemble_context(docs: List[Document], token_budget: Optional[int] = None) -> str:
+    """MMR → รวม chunk ที่ซ้อนกัน → ตัดตาม token budget แล้วต่อด้วยบรรทัดว่าง"""
+    if token_budget is None:
+        token_budget = settings.context_token_budget
+
+    retrieved = len(docs)
+    raw_tokens = count_tokens(SEPARATOR.join(doc.page_content for doc in docs))
+    if settings.context_mmr_enabled:
+        docs = mmr_select(docs, settings.context_mmr_lambda, settings.context_duplicate_threshold)
+
+    parts: List[str] = []
+    used = 0
+    separator_tokens = count_tokens(SEPARATOR)
+    for text in merge_overlapping_chunks(docs):
+        cost = count_tokens(text) + (separator_tokens if parts else 0)
+        if used + cost <= token_budget:
+            parts.append(text)
+            used += cost
+            continue
+        # ชิ้นสุดท้ายที่ล้น budget: ตัดให้พอดีถ้ายังเหลือที่พอมีความหมาย
+        remaining = token_budget - used - (separator_tokens if parts else 0)
+        if remaining >= 50:
+            parts.append(_truncate_to_tokens(text, remaining))
+        break
+
+    context = SEPARATOR.join(parts)
+    final_tokens = count_tokens(context)
+    CONTEXT_TOKENS.labels(kind="raw").observe(raw_tokens)
+    CONTEXT_TOKENS.labels(kind="assembled").observe(final_tokens)
+    print(f"🧩 Context: {retrieved} chunks → {len(docs)} after MMR → {len(parts)} parts, "
+          f"{raw_tokens} → {final_tokens} tokens")
+    return context
@@ -0,0 +1,170 @@
+"""
+Embedding Cache Service
+Cache vector ของ query แบบ 2 ชั้น เพื่อไม่ต้องเรียก OpenAI Embeddings ซ้ำสำหรับข้อความเดิม
+
+- ชั้นที่ 1: LRU ในหน่วยความจำ (numpy float32)
+- ชั้นที่ 2: SQLite บนดิสก์ (แชร์ระหว่าง worker และอยู่รอดหลังรีสตาร์ท)
+
+key = sha256(ชื่อโมเดล + ข้อความที่ normalize แล้ว) ดังนั้นเปลี่ยนโมเดลแล้ว cache เดิมจะไม่ถูกใช้
+"""
+
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.config import settings
+from app.metrics import EMBEDDING_CACHE_REQUESTS
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """normalize ข้อความก่อนทำ key (Unicode NFC + ยุบช่องว่าง)"""
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def embedding_cache_key(model: str, text: str) -> str:
+    """key ของ embedding ตามชื่อโมเดลและข้อความที่ normalize แล้ว"""
+    return hashlib.sha256(f"{model}\n{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingDiskStore:
+    """เก็บ vector (float32 bytes) ลง SQLite"""
+
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                key TEXT PRIMARY KEY,
+                model TEXT NOT NULL,
+                dim INTEGER NOT NULL,
+                vector BLOB NOT NULL,
+                created_at REAL NOT NULL
+            )
+            """
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT vector FROM embedding_cache WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.float32)
+
+    def set_many(self, model: str, items: Dict[str, np.ndarray]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, model, dim, vector, created_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(key, model, len(vector), vector.tobytes(), now) for key, vector in items.items()]
+            )
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM embedding_cache")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+
+
+class EmbeddingCache:
+    """LRU (memory) + SQLite (disk) สำหรับ query embedding พร้อมตัวนับ hit แยกชั้น"""
+
+    def __init__(self, model: str, max_entries: int, disk_store: Optional[EmbeddingDiskStore] = None):
+        self.model = model
+        self.max_entries = max_entries
+        self.disk_store = disk_store
+        self._entries: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _remember(self, key: str, vector: np.ndarray):
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        """คืน vector ที่ cache ไว้ หรือ None"""
+        key = embedding_cache_key(self.model, text)
+
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is not None:
+                self._entries.move_to_end(key)
+        if vector is not None:
+            self.memory_hits += 1
+            EMBEDDING_CACHE_REQUESTS.labels(result="memory_hit").inc()
+            return vector
+
+        if self.disk_store is not None:
+            vector = self.disk_store.get(key)
+            if vector is not None:
+                self._remember(key, vector)
+                self.disk_hits += 1
+                EMBEDDING_CACHE_REQUESTS.labels(result="disk_hit").inc()
+                return vector
+
+        self.misses += 1
+        EMBEDDING_CACHE_REQUESTS.labels(result="miss").inc()
+        return None
+
+    def set_many(self, texts: List[str], vectors: List[List[float]]):
+        """บันทึก vector ของหลายข้อความ (เขียนดิสก์ใน transaction เดียว)"""
+        items = {
+            embedding_cache_key(self.model, text): np.asarray(vector, dtype=np.float32)
+            for text, vector in zip(texts, vectors)
+        }
+        for key, vector in items.items():
+            self._remember(key, vector)
+        if self.disk_store is not None:
+            self.disk_store.set_many(self.model, items)
+
+    def stats(self) -> dict:
+        total = self.memory_hits + self.disk_hits + self.misses
+        hits = self.memory_hits + self.disk_hits
+        return {
+            "model": self.model,
+            "memory_size": len(self._entries),
+            "max_entries": self.max_entries,
+            "disk_size": len(self.disk_store) if self.disk_store is not None else None,
+            "memory_hits": self.memory_hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0
+        }
+
+
+def create_embedding_cache(model: str) -> Optional[EmbeddingCache]:
+    """สร้าง EmbeddingCache ตาม Settings (คืน None ถ้าปิดใช้งาน)"""
+    if not settings.embedding_cache_enabled:
+        return None
+
+    disk_store = None
+    if settings.embedding_cache_path:
+        disk_store = EmbeddingDiskStore(settings.embedding_cache_path)
+
+    print(f"🧠 Embedding cache: {model} (memory {settings.embedding_cache_max_entries} entries, "
+          f"disk {settings.embedding_cache_path or 'disabled'})")
+    return EmbeddingCache(model, settings.embedding_cache_max_entries, disk_store)
@@ -0,0 +1,218 @@
+"""
+Embedding Pipeline
+embed chunk จำนวนมากตอน ingest: แบ่ง batch, ทำหลาย batch พร้อมกัน, จำกัด token ต่อนาที
+และบันทึก vector ที่ได้ลง checkpoint บนดิสก์ทันทีหลัง embed แต่ละ batch
+รับ chunk เป็น stream (async iterable) จึงเริ่ม embed ได้ก่อนโหลด/แบ่งเอกสารครบ
+
+รันใหม่หลังล้มกลางทาง:
+- chunk ที่ upsert แล้วถูกข้ามโดย incremental sync (ID ตายตัวจากเนื้อหา)
+- chunk ที่ embed แล้วแต่ยัง upsert ไม่สำเร็จใช้ vector จาก checkpoint ไม่ต้องเรียก API ซ้ำ
+"""
+
+import asyncio
+import time
+from functools import lru_cache
+from typing import AsyncIterable, Awaitable, Callable, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.config import settings
+from app.services.embedding_cache import EmbeddingDiskStore, embedding_cache_key
+
+
+# จำนวนครั้งที่ลอง embed batch เดิมซ้ำ (เช่น โดน 429) ก่อนยอมแพ้
+EMBED_RETRIES = 3
+
+
+@lru_cache(maxsize=4)
+def _embedding_encoding(model: str):
+    """tiktoken encoding ของโมเดล embedding (ไม่ใช่ openai_model ของ chat) - โมเดลที่ tiktoken ไม่รู้จักใช้ cl100k_base"""
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"⚠️ tiktoken encoding for {model} unavailable ({e}) - estimating embedding tokens")
+        return None
+
+
+def count_embedding_tokens(texts: List[str], model: str) -> int:
+    """
+    จำนวน token ที่ embeddings API จะคิดกับ quota (TPM)
+
+    ถ้าโหลด tokenizer ไม่ได้ นับ 1 token ต่อตัวอักษร: ภาษาไทยใน cl100k_base ใช้ราว 1 token ต่อตัวอักษร
+    การประมาณต่ำกว่าจริง (เช่น ตัวอักษร/2) จะทำให้ยิงเกิน quota แล้วโดน 429
+    """
+    encoding = _embedding_encoding(model)
+    if encoding is None:
+        return sum(len(text) for text in texts)
+    return sum(len(tokens) for tokens in encoding.encode_batch(texts))
+
+
+class TokenRateLimiter:
+    """token bucket สำหรับ token ต่อนาที (0 = ไม่จำกัด)"""
+
+    def __init__(self, tokens_per_minute: int):
+        self.capacity = float(tokens_per_minute)
+        self.rate = tokens_per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited_seconds = 0.0
+
+    async def acquire(self, tokens: int):
+        if self.capacity <= 0:
+            return
+        # batch ที่ใหญ่กว่าทั้ง bucket ให้รอจน bucket เต็มแล้วผ่านได้
+        tokens = min(float(tokens), self.capacity)
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+                self.waited_seconds += wait
+                await asyncio.sleep(wait)
+
+
+class EmbeddingPipeline:
+    """embed + ส่งต่อ (เช่น upsert) ทีละ batch แบบพร้อมกันภายใต้ rate limit"""
+
+    def __init__(
+        self,
+        embeddings,
+        batch_size: Optional[int] = None,
+        concurrency: Optional[int] = None,
+        tokens_per_minute: Optional[int] = None,
+        checkpoint_path: Optional[str] = None
+    ):
+        self.embeddings = embeddings
+        self.batch_size = batch_size or settings.ingest_embedding_batch_size
+        self.concurrency = concurrency or settings.ingest_embedding_concurrency
+        self.limiter = TokenRateLimiter(
+            settings.ingest_embedding_tokens_per_minute if tokens_per_minute is None else tokens_per_minute
+        )
+        if checkpoint_path is None:
+            checkpoint_path = settings.ingest_checkpoint_path
+        self.checkpoint = EmbeddingDiskStore(checkpoint_path) if checkpoint_path else None
+
+    def _key(self, item_id: str) -> str:
+        return embedding_cache_key(self.embeddings.model, item_id)
+
+    async def _embed_batch(self, texts: List[str]) -> List[List[float]]:
+        await self.limiter.acquire(count_embedding_tokens(texts, self.embeddings.model))
+        delay = 1.0
+        for attempt in range(EMBED_RETRIES):
+            try:
+                return await self.embeddings.aembed_documents(texts)
+            except Exception as e:
+                if attempt == EMBED_RETRIES - 1:
+                    raise
+                print(f"⚠️ Embedding batch failed ({e}) - retrying in {delay:.0f}s")
+                await asyncio.sleep(delay)
+                delay *= 2
+
+    async def run(
+        self,
+        items: AsyncIterable[Tuple[str, Document]],
+        on_batch: Callable[[List[Tuple[str, Document]], List[List[float]]], Awaitable[None]]
+    ) -> dict:
+        """
+        embed chunk ที่ไหลเข้ามาจาก items แล้วเรียก on_batch(batch, vectors) ต่อ batch
+
+        รับ batch ใหม่จาก items เฉพาะเมื่อมีช่องว่างใน concurrency เท่านั้น
+        ขั้นก่อนหน้าจึงถูกชะลอตาม (backpressure) และ chunk ที่ค้างในหน่วยความจำไม่เกิน
+        batch_size × (concurrency + 1) ไม่ว่า items จะยาวแค่ไหน
+
+        Args:
+            items: (ID ที่ตายตัวตามเนื้อหา, chunk)
+
+        Returns:
+            สถิติ (จำนวน chunk, จาก checkpoint, เวลา, chunks/s)
+        """
+        started = time.perf_counter()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        tasks: Set[asyncio.Task] = set()
+        errors: List[BaseException] = []
+        total = 0
+        done = 0
+        resumed = 0
+
+        async def process(batch: List[Tuple[str, Document]]):
+            nonlocal done, resumed
+            try:
+                vectors: List[Optional[List[float]]] = [None] * len(batch)
+                missing = []
+                for position, (item_id, _) in enumerate(batch):
+                    cached = self.checkpoint.get(self._key(item_id)) if self.checkpoint is not None else None
+                    if cached is None:
+                        missing.append(position)
+                    else:
+                        vectors[position] = cached.tolist()
+                resumed += len(batch) - len(missing)
+
+                if missing:
+                    embedded = await self._embed_batch([batch[position][1].page_content for position in missing])
+                    for position, vector in zip(missing, embedded):
+                        vectors[position] = vector
+                    if self.checkpoint is not None:
+                        self.checkpoint.set_many(self.embeddings.model, {
+                            self._key(batch[position][0]): np.asarray(vectors[position], dtype=np.float32)
+                            for position in missing
+                        })
+
+                await on_batch(batch, vectors)
+                done += len(batch)
+            except Exception as e:
+                errors.append(e)
+            finally:
+                semaphore.release()
+
+        async def submit(batch: List[Tuple[str, Document]]):
+            await semaphore.acquire()
+            task = asyncio.create_task(process(batch))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        try:
+            batch: List[Tuple[str, Document]] = []
+            async for item in items:
+                # batch ที่ล้มแล้วไม่รับงานเพิ่ม ปล่อยให้ batch ที่ค้างอยู่ทำจนจบ
+                if errors:
+                    break
+                batch.append(item)
+                total += 1
+                if len(batch) >= self.batch_size:
+                    await submit(batch)
+                    batch = []
+            if batch and not errors:
+                await submit(batch)
+            # งานที่เสร็จแล้วอยู่ใน checkpoint/Qdrant แล้วค่อยแจ้ง error แรก
+            await asyncio.gather(*list(tasks))
+        finally:
+            for task in list(tasks):
+                task.cancel()
+
+        if errors:
+            print(f"❌ {len(errors)} batches failed - rerun to resume ({done}/{total} chunks done)")
+            raise errors[0]
+
+        elapsed = time.perf_counter() - started
+        return {
+            "chunks": total,
+            "resumed_from_checkpoint": resumed,
+            "seconds": round(elapsed, 2),
+            "chunks_per_second": round(total / elapsed, 1) if elapsed > 0 else 0.0,
+            "rate_limit_wait_seconds": round(self.limiter.waited_seconds, 2)
+        }
+
+    def clear_checkpoint(self):
+        """ล้าง checkpoint หลัง sync สำเร็จ (vector อยู่ใน Qdrant แล้ว)"""
+        if self.checkpoint is not None:
+            self.checkpoint.clear()
@@ -0,0 +1,120 @@
+"""
+Embedding Provider
+เลือกโมเดล embedding ตาม Settings (ใช้ร่วมกันระหว่าง RAGService และ scripts/ingest_data.py)
+
+- openai: OpenAIEmbeddings (ค่าเริ่มต้น)
+- local:  sentence-transformers บน CPU (รองรับภาษาไทย, ไม่ต้องเรียก API)
+          ต้องติดตั้งเพิ่ม: pip install sentence-transformers
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from app.config import settings
+
+
+# ขนาด vector ของโมเดล OpenAI ที่รู้จัก (ไม่ต้องยิง API เพื่อวัด)
+OPENAI_EMBEDDING_DIMENSIONS = {
+    "text-embedding-ada-002": 1536,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072,
+}
+
+
+class LocalSentenceTransformerEmbeddings(Embeddings):
+    """
+    Embedding ด้วย sentence-transformers บนเครื่อง
+
+    โหลดโมเดลครั้งแรกที่ใช้งาน (ไม่เพิ่ม cold start ของ API) และรัน inference
+    แบบ batch ใน thread pool ของตัวเอง เพื่อไม่บล็อก event loop
+    """
+
+    def __init__(
+        self,
+        model: str,
+        device: str = "cpu",
+        backend: str = "torch",
+        batch_size: int = 32,
+        max_workers: int = 2
+    ):
+        self.model = model
+        self.device = device
+        self.backend = backend
+        self.batch_size = batch_size
+        self._model = None
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="embedding")
+
+    def _load(self):
+        if self._model is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+            except ImportError as e:
+                raise ImportError(
+                    "EMBEDDING_PROVIDER=local ต้องติดตั้ง sentence-transformers: "
+                    "pip install sentence-transformers"
+                ) from e
+            print(f"🧠 Loading local embedding model: {self.model} ({self.device}, {self.backend})")
+            self._model = SentenceTransformer(self.model, device=self.device, backend=self.backend)
+        return self._model
+
+    @property
+    def dimension(self) -> int:
+        return self._load().get_sentence_embedding_dimension()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        vectors = self._load().encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return vectors.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await self.aembed_documents([text]))[0]
+
+
+def create_embeddings() -> Embeddings:
+    """สร้าง embedding provider ตาม settings.embedding_provider"""
+    if settings.embedding_provider == "openai":
+        return OpenAIEmbeddings(
+            model=settings.openai_embedding_model,
+            openai_api_key=settings.openai_api_key
+        )
+    if settings.embedding_provider == "local":
+        return LocalSentenceTransformerEmbeddings(
+            model=settings.local_embedding_model,
+            device=settings.local_embedding_device,
+            backend=settings.local_embedding_backend,
+            batch_size=settings.local_embedding_batch_size,
+            max_workers=settings.local_embedding_threads
+        )
+    raise ValueError(
+        f"Unknown embedding_provider: {settings.embedding_provider} "
+        f"(expected 'openai' or 'local')"
+    )
+
+
+def embedding_dimension(embeddings: Embeddings) -> int:
+    """ขนาด vector ของ provider (ใช้กำหนด VectorParams ตอนสร้าง collection)"""
+    if isinstance(embeddings, LocalSentenceTransformerEmbeddings):
+        return embeddings.dimension
+    if isinstance(embeddings, OpenAIEmbeddings):
+        if embeddings.dimensions:
+            return embeddings.dimensions
+        if embeddings.model in OPENAI_EMBEDDING_DIMENSIONS:
+            return OPENAI_EMBEDDING_DIMENSIONS[embeddings.model]
+    # โมเดลที่ไม่รู้จัก → วัดจาก vector จริง
+    return len(embeddings.embed_query("dimension probe"))
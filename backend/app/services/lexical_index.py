@@ -0,0 +1,159 @@
+"""
+Lexical Index (BM25)
+index แบบ sparse สำหรับคำที่ต้องตรงตัว เช่น "40(8)", "ThaiESGX", "กบข." ซึ่ง dense search มักพลาด
+สร้างตอน ingest (scripts/ingest_data.py) แล้วรวมกับผลของ vector search ด้วย Reciprocal Rank Fusion
+"""
+
+import json
+import math
+import os
+import re
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+# Thai tokenizer
+try:
+    from pythainlp.tokenize import word_tokenize
+    THAI_TOKENIZER_AVAILABLE = True
+except ImportError:
+    THAI_TOKENIZER_AVAILABLE = False
+    print("⚠️  PyThaiNLP not available. Install with: pip install pythainlp")
+
+
+# คำที่ต้องเก็บเป็น token เดียว (newmm จะแยก "40(8)" เป็น 40 ( 8 ))
+# - มาตรา เช่น 40(8), 47(1)
+# - คำภาษาอังกฤษ/ชื่อกองทุน เช่น ThaiESGX, SSF, RMF
+# - ตัวย่อภาษาไทย เช่น กบข., ภ.ง.ด.
+_PROTECTED_TERMS = re.compile(
+    r"(\d+\(\d+\)"
+    r"|[A-Za-z][A-Za-z0-9]*(?:[-.][A-Za-z0-9]+)*"
+    r"|(?<![\u0E00-\u0E7F])[\u0E00-\u0E7F]{1,6}\.(?:[\u0E00-\u0E7F]{1,3}\.)*)"
+)
+_WORD_CHARACTER = re.compile(r"\w")
+
+
+def tokenize(text: str) -> List[str]:
+    """ตัดคำภาษาไทยด้วย newmm โดยคงคำเฉพาะทาง (มาตรา, ตัวย่อ, ภาษาอังกฤษ) ไว้เป็น token เดียว"""
+    tokens = []
+    for i, segment in enumerate(_PROTECTED_TERMS.split(text)):
+        if not segment:
+            continue
+        if i % 2 == 1:
+            # คำที่ป้องกันไว้: ตัวย่อไทยตัดจุดออก (กบข. → กบข) ให้ตรงกับ query ที่พิมพ์ไม่มีจุด
+            tokens.append(segment.lower() if segment.isascii() else segment.replace(".", ""))
+        elif THAI_TOKENIZER_AVAILABLE:
+            tokens.extend(token.lower() for token in word_tokenize(segment, engine="newmm"))
+        else:
+            tokens.extend(segment.lower().split())
+    return [token for token in tokens if token.strip() and _WORD_CHARACTER.search(token)]
+
+
+class LexicalIndex:
+    """Okapi BM25 บน inverted index ในหน่วยความจำ"""
+
+    def __init__(self, documents: List[Document], tokenized: List[List[str]], k1: float = 1.5, b: float = 0.75):
+        self.documents = documents
+        self.tokenized = tokenized
+        self.k1 = k1
+        self.b = b
+
+        self._doc_lengths = [len(tokens) for tokens in tokenized]
+        self._avg_length = (sum(self._doc_lengths) / len(tokenized)) if tokenized else 0.0
+        self._postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        for doc_index, tokens in enumerate(tokenized):
+            for term, frequency in Counter(tokens).items():
+                self._postings[term].append((doc_index, frequency))
+
+        total = len(tokenized)
+        self._idf = {
+            term: math.log(1 + (total - len(postings) + 0.5) / (len(postings) + 0.5))
+            for term, postings in self._postings.items()
+        }
+
+    @classmethod
+    def build(cls, documents: List[Document]) -> "LexicalIndex":
+        """สร้าง index จาก chunk ที่ ingest"""
+        return cls(documents, [tokenize(doc.page_content) for doc in documents])
+
+    def __len__(self) -> int:
+        return len(self.documents)
+
+    def search(self, query: str, k: int) -> List[Document]:
+        """top-k ตามคะแนน BM25 (เฉพาะเอกสารที่มีคำใน query อย่างน้อยหนึ่งคำ)"""
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            idf = self._idf[term]
+            for doc_index, frequency in postings:
+                length_norm = 1 - self.b + self.b * self._doc_lengths[doc_index] / self._avg_length
+                scores[doc_index] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [self.documents[doc_index] for doc_index, _ in ranked]
+
+    def save(self, path: str):
+        """บันทึกเป็น JSON (เขียนไฟล์ชั่วคราวแล้ว rename)"""
+        target = Path(path)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        data = {
+            "built_at": time.time(),
+            "documents": [
+                {"page_content": doc.page_content, "metadata": doc.metadata}
+                for doc in self.documents
+            ],
+            "tokens": self.tokenized
+        }
+        tmp = target.with_suffix(f".tmp-{os.getpid()}")
+        tmp.write_text(json.dumps(data, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, target)
+
+    @classmethod
+    def load(cls, path: str) -> "LexicalIndex":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        documents = [
+            Document(page_content=item["page_content"], metadata=item.get("metadata") or {})
+            for item in data["documents"]
+        ]
+        return cls(documents, data["tokens"])
+
+    def stats(self) -> dict:
+        return {
+            "documents": len(self.documents),
+            "terms": len(self._postings),
+            "avg_document_tokens": round(self._avg_length, 1),
+            "tokenizer": "newmm" if THAI_TOKENIZER_AVAILABLE else "whitespace"
+        }
+
+
+def reciprocal_rank_fusion(result_lists: List[List[Document]], k: int = 60) -> List[Document]:
+    """
+    รวมผลค้นหาหลายชุดด้วย Reciprocal Rank Fusion: score = Σ 1 / (k + rank)
+
+    เอกสารเดียวกัน (page_content เดียวกัน) จากหลายชุดจะได้คะแนนรวมกัน
+    """
+    scores: Dict[str, float] = defaultdict(float)
+    documents: Dict[str, Document] = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results, start=1):
+            scores[doc.page_content] += 1 / (k + rank)
+            documents.setdefault(doc.page_content, doc)
+    ranked = sorted(scores, key=lambda key: scores[key], reverse=True)
+    return [documents[key] for key in ranked]
+
+
+def load_lexical_index(path: str) -> Optional[LexicalIndex]:
+    """โหลด BM25 index (คืน None ถ้ายังไม่ได้สร้างตอน ingest)"""
+    if not Path(path).exists():
+        print(f"ℹ️ No lexical index at {path} - using vector search only")
+        return None
+
+    started = time.perf_counter()
+    index = LexicalIndex.load(path)
+    print(f"🔤 Lexical index (BM25): {len(index)} chunks loaded in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return index
@@ -0,0 +1,233 @@
+"""
+Local Vector Index
+index ในหน่วยความจำของ process จาก snapshot ของ collection ใน Qdrant
+ใช้เป็น fallback เมื่อ Qdrant ล่ม หรือเป็น index หลักสำหรับ corpus ภาษีที่มีขนาดเล็ก
+
+โครงสร้าง snapshot (สร้างด้วย export_snapshot หรือ scripts/export_vector_snapshot.py):
+    current         symlink ชี้ไปยัง directory ของ version ล่าสุด (v-<timestamp>-<pid>/)
+                    แต่ละ version มีไฟล์ครบชุดด้านล่าง
+    meta.json       ขนาด, โมเดล embedding, collection ต้นทาง
+    vectors.f32     matrix float32 (count x dim) ที่ normalize แล้ว
+    payloads.json   payload ของแต่ละ point (page_content + metadata)
+    hnsw.bin        (ถ้ามี hnswlib) HNSW graph
+
+vectors ถูกเปิดแบบ np.memmap (read-only) จึงโหลดได้ในระดับมิลลิวินาที และทุก uvicorn worker
+ใช้ page cache ของ OS ชุดเดียวกัน (ไม่ copy ต่อ process)
+"""
+
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.services.context_builder import VECTOR_METADATA_KEY
+
+META_FILE = "meta.json"
+VECTORS_FILE = "vectors.f32"
+PAYLOADS_FILE = "payloads.json"
+HNSW_FILE = "hnsw.bin"
+CURRENT_LINK = "current"
+VERSION_PREFIX = "v-"
+KEEP_VERSIONS = 2  # เก็บ version ก่อนหน้าไว้หนึ่งชุด ให้ worker ที่ยังเปิดอยู่อ่านต่อได้
+
+
+def _resolve_snapshot(path: str) -> Path:
+    """directory ของ snapshot ที่ใช้งานอยู่ (ตาม symlink current หรือ layout เดิมที่ไฟล์อยู่ใน path ตรงๆ)"""
+    root = Path(path)
+    current = root / CURRENT_LINK
+    if current.exists():
+        return current.resolve()
+    return root
+
+
+def _publish_version(root: Path, version: Path):
+    """สลับ symlink current ไปยัง version ใหม่ด้วย os.replace (atomic) แล้วลบ version เก่าที่เกิน KEEP_VERSIONS"""
+    link_tmp = root / f".{CURRENT_LINK}-{os.getpid()}"
+    if link_tmp.is_symlink():
+        link_tmp.unlink()
+    os.symlink(version.name, link_tmp)
+    os.replace(link_tmp, root / CURRENT_LINK)
+
+    # ไฟล์ของ layout เดิม (ไม่มี current) ไม่ถูกอ่านอีกแล้ว - ลบทิ้งรวมถึง hnsw.bin ที่ค้างอยู่
+    for name in (META_FILE, VECTORS_FILE, PAYLOADS_FILE, HNSW_FILE):
+        (root / name).unlink(missing_ok=True)
+
+    versions = sorted(p for p in root.iterdir() if p.is_dir() and p.name.startswith(VERSION_PREFIX))
+    for stale in versions[:-KEEP_VERSIONS]:
+        if stale != version:
+            shutil.rmtree(stale, ignore_errors=True)
+
+
+def _load_hnswlib():
+    try:
+        import hnswlib
+        return hnswlib
+    except ImportError:
+        return None
+
+
+async def export_snapshot(qdrant_client, collection_name: str, path: str, model: str, batch_size: int = 256) -> dict:
+    """
+    ดึง vector + payload ทั้งหมดจาก Qdrant (AsyncQdrantClient) แล้วเขียนเป็น snapshot
+
+    เขียนทุกไฟล์ลง directory ของ version ใหม่ แล้วสลับ symlink current ทีเดียว
+    worker ที่กำลังโหลดจึงเห็นแต่ snapshot ชุดเก่าทั้งชุดหรือชุดใหม่ทั้งชุด ไม่ปนกัน
+    """
+    root = Path(path)
+    root.mkdir(parents=True, exist_ok=True)
+    version = root / f"{VERSION_PREFIX}{time.time_ns()}-{os.getpid()}"
+    tmp = root / f".tmp-{version.name}"
+    tmp.mkdir()
+
+    vectors: List[np.ndarray] = []
+    payloads: List[dict] = []
+    offset = None
+    while True:
+        points, offset = await qdrant_client.scroll(
+            collection_name=collection_name,
+            limit=batch_size,
+            offset=offset,
+            with_payload=True,
+            with_vectors=True
+        )
+        for point in points:
+            vectors.append(np.asarray(point.vector, dtype=np.float32))
+            payloads.append(point.payload or {})
+        if offset is None:
+            break
+
+    if not vectors:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise ValueError(f"Collection '{collection_name}' is empty - nothing to export")
+
+    matrix = np.vstack(vectors)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    matrix /= np.where(norms == 0, 1, norms)
+
+    matrix.tofile(tmp / VECTORS_FILE)
+    (tmp / PAYLOADS_FILE).write_text(json.dumps(payloads, ensure_ascii=False), encoding="utf-8")
+
+    hnswlib = _load_hnswlib()
+    if hnswlib is not None:
+        graph = hnswlib.Index(space="ip", dim=matrix.shape[1])
+        graph.init_index(max_elements=matrix.shape[0], ef_construction=200, M=16)
+        graph.add_items(matrix, np.arange(matrix.shape[0]))
+        graph.save_index(str(tmp / HNSW_FILE))
+
+    meta = {
+        "collection": collection_name,
+        "model": model,
+        "count": int(matrix.shape[0]),
+        "dim": int(matrix.shape[1]),
+        "exported_at": time.time(),
+        "hnsw": hnswlib is not None
+    }
+    (tmp / META_FILE).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+
+    os.replace(tmp, version)
+    _publish_version(root, version)
+    return meta
+
+
+class LocalVectorIndex:
+    """Cosine top-k บน matrix float32 ที่ memory-map (หรือ HNSW ถ้าเปิดใช้และมีไฟล์)"""
+
+    def __init__(self, path: str, use_hnsw: bool = False):
+        # resolve current ครั้งเดียว ทุกไฟล์จึงมาจาก version เดียวกันแม้มีการ export ระหว่างโหลด
+        root = _resolve_snapshot(path)
+        self.meta = json.loads((root / META_FILE).read_text(encoding="utf-8"))
+        self.model = self.meta["model"]
+        self.vectors = np.memmap(
+            root / VECTORS_FILE,
+            dtype=np.float32,
+            mode="r",
+            shape=(self.meta["count"], self.meta["dim"])
+        )
+        self.documents = [
+            Document(page_content=payload.get("page_content", ""), metadata=payload.get("metadata") or {})
+            for payload in json.loads((root / PAYLOADS_FILE).read_text(encoding="utf-8"))
+        ]
+
+        self._hnsw = None
+        if use_hnsw and not self.meta.get("hnsw"):
+            print("⚠️ local_index_use_hnsw=True but the snapshot has no HNSW graph - using exact search")
+        elif use_hnsw:
+            hnswlib = _load_hnswlib()
+            if hnswlib is None:
+                print("⚠️ local_index_use_hnsw=True but hnswlib is not installed - using exact search")
+            else:
+                self._hnsw = hnswlib.Index(space="ip", dim=self.meta["dim"])
+                self._hnsw.load_index(str(root / HNSW_FILE), max_elements=self.meta["count"])
+                self._hnsw.set_ef(64)
+
+    def __len__(self) -> int:
+        return self.meta["count"]
+
+    def _result(self, indices, with_vectors: bool) -> List[Document]:
+        if not with_vectors:
+            return [self.documents[i] for i in indices]
+        return [
+            Document(
+                page_content=self.documents[i].page_content,
+                metadata={**self.documents[i].metadata, VECTOR_METADATA_KEY: self.vectors[i]}
+            )
+            for i in indices
+        ]
+
+    def search_batch(
+        self,
+        query_vectors: List[List[float]],
+        k: int,
+        with_vectors: bool = False
+    ) -> List[List[Document]]:
+        """ค้นหา top-k ของหลาย query พร้อมกัน (เรียง score จากมากไปน้อย)"""
+        queries = np.asarray(query_vectors, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries /= np.where(norms == 0, 1, norms)
+        k = min(k, len(self))
+
+        if self._hnsw is not None:
+            labels, _ = self._hnsw.knn_query(queries, k=k)
+            return [self._result(row, with_vectors) for row in labels]
+
+        scores = queries @ self.vectors.T
+        if k < scores.shape[1]:
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(scores.shape[1]), (scores.shape[0], 1))
+        results = []
+        for row_scores, row_top in zip(scores, top):
+            ordered = row_top[np.argsort(-row_scores[row_top])]
+            results.append(self._result(ordered, with_vectors))
+        return results
+
+    def stats(self) -> dict:
+        return {
+            "points": self.meta["count"],
+            "dim": self.meta["dim"],
+            "model": self.model,
+            "exported_at": self.meta["exported_at"],
+            "search": "hnsw" if self._hnsw is not None else "exact"
+        }
+
+
+def load_local_index(path: str, model: str, use_hnsw: bool = False) -> Optional[LocalVectorIndex]:
+    """โหลด snapshot (คืน None ถ้าไม่มีไฟล์ หรือโมเดล embedding ไม่ตรงกัน)"""
+    if not (_resolve_snapshot(path) / META_FILE).exists():
+        print(f"ℹ️ No local vector snapshot at {path}")
+        return None
+
+    started = time.perf_counter()
+    index = LocalVectorIndex(path, use_hnsw=use_hnsw)
+    if index.model != model:
+        print(f"⚠️ Local vector snapshot was built with '{index.model}' but embeddings use '{model}' - ignoring it")
+        return None
+
+    print(f"📂 Local vector index: {len(index)} points ({index.stats()['search']}) "
+          f"loaded in {(time.perf_counter() - started) * 1000:.1f} ms")
+    return index
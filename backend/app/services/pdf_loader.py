@@ -0,0 +1,258 @@
+"""
+PDF Loader
+ดึงข้อความจาก PDF (เช่น Tax_document/) ทีละหน้าด้วย process pool สำหรับ ingestion
+
+- งานถูกแบ่งเป็นช่วงหน้า (PAGES_PER_TASK) ไฟล์ใหญ่ไฟล์เดียวจึงใช้หลาย process ได้
+- ผลการดึงข้อความถูก cache ตาม sha256 ของไฟล์ (ไฟล์ไม่เปลี่ยน → ไม่ต้องแกะ PDF ใหม่)
+- แต่ละหน้าเป็น Document หนึ่งตัว มี page (เริ่มที่ 1) ใน metadata เพื่ออ้างอิงแหล่งที่มา
+- iter_pdf_documents ส่ง Document ออกทีละไฟล์ ใช้กับ ingestion แบบ streaming ได้
+- PDF ที่เปิดได้แต่ไม่มีข้อความเลย (เช่น สแกนเป็นภาพ) ถือว่าโหลดไม่สำเร็จ เหมือนไฟล์ที่อ่านไม่ได้
+
+ต้องติดตั้ง pypdf
+"""
+
+import hashlib
+import json
+import os
+import re
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from pathlib import Path
+from typing import Deque, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from app.config import settings
+
+
+# จำนวนหน้าต่องานหนึ่งชิ้นใน process pool
+PAGES_PER_TASK = 16
+
+
+def _import_pypdf():
+    try:
+        import pypdf
+        return pypdf
+    except ImportError as e:
+        raise ImportError("การ ingest PDF ต้องติดตั้ง pypdf: pip install pypdf") from e
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def normalize_pdf_text(text: str) -> str:
+    """
+    แก้ข้อความไทยที่มักเพี้ยนจาก PDF
+
+    - สระอำถูกแยกเป็นนิคหิต + สระอา (ํา) → ำ
+    - ช่องว่าง/บรรทัดว่างซ้ำ ๆ ยุบให้เหลือชุดเดียว
+    """
+    text = text.replace("ํา", "ำ").replace("ํ า", "ำ")
+    text = re.sub(r"[ \t\u00a0]+", " ", text)
+    text = re.sub(r" *\n *", "\n", text)
+    text = re.sub(r"\n{3,}", "\n\n", text)
+    return text.strip()
+
+
+def resolve_pdf_workers(max_workers: Optional[int] = None) -> int:
+    """จำนวน process (None/0 = ตาม settings.ingest_pdf_workers หรือจำนวน CPU)"""
+    return max_workers or settings.ingest_pdf_workers or os.cpu_count() or 1
+
+
+def _warm_up_worker():
+    try:
+        _import_pypdf()
+    except ImportError:
+        pass  # iter_pdf_documents รายงาน ImportError เองตอน count_pages
+
+
+def create_pdf_executor(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """
+    process pool สำหรับ iter_pdf_documents (สร้างครั้งเดียวที่ entry point ของ ingest แล้วส่งต่อ)
+
+    ส่งงานเปล่าให้ทุก process ทันที worker จึงถูก spawn จาก thread ที่สร้าง pool
+    ไม่ใช่จาก thread ของขั้น load ที่เรียก submit ครั้งแรก
+    """
+    max_workers = resolve_pdf_workers(max_workers)
+    print(f"Extracting PDFs with {max_workers} processes...")
+    executor = ProcessPoolExecutor(max_workers=max_workers)
+    for future in [executor.submit(_warm_up_worker) for _ in range(max_workers)]:
+        future.result()
+    return executor
+
+
+def count_pages(path: str) -> int:
+    return len(_import_pypdf().PdfReader(path).pages)
+
+
+def extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    """ข้อความของหน้า [start, stop) (รันใน worker process)"""
+    reader = _import_pypdf().PdfReader(path)
+    pages = []
+    for index in range(start, min(stop, len(reader.pages))):
+        try:
+            pages.append(normalize_pdf_text(reader.pages[index].extract_text() or ""))
+        except Exception as e:
+            print(f"⚠️ {os.path.basename(path)} page {index + 1}: {e}")
+            pages.append("")
+    return pages
+
+
+class PdfTextCache:
+    """ข้อความรายหน้าของ PDF ที่ดึงแล้ว เก็บเป็น JSON ต่อ hash ของไฟล์"""
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, digest: str) -> Path:
+        return self.directory / f"{digest}.json"
+
+    def get(self, digest: str) -> Optional[List[str]]:
+        try:
+            return json.loads(self._path(digest).read_text(encoding="utf-8"))["pages"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def set(self, digest: str, pages: List[str]):
+        path = self._path(digest)
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"pages": pages}, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+
+def _page_documents(path: str, digest: str, pages: List[str]) -> Iterator[Document]:
+    """Document ต่อหน้า (หน้าว่างถูกข้าม)"""
+    for number, text in enumerate(pages, start=1):
+        if not text:
+            continue
+        yield Document(
+            page_content=text,
+            metadata={
+                "source": os.path.basename(path),
+                "file_path": path,
+                "file_hash": digest,
+                "page": number,
+                "total_pages": len(pages)
+            }
+        )
+
+
+def iter_pdf_documents(
+    paths: List[str],
+    max_workers: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+    failed: Optional[List[str]] = None,
+    executor: Optional[ProcessPoolExecutor] = None
+) -> Iterator[Document]:
+    """
+    Document ต่อหน้าของ PDF ทีละไฟล์ตามลำดับ (หน้าว่างถูกข้าม)
+
+    ส่งช่วงหน้าเข้า process pool ล่วงหน้าไม่เกิน max_workers × 2 งาน
+    ข้อความที่ค้างในหน่วยความจำจึงจำกัดอยู่ที่ไม่กี่ไฟล์ ไม่ว่าจะมี PDF กี่ไฟล์
+
+    Args:
+        max_workers: จำนวน process (None/0 = ตาม settings.ingest_pdf_workers หรือจำนวน CPU)
+        cache_dir: ที่เก็บ cache (None = settings.pdf_text_cache_dir, "" = ไม่ใช้ cache)
+        failed: รับ path ของไฟล์ที่อ่าน/ดึงข้อความไม่สำเร็จ หรือไม่มีข้อความเลย (ไฟล์นั้นไม่มี Document ออกมา)
+        executor: pool จาก create_pdf_executor (None = สร้างเองเมื่อต้องใช้ แล้วปิดเมื่อจบ)
+    """
+    if not paths:
+        return
+    if cache_dir is None:
+        cache_dir = settings.pdf_text_cache_dir
+    cache = PdfTextCache(cache_dir) if cache_dir else None
+    max_workers = resolve_pdf_workers(max_workers)
+    window = max_workers * 2
+    owns_executor = executor is None
+
+    # ไฟล์ที่รอส่งออกตามลำดับ: (path, hash, ข้อความจาก cache หรือ None, futures ของช่วงหน้า)
+    pending: Deque[Tuple[str, str, Optional[List[str]], List[Future]]] = deque()
+    in_flight = 0
+
+    def fail(path: str, error: Exception):
+        print(f"✗ Error loading {path}: {error}")
+        if failed is not None:
+            failed.append(path)
+
+    def finish(job) -> Iterator[Document]:
+        nonlocal in_flight
+        path, digest, pages, futures = job
+        if pages is None:
+            # futures ของไฟล์เดียวกันเรียงตามหน้าอยู่แล้ว ต่อผลตามลำดับที่ส่งจึงได้หน้าเรียงถูกต้อง
+            in_flight -= len(futures)
+            pages = []
+            try:
+                for future in futures:
+                    pages.extend(future.result())
+            except Exception as e:
+                fail(path, e)
+                return
+            if cache:
+                cache.set(digest, pages)
+            print(f"✓ Extracted: {os.path.basename(path)} ({len(pages)} pages)")
+        if not any(pages):
+            # ถ้าส่งออกแบบไม่มี Document เลย incremental sync จะลบ chunk เดิมของไฟล์นี้ทิ้ง
+            fail(path, ValueError("no extractable text (scanned or image-only PDF?)"))
+            return
+        yield from _page_documents(path, digest, pages)
+
+    try:
+        for path in paths:
+            try:
+                digest = file_hash(path)
+            except OSError as e:
+                fail(path, e)
+                continue
+            cached = cache.get(digest) if cache else None
+            if cached is not None:
+                print(f"✓ Cached: {os.path.basename(path)} ({len(cached)} pages)")
+                pending.append((path, digest, cached, []))
+            else:
+                try:
+                    total = count_pages(path)
+                except ImportError:
+                    raise
+                except Exception as e:
+                    fail(path, e)
+                    continue
+                if executor is None:
+                    executor = create_pdf_executor(max_workers)
+                # แบ่งเป็นช่วงหน้า ไฟล์ใหญ่ไฟล์เดียวจึงกระจายไปหลาย process ได้
+                futures = [
+                    executor.submit(extract_page_range, path, start, start + PAGES_PER_TASK)
+                    for start in range(0, total, PAGES_PER_TASK)
+                ]
+                in_flight += len(futures)
+                pending.append((path, digest, None, futures))
+
+            # ส่งออกไฟล์หน้าคิวทันทีถ้ามาจาก cache หรือเมื่องานค้าง (ช่วงหน้า + ไฟล์ที่รอ) เต็ม window
+            while pending and (pending[0][2] is not None or in_flight + len(pending) > window):
+                yield from finish(pending.popleft())
+
+        while pending:
+            yield from finish(pending.popleft())
+    finally:
+        if executor is not None:
+            if owns_executor:
+                executor.shutdown(cancel_futures=True)
+            else:
+                # pool ของผู้เรียกใช้ต่อได้ - ยกเลิกเฉพาะงานที่ยังค้างของรอบนี้
+                for _, _, _, futures in pending:
+                    for future in futures:
+                        future.cancel()
+
+
+def load_pdf_documents(
+    paths: List[str],
+    max_workers: Optional[int] = None,
+    cache_dir: Optional[str] = None,
+    failed: Optional[List[str]] = None
+) -> List[Document]:
+    """Document ต่อหน้าของ PDF ทุกไฟล์ในรูป list (ดู iter_pdf_documents)"""
+    return list(iter_pdf_documents(paths, max_workers=max_workers, cache_dir=cache_dir, failed=failed))
@@ -0,0 +1,96 @@
+"""
+Precomputed Retrieval
+query ของ RAG ขึ้นกับรายได้และระดับความเสี่ยงเท่านั้น จึงคำนวณผลค้นหาล่วงหน้า
+สำหรับทุกคู่ (ช่วงรายได้, ระดับความเสี่ยง) แล้วตอบจาก dict แทนการ embed + ค้นหาทุก request
+
+ช่วงรายได้ใช้ชุดเดียวกับ tier เงินลงทุน (TaxCalculatorService.INVESTMENT_TIERS)
+ความแม่นยำเทียบกับการค้นหาจริงวัดได้ด้วย scripts/benchmark_precomputed_retrieval.py
+"""
+
+import time
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+from app.services.tax_calculator import tax_calculator_service
+
+
+RISK_LEVELS = ("low", "medium", "high")
+
+
+def build_retrieval_query(gross_income: int, risk_tolerance: str) -> str:
+    """สร้าง query สำหรับค้นหาเอกสารจาก Qdrant"""
+    return f"""
+            รายได้ {gross_income} บาท
+            ระดับความเสี่ยง {risk_tolerance}
+            ต้องการวางแผนภาษีและลงทุน
+            มีครอบครัว บุตร บิดามารดา
+            """
+
+
+def representative_incomes() -> List[int]:
+    """รายได้ตัวแทนของแต่ละช่วง (จุดกึ่งกลาง, ช่วงสุดท้ายใช้ 4/3 ของขอบล่าง)"""
+    incomes = []
+    lower = 0
+    for limit, _ in tax_calculator_service.INVESTMENT_TIERS:
+        if limit == float('inf'):
+            incomes.append(int(lower * 4 / 3))
+        else:
+            incomes.append(int((lower + limit) / 2))
+            lower = int(limit)
+    return incomes
+
+
+class PrecomputedRetrieval:
+    """ตารางผลค้นหา top-k ต่อ (ช่วงรายได้, ระดับความเสี่ยง)"""
+
+    def __init__(self):
+        self._results: Dict[Tuple[int, str], List[Document]] = {}
+        self.k: Optional[int] = None
+        self.built_at: Optional[float] = None
+        self.source_points_count: Optional[int] = None
+        self.hits = 0
+        self.misses = 0
+
+    def combinations(self) -> List[Tuple[Tuple[int, str], str]]:
+        """คู่ (bracket, risk) ทั้งหมดพร้อม query ตัวแทน"""
+        return [
+            ((bracket, risk), build_retrieval_query(income, risk))
+            for bracket, income in enumerate(representative_incomes())
+            for risk in RISK_LEVELS
+        ]
+
+    def load(self, results: Dict[Tuple[int, str], List[Document]], k: int, points_count: Optional[int]):
+        """แทนที่ตารางทั้งชุด (สลับ reference เดียว ผู้อ่านจึงไม่เห็นตารางครึ่งๆ กลางๆ)"""
+        self._results = results
+        self.k = k
+        self.built_at = time.time()
+        self.source_points_count = points_count
+
+    def lookup(self, gross_income: int, risk_tolerance: str, k: int) -> Optional[List[Document]]:
+        """คืนเอกสารที่คำนวณไว้ หรือ None ถ้าไม่มี (ยังไม่ build, k ไม่ตรง, risk ไม่รู้จัก)"""
+        docs = None
+        if self.k == k:
+            docs = self._results.get(
+                (tax_calculator_service.get_income_bracket(gross_income), risk_tolerance)
+            )
+        if docs is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return list(docs)
+
+    def is_ready(self) -> bool:
+        return bool(self._results)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._results),
+            "k": self.k,
+            "built_at": self.built_at,
+            "source_points_count": self.source_points_count,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
@@ -0,0 +1,69 @@
+"""
+Qdrant Client Pool
+AsyncQdrantClient ตัวเดียวต่อ process ใช้ร่วมกันทั้งฝั่ง API (RAGService) และ ingestion
+
+- REST: httpx connection pool ขนาด qdrant_pool_size พร้อม keep-alive
+  (ค่าเริ่มต้นของ qdrant-client ปิด keep-alive เมื่อ host เป็น localhost ทำให้เปิด connection ใหม่ทุก request)
+- gRPC (qdrant_prefer_grpc=True): HTTP/2 channel เดียวที่ multiplex ทุก request พร้อม keep-alive ping
+"""
+
+from typing import Optional
+
+import httpx
+from qdrant_client import AsyncQdrantClient
+
+from app.config import settings
+
+
+_client: Optional[AsyncQdrantClient] = None
+
+
+def create_async_qdrant_client(prefer_grpc: Optional[bool] = None, location: Optional[str] = None) -> AsyncQdrantClient:
+    """สร้าง AsyncQdrantClient ตาม Settings (location=":memory:" สำหรับ benchmark)"""
+    if location is not None:
+        return AsyncQdrantClient(location=location)
+
+    if prefer_grpc is None:
+        prefer_grpc = settings.qdrant_prefer_grpc
+    keepalive_ms = int(settings.qdrant_keepalive_seconds * 1000)
+
+    return AsyncQdrantClient(
+        url=settings.qdrant_url,
+        grpc_port=settings.qdrant_grpc_port,
+        prefer_grpc=prefer_grpc,
+        timeout=settings.qdrant_timeout_seconds,
+        # ไม่ตรวจ version ตอนสร้าง client (เป็น HTTP call แบบ blocking และ client ถูก pin version ไว้แล้ว)
+        check_compatibility=False,
+        limits=httpx.Limits(
+            max_connections=settings.qdrant_pool_size,
+            max_keepalive_connections=settings.qdrant_pool_size,
+            keepalive_expiry=settings.qdrant_keepalive_seconds
+        ),
+        grpc_options={
+            "grpc.keepalive_time_ms": keepalive_ms,
+            "grpc.keepalive_timeout_ms": 10000,
+            "grpc.keepalive_permit_without_calls": 1,
+            "grpc.http2.max_pings_without_data": 0
+        }
+    )
+
+
+def get_async_qdrant_client() -> AsyncQdrantClient:
+    """client ที่ใช้ร่วมกันทั้ง process (สร้างครั้งแรกที่เรียก)"""
+    global _client
+    if _client is None:
+        _client = create_async_qdrant_client()
+        transport = "gRPC" if settings.qdrant_prefer_grpc else "REST"
+        print(f"🔌 Qdrant client: {settings.qdrant_url} via {transport} (pool {settings.qdrant_pool_size})")
+    return _client
+
+
+async def close_async_qdrant_client():
+    """ปิด client ที่ใช้ร่วมกัน (เรียกตอน shutdown หรือก่อน reconnect)"""
+    global _client
+    if _client is not None:
+        client, _client = _client, None
+        try:
+            await client.close()
+        except Exception:
+            pass
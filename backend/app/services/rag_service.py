@@ -3,40 +3,77 @@ RAG Service - Qdrant Version
 Version: Support Qdrant Vector Database
 """
 
-from langchain_openai import OpenAIEmbeddings
-from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
-from typing import List
+from langchain_core.documents import Document
+from qdrant_client.models import QueryRequest
+from typing import List, Optional
+import asyncio
+import os
+import time
 import traceback
 
 from app.config import settings
+from app.metrics import stage_timer, RAG_FAILURES
+from app.services.embedding_cache import create_embedding_cache
+from app.services.embedding_provider import create_embeddings, embedding_dimension
+from app.services.precomputed_retrieval import PrecomputedRetrieval
+from app.services.local_index import load_local_index
+from app.services.lexical_index import load_lexical_index, reciprocal_rank_fusion
+from app.services.context_builder import VECTOR_METADATA_KEY
+from app.services.collection_config import build_search_params
+from app.services.qdrant_pool import get_async_qdrant_client, close_async_qdrant_client
+
+
+def _file_mtime(path: str) -> Optional[float]:
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
 
 
 class RAGService:
     """RAG Service สำหรับ Qdrant Vector Database"""
     
-    def __init__(self):
-        self.embeddings = OpenAIEmbeddings(
-            openai_api_key=settings.openai_api_key
-        )
-        self.vector_store = None
-        self.qdrant_client = None
-        self._connect_to_qdrant()
+    def __init__(self, auto_connect: bool = True):
+        """
+        Args:
+            auto_connect: เชื่อมต่อ Qdrant อัตโนมัติตอนค้นหาครั้งแรก ใช้กับ script
+                ฝั่ง API ให้ส่ง False แล้วเรียก run_connection_monitor() ใน lifespan แทน
+        """
+        self.embeddings = create_embeddings()
+        self.embedding_cache = create_embedding_cache(self.embeddings.model)
+        self.collection_ready = False
+        self.async_qdrant_client = None
+        self._auto_connect = auto_connect
+        self.first_connected_at: Optional[float] = None
+        self.last_connected_at: Optional[float] = None
+        self._wakeup = asyncio.Event()
+        # ข้อมูล collection ที่ cache ไว้ให้ /health (อัปเดตโดย run_collection_info_refresher)
+        self._collection_info: dict = {"status": "not_connected"}
+        self._collection_info_updated_at: Optional[float] = None
+        self.precomputed = PrecomputedRetrieval() if settings.rag_precompute_enabled else None
+        self.local_index = None
+        if settings.local_index_mode != "off":
+            self.local_index = load_local_index(
+                settings.local_index_path,
+                self.embeddings.model,
+                use_hnsw=settings.local_index_use_hnsw
+            )
+        self.lexical_index = None
+        self._lexical_index_mtime: Optional[float] = None
+        if settings.hybrid_search_enabled:
+            self._lexical_index_mtime = _file_mtime(settings.lexical_index_path)
+            self.lexical_index = load_lexical_index(settings.lexical_index_path)
     
-    def _connect_to_qdrant(self):
-        """เชื่อมต่อกับ Qdrant"""
+    async def connect(self, verbose: bool = True) -> bool:
+        """เชื่อมต่อกับ Qdrant ผ่าน client ที่ใช้ร่วมกัน (คืน True ถ้า collection พร้อมใช้งาน)"""
         try:
             print(f"🔍 Connecting to Qdrant at: {settings.qdrant_url}")
             print(f"📦 Collection: {settings.qdrant_collection_name}")
             
-            # สร้าง Qdrant Client
-            self.qdrant_client = QdrantClient(
-                url=settings.qdrant_url,
-                timeout=10
-            )
+            client = get_async_qdrant_client()
             
             # ตรวจสอบว่า Collection มีอยู่หรือไม่
-            collections = self.qdrant_client.get_collections()
+            collections = await client.get_collections()
             collection_names = [c.name for c in collections.collections]
             
             print(f"📋 Available collections: {collection_names}")
@@ -45,25 +82,192 @@ class RAGService:
                 print(f"❌ Collection '{settings.qdrant_collection_name}' not found!")
                 print(f"💡 Available collections: {collection_names}")
                 print(f"💡 Please check your QDRANT_COLLECTION_NAME in .env")
-                self.vector_store = None
-                return
+                self.collection_ready = False
+                return False
             
-            # สร้าง Vector Store
-            self.vector_store = QdrantVectorStore(
-                client=self.qdrant_client,
-                collection_name=settings.qdrant_collection_name,
-                embedding=self.embeddings
-            )
+            self.async_qdrant_client = client
+            await self._check_vector_size()
+            
+            self.collection_ready = True
+            self.last_connected_at = time.time()
+            if self.first_connected_at is None:
+                self.first_connected_at = self.last_connected_at
             
             print(f"✅ Qdrant Vector Store connected successfully!")
+            return True
             
         except Exception as e:
             print(f"❌ Failed to connect to Qdrant: {e}")
-            print(f"💡 Make sure Qdrant is running at: {settings.qdrant_url}")
-            print(f"💡 Start Qdrant: docker run -p 6333:6333 qdrant/qdrant")
-            traceback.print_exc()
-            self.vector_store = None
-            self.qdrant_client = None
+            if verbose:
+                print(f"💡 Make sure Qdrant is running at: {settings.qdrant_url}")
+                print(f"💡 Start Qdrant: docker run -p 6333:6333 qdrant/qdrant")
+                traceback.print_exc()
+            self.collection_ready = False
+            self.async_qdrant_client = None
+            return False
+    
+    async def _ensure_connected(self):
+        """โหมด auto_connect: เชื่อมต่อครั้งแรกที่มีการค้นหา"""
+        if self._auto_connect:
+            self._auto_connect = False
+            await self.connect()
+    
+    async def _check_vector_size(self):
+        """เตือนถ้าขนาด vector ของ collection ไม่ตรงกับ embedding provider (ต้อง ingest ใหม่)"""
+        try:
+            collection = await self.async_qdrant_client.get_collection(
+                collection_name=settings.qdrant_collection_name
+            )
+            collection_size = collection.config.params.vectors.size
+            # โมเดล local ต้องโหลดก่อนจึงรู้ขนาด → ทำใน thread
+            provider_size = await asyncio.to_thread(embedding_dimension, self.embeddings)
+        except Exception as e:
+            print(f"⚠️ Could not verify vector size: {e}")
+            return
+        if collection_size != provider_size:
+            print(f"⚠️ Vector size mismatch: collection has {collection_size}, "
+                  f"{settings.embedding_provider} embeddings produce {provider_size} "
+                  f"- re-run scripts/ingest_data.py")
+    
+    async def run_connection_monitor(self):
+        """
+        Background task สำหรับ lifespan ของ API
+        
+        - เชื่อมต่อ Qdrant แบบ async (ไม่บล็อกการ boot ของ worker)
+        - ถ้าไม่สำเร็จจะ retry แบบ exponential backoff
+        - เมื่อเชื่อมต่อแล้วจะตรวจสุขภาพเป็นระยะ และ reconnect อัตโนมัติเมื่อ Qdrant กลับมา
+        """
+        delay = settings.qdrant_retry_initial_seconds
+        attempt = 0
+        
+        while True:
+            if not self.collection_ready:
+                attempt += 1
+                await self.close()
+                if await self.connect(verbose=attempt == 1):
+                    attempt = 0
+                    await self.refresh_collection_info()
+                    delay = settings.qdrant_retry_initial_seconds
+                    continue
+                
+                print(f"🔁 Qdrant not ready - retry #{attempt} in {delay:.1f} s")
+                await self._wait_for_wakeup(delay)
+                delay = min(delay * 2, settings.qdrant_retry_max_seconds)
+                continue
+            
+            await self._wait_for_wakeup(settings.qdrant_health_check_interval_seconds)
+            if not await self._ping():
+                print("⚠️ Lost connection to Qdrant - reconnecting in background")
+                self.collection_ready = False
+                await self.refresh_collection_info()
+    
+    async def run_collection_info_refresher(self):
+        """
+        Background task อัปเดตข้อมูล collection ทุก qdrant_collection_info_ttl_seconds
+        
+        /health อ่านค่าที่ cache ไว้เท่านั้น จึงไม่ยิง Qdrant ทุกครั้งที่ probe
+        """
+        while True:
+            await asyncio.sleep(settings.qdrant_collection_info_ttl_seconds)
+            await self.refresh_collection_info()
+    
+    async def refresh_collection_info(self):
+        """ดึงข้อมูล Collection จาก Qdrant (async) แล้วเก็บลง cache"""
+        if not self.collection_ready or self.async_qdrant_client is None:
+            info = {"status": "not_connected"}
+        else:
+            try:
+                collection = await self.async_qdrant_client.get_collection(
+                    collection_name=settings.qdrant_collection_name
+                )
+                info = {
+                    "status": "connected",
+                    "name": settings.qdrant_collection_name,
+                    "points_count": collection.points_count,
+                    "vectors_count": collection.vectors_count
+                }
+            except Exception as e:
+                info = {
+                    "status": "error",
+                    "error": str(e)
+                }
+        self._collection_info = info
+        self._collection_info_updated_at = time.time()
+        
+        await self.reload_lexical_index_if_changed()
+        
+        # collection เปลี่ยน (เช่น ingest ข้อมูลใหม่) → คำนวณผลค้นหาล่วงหน้าใหม่
+        if (
+            self.precomputed is not None
+            and info["status"] == "connected"
+            and info["points_count"] != self.precomputed.source_points_count
+        ):
+            await self.rebuild_precomputed(info["points_count"])
+    
+    async def reload_lexical_index_if_changed(self):
+        """โหลด BM25 index ใหม่เมื่อไฟล์ถูกเขียนทับ (ingest สร้าง index ใหม่ขณะที่ server ทำงานอยู่)"""
+        if not settings.hybrid_search_enabled:
+            return
+        mtime = _file_mtime(settings.lexical_index_path)
+        if mtime is None or mtime == self._lexical_index_mtime:
+            return
+        try:
+            # parse JSON + สร้าง postings ใช้ CPU → ทำใน thread ไม่บล็อก event loop
+            index = await asyncio.to_thread(load_lexical_index, settings.lexical_index_path)
+        except Exception as e:
+            print(f"⚠️ Lexical index reload failed: {e}")
+            return
+        self.lexical_index = index
+        self._lexical_index_mtime = mtime
+    
+    async def rebuild_precomputed(self, points_count: Optional[int] = None, k: Optional[int] = None):
+        """ค้นหาทุกคู่ (ช่วงรายได้, ความเสี่ยง) ในครั้งเดียวแล้วเก็บเป็นตาราง lookup (top-k, ค่าเริ่มต้น rag_top_k)"""
+        if self.precomputed is None or not self.collection_ready:
+            return
+        
+        k = k or settings.rag_top_k
+        combinations = self.precomputed.combinations()
+        started = time.perf_counter()
+        try:
+            docs_per_query = await self._search_batch([query for _, query in combinations], k)
+        except Exception as e:
+            print(f"❌ Precomputed retrieval build failed: {e}")
+            return
+        
+        self.precomputed.load(
+            {key: docs for (key, _), docs in zip(combinations, docs_per_query)},
+            k,
+            points_count
+        )
+        print(f"⚡ Precomputed retrieval: {len(combinations)} (income bracket, risk) combinations "
+              f"in {(time.perf_counter() - started) * 1000:.0f} ms")
+    
+    async def _ping(self) -> bool:
+        """ตรวจว่า Qdrant ยังตอบสนองและ collection ยังอยู่"""
+        try:
+            return await self.async_qdrant_client.collection_exists(
+                collection_name=settings.qdrant_collection_name
+            )
+        except Exception as e:
+            print(f"❌ Qdrant health check failed: {e}")
+            return False
+    
+    async def _wait_for_wakeup(self, timeout: float):
+        """รอจนครบเวลา หรือจนมีการเรียก request_health_check()"""
+        try:
+            await asyncio.wait_for(self._wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        self._wakeup.clear()
+    
+    def request_health_check(self):
+        """ขอให้ monitor ตรวจสุขภาพ Qdrant ทันที (เช่น หลังค้นหาผิดพลาด)"""
+        self._wakeup.set()
+    
+    async def close(self):
+        """ปิด client ที่ใช้ร่วมกัน (reconnect จะสร้าง connection pool ใหม่)"""
+        self.async_qdrant_client = None
+        await close_async_qdrant_client()
     
     async def retrieve_relevant_documents(
         self, 
@@ -80,7 +284,8 @@ class RAGService:
         Returns:
             List ของเอกสาร
         """
-        if self.vector_store is None:
+        await self._ensure_connected()
+        if not self.is_available():
             print("⚠️ Qdrant Vector Store not available - returning empty list")
             return []
         
@@ -90,9 +295,13 @@ class RAGService:
         try:
             print(f"🔍 Searching Qdrant for: '{query[:50]}...' (top {k})")
             
-            docs = self.vector_store.similarity_search(query, k=k)
+            # Embed แบบ async (OpenAI async client) แล้วค้นหาด้วย AsyncQdrantClient
+            # ทั้งสองขั้นตอนไม่บล็อก event loop จึงรองรับหลาย request พร้อมกันได้
+            with stage_timer("query_embedding"):
+                query_vector = (await self._embed_queries([query]))[0]
+            docs = (await self._hybrid_search([query], [query_vector], k))[0]
             
-            print(f"✅ Retrieved {len(docs)} documents from Qdrant")
+            print(f"✅ Retrieved {len(docs)} documents")
             
             # แสดง snippet ของเอกสารที่ได้
             for i, doc in enumerate(docs[:2]):  # แสดง 2 docs แรก
@@ -103,30 +312,183 @@ class RAGService:
             
         except Exception as e:
             print(f"❌ Qdrant retrieval error: {e}")
+            RAG_FAILURES.labels(reason="retrieval_error").inc()
             traceback.print_exc()
+            self.request_health_check()
             return []
     
-    def is_available(self) -> bool:
-        """ตรวจสอบว่า Qdrant Vector Store พร้อมใช้งานหรือไม่"""
-        return self.vector_store is not None
+    async def retrieve_relevant_documents_batch(
+        self,
+        queries: List[str],
+        k: int = None
+    ) -> List[List[Document]]:
+        """
+        ดึงเอกสารสำหรับหลาย query ในครั้งเดียว (ใช้กับ batch endpoint)
+        
+        query ที่ซ้ำกันจะถูก embed/ค้นหาเพียงครั้งเดียว โดย embed ทั้งหมดใน
+        request เดียว และค้นหาด้วย query_batch_points ครั้งเดียว
+        
+        Returns:
+            List ของเอกสารตามลำดับของ queries (ผิดพลาด → list ว่าง)
+        """
+        await self._ensure_connected()
+        if not self.is_available() or not queries:
+            return [[] for _ in queries]
+        
+        if k is None:
+            k = settings.rag_top_k
+        
+        try:
+            return await self._search_batch(queries, k)
+        except Exception as e:
+            print(f"❌ Qdrant batch retrieval error: {e}")
+            RAG_FAILURES.labels(reason="retrieval_error").inc()
+            traceback.print_exc()
+            self.request_health_check()
+            return [[] for _ in queries]
     
-    def get_collection_info(self) -> dict:
-        """ดึงข้อมูล Collection"""
-        if self.qdrant_client is None:
-            return {"status": "not_connected"}
+    async def _search_batch(self, queries: List[str], k: int) -> List[List[Document]]:
+        """embed + ค้นหาหลาย query ด้วย query_batch_points ครั้งเดียว (ผิดพลาด → raise)"""
+        unique_queries = list(dict.fromkeys(queries))
+        print(f"🔍 Batch searching Qdrant: {len(queries)} queries ({len(unique_queries)} unique, top {k})")
+        
+        with stage_timer("query_embedding"):
+            vectors = await self._embed_queries(unique_queries)
+        docs_per_query = await self._hybrid_search(unique_queries, vectors, k)
+        docs_by_query = dict(zip(unique_queries, docs_per_query))
+        
+        print(f"✅ Batch retrieved documents for {len(unique_queries)} unique queries")
+        return [list(docs_by_query[query]) for query in queries]
+    
+    async def _hybrid_search(
+        self,
+        queries: List[str],
+        vectors: List[List[float]],
+        k: int
+    ) -> List[List[Document]]:
+        """
+        Vector search (+ BM25 ถ้ามี lexical index) แล้วรวมด้วย Reciprocal Rank Fusion
+        
+        แต่ละวิธีดึง hybrid_candidates อันดับแรก แล้วตัดเหลือ k หลังรวม
+        คำเฉพาะทาง เช่น "40(8)" หรือ "กบข." ที่ dense search พลาดจะถูกดึงขึ้นมาด้วย BM25
+        """
+        if self.lexical_index is None:
+            with stage_timer("qdrant_search"):
+                return await self._search_vectors(vectors, k)
         
+        candidates = max(k, settings.hybrid_candidates)
+        with stage_timer("qdrant_search"):
+            dense = await self._search_vectors(vectors, candidates)
+        with stage_timer("lexical_search"):
+            sparse = [self.lexical_index.search(query, candidates) for query in queries]
+        return [
+            reciprocal_rank_fusion([dense_docs, sparse_docs], k=settings.rrf_k)[:k]
+            for dense_docs, sparse_docs in zip(dense, sparse)
+        ]
+    
+    def _use_local_index(self) -> bool:
+        """ค้นหาด้วย local index แทน Qdrant (โหมด primary หรือ Qdrant ยังไม่พร้อม)"""
+        return self.local_index is not None and (
+            settings.local_index_mode == "primary" or not self.collection_ready
+        )
+    
+    async def _search_vectors(self, vectors: List[List[float]], k: int) -> List[List[Document]]:
+        """
+        ค้นหา top-k ของแต่ละ vector
+        
+        ใช้ Qdrant เป็นหลัก (query_points / query_batch_points) ถ้า Qdrant ผิดพลาด
+        และมี local index จะตอบจาก local index แทน ไม่ทำให้คำตอบขาด context
+        """
+        # vector ของเอกสารใช้ต่อใน MMR ตอนประกอบ context
+        with_vectors = settings.context_mmr_enabled
+        if self._use_local_index():
+            return self.local_index.search_batch(vectors, k, with_vectors=with_vectors)
+        
+        # hnsw_ef / quantization rescore ตาม Settings (None = ค่าของ Qdrant)
+        search_params = build_search_params()
         try:
-            collection = self.qdrant_client.get_collection(
-                collection_name=settings.qdrant_collection_name
-            )
-            return {
-                "status": "connected",
-                "name": settings.qdrant_collection_name,
-                "points_count": collection.points_count,
-                "vectors_count": collection.vectors_count
-            }
+            if len(vectors) == 1:
+                response = await self.async_qdrant_client.query_points(
+                    collection_name=settings.qdrant_collection_name,
+                    query=vectors[0],
+                    limit=k,
+                    search_params=search_params,
+                    with_payload=True,
+                    with_vectors=with_vectors
+                )
+                responses = [response]
+            else:
+                responses = await self.async_qdrant_client.query_batch_points(
+                    collection_name=settings.qdrant_collection_name,
+                    requests=[
+                        QueryRequest(
+                            query=vector, limit=k, params=search_params,
+                            with_payload=True, with_vector=with_vectors
+                        )
+                        for vector in vectors
+                    ]
+                )
         except Exception as e:
-            return {
-                "status": "error",
-                "error": str(e)
-            }
\ No newline at end of file
+            if self.local_index is None:
+                raise
+            print(f"⚠️ Qdrant search failed ({e}) - falling back to local vector index")
+            RAG_FAILURES.labels(reason="qdrant_error_local_fallback").inc()
+            self.request_health_check()
+            return self.local_index.search_batch(vectors, k, with_vectors=with_vectors)
+        
+        return [
+            [self._point_to_document(point) for point in response.points]
+            for response in responses
+        ]
+    
+    async def _embed_queries(self, queries: List[str]) -> List[List[float]]:
+        """
+        Embed query ผ่าน embedding cache
+        
+        เรียก OpenAI เฉพาะ query ที่ยังไม่มีใน cache (รวมเป็น request เดียว)
+        ถ้า hit ทั้งหมดจะไม่มี network call เลย
+        """
+        if self.embedding_cache is None:
+            return await self.embeddings.aembed_documents(queries)
+        
+        vectors = [self.embedding_cache.get(query) for query in queries]
+        missing = [query for query, vector in zip(queries, vectors) if vector is None]
+        if missing:
+            missing = list(dict.fromkeys(missing))
+            fresh = await self.embeddings.aembed_documents(missing)
+            self.embedding_cache.set_many(missing, fresh)
+            fresh_by_query = dict(zip(missing, fresh))
+            return [
+                vector.tolist() if vector is not None else fresh_by_query[query]
+                for query, vector in zip(queries, vectors)
+            ]
+        return [vector.tolist() for vector in vectors]
+    
+    @staticmethod
+    def _point_to_document(point) -> Document:
+        """แปลง ScoredPoint ของ Qdrant เป็น Document (payload แบบเดียวกับ LangChain)"""
+        payload = point.payload or {}
+        metadata = dict(payload.get("metadata") or {})
+        if isinstance(point.vector, list):
+            metadata[VECTOR_METADATA_KEY] = point.vector
+        return Document(
+            page_content=payload.get("page_content", ""),
+            metadata=metadata
+        )
+    
+    def lookup_precomputed(self, gross_income: int, risk_tolerance: str, k: int = None) -> Optional[List[Document]]:
+        """ผลค้นหาที่คำนวณไว้ล่วงหน้า (None → ต้องค้นหาจริง)"""
+        if self.precomputed is None or not self.collection_ready:
+            return None
+        return self.precomputed.lookup(gross_income, risk_tolerance, k or settings.rag_top_k)
+    
+    def is_available(self) -> bool:
+        """ตรวจสอบว่าค้นหาเอกสารได้หรือไม่ (Qdrant หรือ local index)"""
+        return self.collection_ready or self.local_index is not None
+    
+    def get_collection_info(self) -> dict:
+        """ดึงข้อมูล Collection จาก cache (ไม่มี network call)"""
+        info = dict(self._collection_info)
+        if self._collection_info_updated_at is not None:
+            info["age_seconds"] = round(time.time() - self._collection_info_updated_at, 1)
+        return info
@@ -0,0 +1,168 @@
+"""
+Semantic Plan Cache
+Response cache ตรงตัว (cache_service) พลาดโปรไฟล์ที่แทบเหมือนกัน เช่น รายได้ 600,000 กับ 605,000 บาท
+ที่ค่าลดหย่อนเท่ากัน แต่ตัวเลขในแผน (total_investment, investment_amount, tax_saving)
+ถูกคำนวณใหม่ด้วย Python ทุก request อยู่แล้ว (main._apply_plan_calculations)
+จึงใช้เนื้อหาเชิงคุณภาพของแผนจาก LLM ซ้ำได้
+
+- key: feature vector ของ request (log รายได้ + ค่าลดหย่อนแต่ละช่องหารด้วยเพดาน)
+- ค้นเฉพาะในกลุ่มที่ field เชิงหมวดหมู่ตรงกันทุกตัว (ช่วงรายได้ของ tier, ประเภทเงินได้, ความเสี่ยง ...)
+- ใช้ entry ที่ใกล้ที่สุดถ้าระยะ L2 ไม่เกิน semantic_cache_max_distance
+"""
+
+import json
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.config import settings
+from app.metrics import SEMANTIC_CACHE_REQUESTS
+from app.models import TaxCalculationRequest
+from app.services.tax_calculator import tax_calculator_service
+
+
+# field ที่ต้องตรงกันทุกตัว (เปลี่ยนแล้วเนื้อหาแผนเปลี่ยน)
+CATEGORICAL_FIELDS = ("income_type", "profession_type", "business_type", "expense_method", "risk_tolerance")
+
+
+def _field_scale(name: str) -> Optional[float]:
+    """เพดาน (le) ของ field ถ้ามี"""
+    for constraint in TaxCalculationRequest.model_fields[name].metadata:
+        le = getattr(constraint, "le", None)
+        if le:
+            return float(le)
+    return None
+
+
+# field ตัวเลขทั้งหมดยกเว้นรายได้ พร้อมตัวหาร (None = หารด้วยรายได้ เช่น เงินบริจาคที่ไม่มีเพดาน)
+NUMERIC_FIELDS: List[Tuple[str, Optional[float]]] = [
+    (name, _field_scale(name))
+    for name, field in TaxCalculationRequest.model_fields.items()
+    if field.annotation is int and name != "gross_income"
+]
+
+
+def partition_key(request: TaxCalculationRequest) -> tuple:
+    """กลุ่มของ request ที่ใช้แผนร่วมกันได้ (ช่วงรายได้กำหนด tier เงินลงทุนและจำนวนแผน)"""
+    return (
+        tax_calculator_service.get_income_bracket(request.gross_income),
+        *(
+            getattr(getattr(request, name), "value", getattr(request, name))
+            for name in CATEGORICAL_FIELDS
+        )
+    )
+
+
+def request_features(request: TaxCalculationRequest) -> np.ndarray:
+    """
+    feature vector ของ request
+
+    รายได้ใช้ log (ต่างกัน 1% ≈ 0.01) ค่าลดหย่อนหารด้วยเพดานของ field
+    (field ที่ไม่มีเพดานหารด้วยรายได้) ทุกมิติจึงอยู่ในสเกลใกล้เคียงกัน
+    """
+    income = max(request.gross_income, 1)
+    features = [math.log(income)]
+    for name, scale in NUMERIC_FIELDS:
+        features.append(getattr(request, name) / (scale or income))
+    return np.asarray(features, dtype=np.float32)
+
+
+class SemanticPlanCache:
+    """nearest-neighbour cache ของแผนจาก LLM (LRU + TTL ในหน่วยความจำ)"""
+
+    def __init__(self, max_distance: float, max_entries: int, ttl_seconds: int):
+        self.max_distance = max_distance
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        # id → (partition, features, plans JSON, expires_at)
+        self._entries: "OrderedDict[int, Tuple[tuple, np.ndarray, str, float]]" = OrderedDict()
+        self._partitions: Dict[tuple, List[int]] = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, request: TaxCalculationRequest) -> Optional[dict]:
+        """แผนของ request ที่ใกล้ที่สุดในกลุ่มเดียวกัน (สำเนาใหม่ทุกครั้ง แก้ไขได้) หรือ None"""
+        partition = partition_key(request)
+        features = request_features(request)
+        now = time.time()
+
+        best_id, best_distance = None, None
+        with self._lock:
+            ids = self._partitions.get(partition, [])
+            for entry_id in list(ids):
+                _, vector, _, expires_at = self._entries[entry_id]
+                if expires_at < now:
+                    self._remove(entry_id)
+                    continue
+                distance = float(np.linalg.norm(vector - features))
+                if best_distance is None or distance < best_distance:
+                    best_id, best_distance = entry_id, distance
+
+            if best_id is None or best_distance > self.max_distance:
+                self.misses += 1
+                SEMANTIC_CACHE_REQUESTS.labels(result="miss").inc()
+                return None
+
+            self._entries.move_to_end(best_id)
+            value = self._entries[best_id][2]
+            self.hits += 1
+
+        SEMANTIC_CACHE_REQUESTS.labels(result="hit").inc()
+        print(f"🧲 Semantic cache hit (distance {best_distance:.4f})")
+        return json.loads(value)
+
+    def set(self, request: TaxCalculationRequest, investment_plans: dict):
+        """เก็บแผนจาก LLM (snapshot เป็น JSON ก่อนถูกแก้ตัวเลขภายหลัง)"""
+        partition = partition_key(request)
+        value = json.dumps(investment_plans, ensure_ascii=False)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (partition, request_features(request), value, time.time() + self.ttl_seconds)
+            self._partitions.setdefault(partition, []).append(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id: int):
+        partition = self._entries.pop(entry_id)[0]
+        ids = self._partitions[partition]
+        ids.remove(entry_id)
+        if not ids:
+            del self._partitions[partition]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._partitions.clear()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "partitions": len(self._partitions),
+            "max_entries": self.max_entries,
+            "max_distance": self.max_distance,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0
+        }
+
+
+def create_semantic_cache() -> Optional[SemanticPlanCache]:
+    """สร้าง SemanticPlanCache ตาม Settings (คืน None ถ้าปิดใช้งาน)"""
+    if not settings.semantic_cache_enabled:
+        return None
+    print(f"🧲 Semantic plan cache: max distance {settings.semantic_cache_max_distance}, "
+          f"max {settings.semantic_cache_max_entries} entries, TTL {settings.semantic_cache_ttl_seconds} s")
+    return SemanticPlanCache(
+        settings.semantic_cache_max_distance,
+        settings.semantic_cache_max_entries,
+        settings.semantic_cache_ttl_seconds
+    )
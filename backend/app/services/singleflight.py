@@ -0,0 +1,54 @@
+"""
+Single-flight Request Coalescing
+รวม request ที่เหมือนกันซึ่งกำลังประมวลผลอยู่พร้อมกัน ให้ใช้การคำนวณ (embed + search + LLM) เพียงครั้งเดียว
+"""
+
+import asyncio
+import copy
+from typing import Any, Awaitable, Callable, Dict
+
+from app.metrics import COALESCED_REQUESTS
+
+
+class SingleFlight:
+    """
+    ผู้เรียกที่ใช้ key เดียวกันในขณะที่งานยังไม่เสร็จ จะรอผลจาก task เดียวกัน
+
+    งานถูกรันเป็น task แยก (ไม่ผูกกับ request แรก) ถ้า client แรกตัดการเชื่อมต่อ
+    ผู้เรียกคนอื่นก็ยังได้ผลลัพธ์ และทุกคนได้ผลลัพธ์เป็นสำเนาของตัวเอง (deepcopy)
+    เพราะขั้นตอนถัดไปแก้ไข dict ของแผนโดยตรง
+    """
+
+    def __init__(self):
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self.executions = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """รัน func() ครั้งเดียวต่อ key ที่ยังทำงานอยู่ แล้วคืนสำเนาผลลัพธ์"""
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.executions += 1
+        else:
+            self.coalesced += 1
+            COALESCED_REQUESTS.inc()
+
+        result = await asyncio.shield(task)
+        return copy.deepcopy(result)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        # ป้องกัน warning "exception was never retrieved" เมื่อผู้เรียกทุกคนถูกยกเลิกไปแล้ว
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._in_flight),
+            "executions": self.executions,
+            "coalesced": self.coalesced
+        }
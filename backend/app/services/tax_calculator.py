@@ -8,6 +8,7 @@ from typing import Dict, Tuple
 from app.models import (
     TaxCalculationRequest,
     TaxCalculationResult,
+    TaxCalculationBreakdown,
     IncomeType,
     ProfessionType,
     BusinessType,
@@ -35,6 +36,16 @@ class TaxCalculatorService:
         (float('inf'), 35)
     ]
 
+    # เงินลงทุน 3 ระดับตามช่วงรายได้ (รายได้ต่ำกว่า limit → ใช้ tier นี้)
+    INVESTMENT_TIERS = [
+        (600000, [40000, 60000, 80000]),
+        (1000000, [60000, 100000, 150000]),
+        (1500000, [200000, 350000, 500000]),
+        (2000000, [300000, 500000, 800000]),
+        (3000000, [500000, 800000, 1200000]),
+        (float('inf'), [800000, 1200000, 1800000])
+    ]
+
     def _calculate_expense_deduction(self, request: TaxCalculationRequest) -> int:
         """คำนวณค่าใช้จ่ายที่หักได้ตามมาตรา 40(6) หรือ 40(8)
 
@@ -169,8 +180,8 @@ class TaxCalculatorService:
         # เงินบริจาคทั่วไป: สูงสุด 10% ของรายได้หลังหักค่าใช้จ่าย
         # (จะคำนวณหลังหักค่าใช้จ่ายและค่าลดหย่อนแล้ว)
 
-    def calculate_tax(self, request: TaxCalculationRequest) -> TaxCalculationResult:
-        """คำนวณภาษีเงินได้ ปี 2568
+    def calculate_tax_breakdown(self, request: TaxCalculationRequest) -> TaxCalculationBreakdown:
+        """คำนวณภาษีเงินได้ ปี 2568 พร้อมรายละเอียดทุกขั้นตอน (ไม่ print log)
 
         ตาม guideline50_50.pdf หน้า 20:
         - วิธีที่ 1: คำนวณจากเงินได้สุทธิ (Progressive Tax)
@@ -261,22 +272,37 @@ class TaxCalculatorService:
         # อัตราภาษีเฉลี่ย
         effective_tax_rate = (tax_amount / gross_income * 100) if gross_income > 0 else 0
 
-        print(f"💰 Tax Calculation Summary:")
-        print(f"   - Gross Income: {gross_income:,} บาท")
-        print(f"   - Expense Deduction: {expense_deduction:,} บาท")
-        print(f"   - Total Allowances: {total_allowances:,} บาท")
-        print(f"   - Taxable Income: {taxable_income:,} บาท")
-        print(f"   - Tax (Method 1 - Progressive): {tax_method_1:,} บาท")
-        print(f"   - Tax (Method 2 - AMT 0.5%): {tax_method_2:,} บาท")
-        print(f"   - Final Tax Amount: {tax_amount:,} บาท")
-
-        return TaxCalculationResult(
+        return TaxCalculationBreakdown(
             gross_income=gross_income,
+            expense_deduction=expense_deduction,
+            total_allowances=total_allowances,
             taxable_income=taxable_income,
+            tax_progressive=tax_method_1,
+            tax_minimum=tax_method_2,
             tax_amount=tax_amount,
             effective_tax_rate=round(effective_tax_rate, 2)
         )
-    
+
+    def calculate_tax(self, request: TaxCalculationRequest) -> TaxCalculationResult:
+        """คำนวณภาษีเงินได้ ปี 2568 (ดู calculate_tax_breakdown)"""
+        breakdown = self.calculate_tax_breakdown(request)
+
+        print(f"💰 Tax Calculation Summary:")
+        print(f"   - Gross Income: {breakdown.gross_income:,} บาท")
+        print(f"   - Expense Deduction: {breakdown.expense_deduction:,} บาท")
+        print(f"   - Total Allowances: {breakdown.total_allowances:,} บาท")
+        print(f"   - Taxable Income: {breakdown.taxable_income:,} บาท")
+        print(f"   - Tax (Method 1 - Progressive): {breakdown.tax_progressive:,} บาท")
+        print(f"   - Tax (Method 2 - AMT 0.5%): {breakdown.tax_minimum:,} บาท")
+        print(f"   - Final Tax Amount: {breakdown.tax_amount:,} บาท")
+
+        return TaxCalculationResult(
+            gross_income=breakdown.gross_income,
+            taxable_income=breakdown.taxable_income,
+            tax_amount=breakdown.tax_amount,
+            effective_tax_rate=breakdown.effective_tax_rate
+        )
+
     def _calculate_progressive_tax(self, taxable_income: int) -> int:
         """คำนวณภาษีแบบขั้นบันได"""
         if taxable_income <= 0:
@@ -304,6 +330,20 @@ class TaxCalculatorService:
                 return rate
         return 35
 
+    def get_income_bracket(self, gross_income: int) -> int:
+        """ลำดับช่วงรายได้ใน INVESTMENT_TIERS (0 = รายได้ต่ำสุด)"""
+        for index, (limit, _) in enumerate(self.INVESTMENT_TIERS):
+            if gross_income < limit:
+                return index
+        return len(self.INVESTMENT_TIERS) - 1
+
+    def get_investment_tiers(self, gross_income: int) -> list[int]:
+        """เงินลงทุน 3 ระดับ (Conservative / Balanced / Aggressive) ตามรายได้
+
+        ต้องตรงกับ tier ที่ระบุใน prompt ของ AIService
+        """
+        return list(self.INVESTMENT_TIERS[self.get_income_bracket(gross_income)][1])
+
     def calculate_tax_saving_accurate(self, taxable_base: int, investment: int) -> int:
         """
         คำนวณ Tax Saving อย่างถูกต้องด้วย Multi-Bracket Calculation
@@ -0,0 +1,127 @@
+"""
+Benchmark: Precomputed Retrieval vs Live Search
+วัดว่าผลค้นหาที่คำนวณไว้ล่วงหน้าต่อ (ช่วงรายได้, ความเสี่ยง) ตรงกับการค้นหาจริงแค่ไหน
+
+สุ่มรายได้หลายค่าในแต่ละช่วง แล้วเทียบ top-k ของ live search กับ lookup
+(recall@k = สัดส่วนเอกสารของ live search ที่อยู่ในผล lookup) พร้อม latency ของทั้งสองแบบ
+
+ใช้งาน (ต้องมี Qdrant ที่ ingest แล้ว และ OPENAI_API_KEY):
+    python scripts/benchmark_precomputed_retrieval.py --samples-per-bracket 5 --output precompute.json
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# เพิ่ม path เพื่อ import modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.services.rag_service import RAGService
+from app.services.precomputed_retrieval import RISK_LEVELS, build_retrieval_query
+from app.services.tax_calculator import tax_calculator_service
+
+
+def sample_incomes(samples_per_bracket: int, seed: int) -> list[int]:
+    """สุ่มรายได้ในแต่ละช่วงของ INVESTMENT_TIERS (ช่วงสุดท้ายสุ่มถึง 2 เท่าของขอบล่าง)"""
+    rng = random.Random(seed)
+    incomes = []
+    lower = 0
+    for limit, _ in tax_calculator_service.INVESTMENT_TIERS:
+        upper = lower * 2 if limit == float('inf') else int(limit) - 1
+        incomes.extend(rng.randint(lower, upper) for _ in range(samples_per_bracket))
+        lower = upper + 1
+    return incomes
+
+
+async def run_benchmark(samples_per_bracket: int, k: int, seed: int) -> dict:
+    # วัดได้แม้ปิด precompute ใน Settings (ค่าเริ่มต้นปิดไว้จนกว่าจะวัด recall ผ่าน)
+    settings.rag_precompute_enabled = True
+    rag_service = RAGService(auto_connect=False)
+    if not await rag_service.connect():
+        raise SystemExit("❌ Qdrant not available")
+
+    # ปิด embedding cache เพื่อวัด live search ตามจริง
+    rag_service.embedding_cache = None
+    # ตารางต้อง build ด้วย k เดียวกับที่วัด ไม่เช่นนั้น lookup คืน None ทุกครั้ง
+    await rag_service.rebuild_precomputed(k=k)
+
+    recalls = []
+    live_latencies = []
+    lookup_latencies = []
+    per_bracket = {}
+    misses = 0
+
+    for income in sample_incomes(samples_per_bracket, seed):
+        bracket = tax_calculator_service.get_income_bracket(income)
+        for risk in RISK_LEVELS:
+            started = time.perf_counter()
+            live_docs = await rag_service.retrieve_relevant_documents(build_retrieval_query(income, risk), k=k)
+            live_latencies.append(time.perf_counter() - started)
+
+            started = time.perf_counter()
+            precomputed_docs = rag_service.lookup_precomputed(income, risk, k=k)
+            lookup_latencies.append(time.perf_counter() - started)
+
+            # lookup ไม่มีผล (ยังไม่ build / k ไม่ตรง) ไม่ใช่ผลค้นหาว่าง → นับเป็น miss แยก
+            if precomputed_docs is None:
+                misses += 1
+                continue
+
+            live = {doc.page_content for doc in live_docs}
+            precomputed = {doc.page_content for doc in precomputed_docs}
+            recall = len(live & precomputed) / len(live) if live else 1.0
+            recalls.append(recall)
+            per_bracket.setdefault(bracket, []).append(recall)
+
+    await rag_service.close()
+
+    if misses:
+        print(f"⚠️ {misses} lookups returned no precomputed result - excluded from recall")
+    if not recalls:
+        raise SystemExit("❌ Precomputed lookup missed for every sample - recall cannot be measured")
+
+    return {
+        "k": k,
+        "samples": len(recalls),
+        "lookup_misses": misses,
+        "recall_at_k": {
+            "mean": round(statistics.mean(recalls), 4),
+            "min": round(min(recalls), 4),
+            "by_income_bracket": {
+                str(bracket): round(statistics.mean(values), 4)
+                for bracket, values in sorted(per_bracket.items())
+            }
+        },
+        "latency_ms": {
+            "live_p50": round(statistics.median(live_latencies) * 1000, 3),
+            "live_max": round(max(live_latencies) * 1000, 3),
+            "precomputed_p50": round(statistics.median(lookup_latencies) * 1000, 4),
+            "precomputed_max": round(max(lookup_latencies) * 1000, 4)
+        }
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall parity of precomputed retrieval vs live search")
+    parser.add_argument("--samples-per-bracket", type=int, default=5)
+    parser.add_argument("--k", type=int, default=settings.rag_top_k)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="บันทึกผลเป็น JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args.samples_per_bracket, args.k, args.seed))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\n💾 Saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Benchmark: Qdrant REST vs gRPC
+วัด latency ของการค้นหาภายใต้ request พร้อมกันหลายตัว เทียบ transport ของ AsyncQdrantClient
+
+- rest_default: AsyncQdrantClient(url) แบบไม่ตั้งค่า (ค่าเดิมก่อนมี connection pool)
+- rest_pooled:  create_async_qdrant_client(prefer_grpc=False) (pool + keep-alive ตาม Settings)
+- grpc:         create_async_qdrant_client(prefer_grpc=True)
+- memory:       Qdrant in-memory (ไม่มี network, ใช้เป็น baseline) เมื่อส่ง --in-memory
+
+ใช้งาน:
+    docker run -p 6333:6333 -p 6334:6334 qdrant/qdrant
+    python scripts/benchmark_qdrant_transport.py --concurrency 32 --queries 2000 --output transport.json
+    python scripts/benchmark_qdrant_transport.py --in-memory
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# เพิ่ม path เพื่อ import modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import Distance, PointStruct, VectorParams
+from app.config import settings
+from app.services.qdrant_pool import create_async_qdrant_client
+
+BENCH_COLLECTION = "benchmark_transport"
+
+
+def percentile(values: list, pct: float) -> float:
+    return float(np.percentile(values, pct)) if values else 0.0
+
+
+async def prepare_collection(client: AsyncQdrantClient, points: int, dim: int, seed: int):
+    """สร้าง collection ชั่วคราวด้วย vector สุ่ม"""
+    if await client.collection_exists(BENCH_COLLECTION):
+        await client.delete_collection(BENCH_COLLECTION)
+    await client.create_collection(
+        BENCH_COLLECTION,
+        vectors_config=VectorParams(size=dim, distance=Distance.COSINE)
+    )
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(points, dim)).astype(np.float32)
+    for start in range(0, points, 256):
+        await client.upsert(
+            BENCH_COLLECTION,
+            points=[
+                PointStruct(id=i, vector=vectors[i].tolist(), payload={"page_content": f"chunk {i}"})
+                for i in range(start, min(start + 256, points))
+            ]
+        )
+
+
+async def run_transport(client: AsyncQdrantClient, queries: np.ndarray, concurrency: int, k: int) -> dict:
+    """ยิง query ทั้งหมดด้วย worker พร้อมกัน `concurrency` ตัว"""
+    latencies = []
+    errors = 0
+    counter = iter(range(len(queries)))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            started = time.perf_counter()
+            try:
+                await client.query_points(BENCH_COLLECTION, query=queries[i].tolist(), limit=k, with_payload=True)
+                latencies.append(time.perf_counter() - started)
+            except Exception:
+                errors += 1
+
+    # warm-up (สร้าง connection / channel ก่อนจับเวลา)
+    await client.query_points(BENCH_COLLECTION, query=queries[0].tolist(), limit=k)
+
+    started_all = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started_all
+
+    return {
+        "queries": len(queries),
+        "errors": errors,
+        "qps": round(len(latencies) / elapsed, 1) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3),
+            "p99": round(percentile(latencies, 99) * 1000, 3)
+        }
+    }
+
+
+async def run_benchmark(args) -> dict:
+    rng = np.random.default_rng(args.seed + 1)
+    queries = rng.normal(size=(args.queries, args.dim)).astype(np.float32)
+
+    if args.in_memory:
+        clients = {"memory": create_async_qdrant_client(location=":memory:")}
+    else:
+        clients = {
+            "rest_default": AsyncQdrantClient(url=settings.qdrant_url),
+            "rest_pooled": create_async_qdrant_client(prefer_grpc=False),
+            "grpc": create_async_qdrant_client(prefer_grpc=True)
+        }
+
+    await prepare_collection(next(iter(clients.values())), args.points, args.dim, args.seed)
+
+    results = {}
+    for name, client in clients.items():
+        print(f"⏱️ {name} ({args.concurrency} concurrent)...")
+        results[name] = await run_transport(client, queries, args.concurrency, args.k)
+
+    await next(iter(clients.values())).delete_collection(BENCH_COLLECTION)
+    for client in clients.values():
+        await client.close()
+
+    return {
+        "qdrant_url": None if args.in_memory else settings.qdrant_url,
+        "points": args.points,
+        "dim": args.dim,
+        "k": args.k,
+        "concurrency": args.concurrency,
+        "pool_size": settings.qdrant_pool_size,
+        "results": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Qdrant search latency: REST vs gRPC")
+    parser.add_argument("--url", default=settings.qdrant_url)
+    parser.add_argument("--in-memory", action="store_true", help="ใช้ Qdrant in-memory แทน server")
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--dim", type=int, default=1536)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--k", type=int, default=settings.rag_top_k)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="บันทึกผลเป็น JSON")
+    args = parser.parse_args()
+
+    settings.qdrant_url = args.url
+    report = asyncio.run(run_benchmark(args))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\n💾 Saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Benchmark: Quantization / on_disk / HNSW ef
+เทียบ recall@k, latency และหน่วยความจำของการตั้งค่า collection แต่ละแบบ (ดู app/services/collection_config.py)
+
+- สร้าง collection ชั่วคราวต่อ (quantization, on_disk) ด้วย vector ชุดเดียวกัน
+  (ค่าเริ่มต้นใช้ vector จริงจาก collection tax_knowledge ถ้ามี ไม่เช่นนั้นใช้ vector สุ่ม)
+- ground truth คือ exact cosine search ด้วย numpy
+- ค้นหาด้วย hnsw_ef หลายค่า วัด recall@k และ latency p50/p95
+- หน่วยความจำ: ประมาณจากขนาด vector / quantized vector / HNSW links
+  และ memory_resident_bytes ของ Qdrant server (จาก /metrics) หลังสร้างแต่ละ collection
+
+ใช้งาน (ต้องมี Qdrant server; in-memory mode ไม่รองรับ quantization/HNSW จึงใช้ได้แค่ตรวจสคริปต์):
+    python scripts/benchmark_quantization.py --quantization none scalar binary --ef 32 64 128 --on-disk --output quant.json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+# เพิ่ม path เพื่อ import modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import CollectionStatus, OptimizersConfigDiff, PointStruct
+from app.config import settings
+from app.services.collection_config import QUANTIZATION_MODES, build_collection_kwargs, build_search_params
+from app.services.qdrant_pool import create_async_qdrant_client
+
+BENCH_COLLECTION_PREFIX = "benchmark_quant"
+
+
+def percentile(values: list, pct: float) -> float:
+    return float(np.percentile(values, pct)) if values else 0.0
+
+
+def estimate_memory_bytes(points: int, dim: int, quantization: str, on_disk: bool, m: int) -> dict:
+    """ขนาดโดยประมาณของข้อมูลที่อยู่ใน RAM (vector เต็ม, quantized vector, HNSW links ชั้นล่าง)"""
+    full = points * dim * 4
+    quantized = {"none": 0, "scalar": points * dim, "binary": points * ((dim + 7) // 8)}[quantization]
+    links = points * m * 2 * 4
+    in_ram = (0 if on_disk else full) + (quantized if settings.qdrant_quantization_always_ram else 0) + links
+    return {"vectors": full, "quantized": quantized, "hnsw_links": links, "estimated_ram": in_ram}
+
+
+async def server_resident_bytes() -> int | None:
+    """memory_resident_bytes จาก Prometheus endpoint ของ Qdrant (None ถ้าอ่านไม่ได้)"""
+    try:
+        async with httpx.AsyncClient(timeout=5) as http:
+            response = await http.get(f"{settings.qdrant_url.rstrip('/')}/metrics")
+        for line in response.text.splitlines():
+            if line.startswith("memory_resident_bytes"):
+                return int(float(line.split()[-1]))
+    except Exception:
+        pass
+    return None
+
+
+async def load_vectors(client: AsyncQdrantClient, args) -> tuple[np.ndarray, str]:
+    """vector จาก collection จริง (ถ้ามีพอ) หรือ vector สุ่ม"""
+    if not args.random and await client.collection_exists(settings.qdrant_collection_name):
+        vectors = []
+        offset = None
+        while len(vectors) < args.points:
+            records, offset = await client.scroll(
+                settings.qdrant_collection_name, limit=256, offset=offset,
+                with_payload=False, with_vectors=True
+            )
+            vectors.extend(record.vector for record in records)
+            if offset is None:
+                break
+        if vectors:
+            return np.asarray(vectors[:args.points], dtype=np.float32), settings.qdrant_collection_name
+
+    rng = np.random.default_rng(args.seed)
+    return rng.normal(size=(args.points, args.dim)).astype(np.float32), "random"
+
+
+def make_queries(vectors: np.ndarray, count: int, seed: int) -> np.ndarray:
+    """query = vector ในชุดข้อมูล + noise (ใกล้เคียงคำถามที่ตรงกับเอกสารบางชิ้น)"""
+    rng = np.random.default_rng(seed + 1)
+    base = vectors[rng.integers(0, len(vectors), size=count)]
+    scale = np.linalg.norm(base, axis=1, keepdims=True) / np.sqrt(vectors.shape[1])
+    return (base + rng.normal(size=base.shape).astype(np.float32) * scale * 0.5).astype(np.float32)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> list[set]:
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    scores = (queries / np.linalg.norm(queries, axis=1, keepdims=True)) @ normalized.T
+    return [set(np.argsort(-row)[:k].tolist()) for row in scores]
+
+
+async def build_collection(client: AsyncQdrantClient, name: str, vectors: np.ndarray, quantization: str, on_disk: bool):
+    if await client.collection_exists(name):
+        await client.delete_collection(name)
+    await client.create_collection(
+        name,
+        **build_collection_kwargs(vectors.shape[1], quantization=quantization, on_disk_vectors=on_disk),
+        # สร้าง HNSW ทันทีแม้ข้อมูลน้อย (ค่าเริ่มต้นของ Qdrant จะค้นแบบ brute-force จนกว่าข้อมูลจะเกิน threshold)
+        optimizers_config=OptimizersConfigDiff(indexing_threshold=1)
+    )
+    for start in range(0, len(vectors), 256):
+        await client.upsert(
+            name,
+            points=[
+                PointStruct(id=i, vector=vectors[i].tolist())
+                for i in range(start, min(start + 256, len(vectors)))
+            ]
+        )
+    # รอให้ optimizer สร้าง index เสร็จก่อนวัด
+    for _ in range(600):
+        info = await client.get_collection(name)
+        if info.status == CollectionStatus.GREEN:
+            break
+        await asyncio.sleep(0.5)
+
+
+async def measure(client: AsyncQdrantClient, name: str, queries: np.ndarray, truth: list[set],
+                  k: int, quantization: str, ef: int) -> dict:
+    params = build_search_params(quantization=quantization, hnsw_ef=ef)
+    await client.query_points(name, query=queries[0].tolist(), limit=k, search_params=params)  # warm-up
+
+    latencies = []
+    recalls = []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        response = await client.query_points(name, query=query.tolist(), limit=k, search_params=params)
+        latencies.append(time.perf_counter() - started)
+        found = {point.id for point in response.points}
+        recalls.append(len(found & expected) / len(expected))
+
+    return {
+        "hnsw_ef": ef,
+        "recall_at_k": round(float(np.mean(recalls)), 4),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 3),
+            "p95": round(percentile(latencies, 95) * 1000, 3)
+        }
+    }
+
+
+async def run_benchmark(args) -> dict:
+    client = create_async_qdrant_client(location=":memory:") if args.in_memory else create_async_qdrant_client()
+
+    vectors, source = await load_vectors(client, args)
+    queries = make_queries(vectors, args.queries, args.seed)
+    truth = exact_top_k(vectors, queries, args.k)
+    print(f"📦 {len(vectors)} vectors ({vectors.shape[1]} dims) from {source}, {len(queries)} queries")
+
+    baseline_memory = None if args.in_memory else await server_resident_bytes()
+    on_disk_options = [False, True] if args.on_disk else [False]
+    results = []
+    for quantization in args.quantization:
+        for on_disk in on_disk_options:
+            name = f"{BENCH_COLLECTION_PREFIX}_{quantization}_{'disk' if on_disk else 'ram'}"
+            print(f"🏗️ {name}...")
+            await build_collection(client, name, vectors, quantization, on_disk)
+            resident = None if args.in_memory else await server_resident_bytes()
+
+            runs = []
+            for ef in args.ef:
+                runs.append(await measure(client, name, queries, truth, args.k, quantization, ef))
+                print(f"   ef={ef}: recall@{args.k}={runs[-1]['recall_at_k']} p50={runs[-1]['latency_ms']['p50']}ms")
+
+            results.append({
+                "quantization": quantization,
+                "on_disk_vectors": on_disk,
+                "memory_bytes": {
+                    **estimate_memory_bytes(len(vectors), vectors.shape[1], quantization, on_disk, settings.qdrant_hnsw_m),
+                    "server_resident": resident,
+                    "server_resident_baseline": baseline_memory
+                },
+                "runs": runs
+            })
+            if not args.keep:
+                await client.delete_collection(name)
+
+    await client.close()
+
+    return {
+        "qdrant_url": None if args.in_memory else settings.qdrant_url,
+        "source": source,
+        "points": len(vectors),
+        "dim": int(vectors.shape[1]),
+        "k": args.k,
+        "hnsw": {"m": settings.qdrant_hnsw_m, "ef_construct": settings.qdrant_hnsw_ef_construct},
+        "rescore": settings.qdrant_quantization_rescore,
+        "oversampling": settings.qdrant_quantization_oversampling,
+        "results": results
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark recall@k / latency / memory of Qdrant quantization settings")
+    parser.add_argument("--url", default=settings.qdrant_url)
+    parser.add_argument("--in-memory", action="store_true", help="ใช้ Qdrant in-memory (ตรวจสคริปต์เท่านั้น)")
+    parser.add_argument("--random", action="store_true", help="ใช้ vector สุ่มแทน vector จาก collection จริง")
+    parser.add_argument("--quantization", nargs="+", choices=QUANTIZATION_MODES, default=list(QUANTIZATION_MODES))
+    parser.add_argument("--on-disk", action="store_true", help="วัดแบบ on_disk vectors เพิ่มด้วย")
+    parser.add_argument("--ef", nargs="+", type=int, default=[32, 64, 128])
+    parser.add_argument("--points", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=1536, help="ขนาด vector สุ่ม")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=settings.rag_top_k)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="ไม่ลบ collection ที่สร้างหลังวัด")
+    parser.add_argument("--output", help="บันทึกผลเป็น JSON")
+    args = parser.parse_args()
+
+    settings.qdrant_url = args.url
+    report = asyncio.run(run_benchmark(args))
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\n💾 Saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
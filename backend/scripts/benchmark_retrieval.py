@@ -0,0 +1,297 @@
+"""
+Benchmark: RAG Retrieval Latency / Recall
+วัด RAGService.retrieve_relevant_documents แบบไม่ต้องมี Qdrant server และ OpenAI
+เพื่อเทียบผลของการเปลี่ยน rag_top_k, chunk size, hybrid search ฯลฯ ระหว่างแต่ละรอบ
+
+- Qdrant local in-memory mode + embedder ปลอมแบบ deterministic (hashing trick ของคำ
+  เอกสารที่มีคำร่วมกันจึงได้ vector ใกล้กัน)
+- corpus สังเคราะห์จากคำศัพท์ภาษีตามจำนวนเอกสาร/ขนาด chunk ที่กำหนด (seed เดิม → corpus เดิม)
+- latency p50/p95/p99 (ทีละ query) และ QPS (ยิงพร้อมกัน --concurrency)
+- recall@k เทียบกับ brute-force cosine บน vector ทั้งหมด
+  (ground truth เป็น dense อย่างเดียว เมื่อเปิด --hybrid ค่านี้จึงวัดว่า BM25 เปลี่ยนผลไปจาก dense แค่ไหน)
+- ผลเป็น JSON (พร้อม git commit) และเทียบกับผลรอบก่อนได้ด้วย --compare
+
+ใช้งาน:
+    python scripts/benchmark_retrieval.py --docs 2000 --k 3 5 10 --output retrieval.json
+    python scripts/benchmark_retrieval.py --hybrid --compare retrieval.json
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import subprocess
+import sys
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+# เพิ่ม path เพื่อ import modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from qdrant_client.models import PointStruct
+from app.config import settings
+from app.services.collection_config import build_collection_kwargs
+from app.services.embedding_cache import EmbeddingCache
+from app.services.lexical_index import LexicalIndex
+from app.services.qdrant_pool import create_async_qdrant_client
+
+# คำศัพท์สำหรับสร้าง corpus (ภาษีไทย + ตัวย่อ/ตัวเลขที่พบในเอกสารจริง)
+VOCABULARY = (
+    "ภาษี เงินได้ ลดหย่อน ค่าใช้จ่าย เหมา ตามจริง กองทุน RMF ThaiESG ThaiESGX ประกันชีวิต "
+    "ประกันสุขภาพ บำนาญ PVD กบข. กอช. ประกันสังคม บุตร บิดามารดา คู่สมรส คนพิการ "
+    "ดอกเบี้ย เงินกู้ บ้าน บริจาค การศึกษา พรรคการเมือง Easy e-Receipt หุ้น ธุรกิจ "
+    "วิชาชีพอิสระ 40(1) 40(2) 40(5) 40(6) 40(8) อัตราก้าวหน้า เงินได้สุทธิ เพดาน "
+    "ร้อยละ บาท ปีภาษี 2568 ยื่นแบบ ภ.ง.ด.90 ภ.ง.ด.91 หนังสือรับรอง สรรพากร เงื่อนไข "
+    "ถือครอง ขาย ลงทุน ความเสี่ยง ตราสารหนี้ กองทุนผสม ค่าเช่า ค่าลิขสิทธิ์ เงินปันผล"
+).split()
+
+
+class FakeEmbeddings(Embeddings):
+    """embedder แบบ deterministic: hashing trick ของคำ → vector ขนาด dim (normalize แล้ว)"""
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.model = f"fake-hashing-{dim}"
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in re.findall(r"\S+", text):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            index = int.from_bytes(digest[:4], "little") % self.dim
+            vector[index] += 1.0 if digest[4] & 1 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_documents(texts)
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return self._embed(text)
+
+
+def generate_corpus(docs: int, chunk_size: int, chunk_overlap: int, seed: int) -> List[Document]:
+    """เอกสารสังเคราะห์ตัดเป็น chunk ตามขนาดตัวอักษร (แต่ละเอกสารมีคำประจำหัวข้อซ้ำหลายครั้ง)"""
+    rng = random.Random(seed)
+    step = max(1, chunk_size - chunk_overlap)
+    chunks = []
+    for doc_id in range(docs):
+        topic = rng.sample(VOCABULARY, 4)
+        words = []
+        while sum(len(word) + 1 for word in words) < chunk_size * rng.randint(1, 3):
+            words.append(rng.choice(topic) if rng.random() < 0.4 else rng.choice(VOCABULARY))
+        text = " ".join(words)
+        for part, start in enumerate(range(0, max(1, len(text) - chunk_overlap), step)):
+            # ใส่รหัสเอกสาร/ชิ้นให้เนื้อหาไม่ซ้ำกัน (ใช้เทียบผลด้วย page_content)
+            chunks.append(Document(
+                page_content=f"doc{doc_id}-{part} {text[start:start + chunk_size]}",
+                metadata={"source": f"synthetic/doc{doc_id}.txt", "doc_id": doc_id}
+            ))
+    return chunks
+
+
+def generate_queries(chunks: List[Document], count: int, seed: int) -> List[str]:
+    """query = คำสุ่มจาก chunk หนึ่ง + คำสุ่มจากคำศัพท์ทั้งหมด"""
+    rng = random.Random(seed + 1)
+    queries = []
+    for _ in range(count):
+        words = rng.choice(chunks).page_content.split()[1:]
+        picked = rng.sample(words, min(len(words), 6))
+        queries.append(" ".join(picked + rng.sample(VOCABULARY, 2)))
+    return queries
+
+
+def brute_force_top_k(doc_vectors: np.ndarray, query_vectors: np.ndarray, k: int) -> List[np.ndarray]:
+    scores = query_vectors @ doc_vectors.T
+    return [np.argsort(-row, kind="stable")[:k] for row in scores]
+
+
+def percentile_ms(values: list, pct: float) -> float:
+    return round(float(np.percentile(values, pct)) * 1000, 3) if values else 0.0
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+async def build_service(chunks: List[Document], embeddings: FakeEmbeddings, args):
+    """RAGService ที่ชี้ไปยัง Qdrant in-memory ที่ ingest corpus แล้ว"""
+    # ปิดส่วนที่อ่านไฟล์/ใช้ผลที่คำนวณไว้ ให้วัดเฉพาะเส้นทาง embed + ค้นหา
+    settings.local_index_mode = "off"
+    settings.rag_precompute_enabled = False
+    settings.embedding_cache_enabled = False
+    settings.hybrid_search_enabled = args.hybrid
+
+    from app.services.rag_service import RAGService
+
+    service = RAGService(auto_connect=False)
+    service.embeddings = embeddings
+    service.embedding_cache = EmbeddingCache(embeddings.model, settings.embedding_cache_max_entries) if args.embedding_cache else None
+    service.lexical_index = LexicalIndex.build(chunks) if args.hybrid else None
+
+    client = create_async_qdrant_client(location=":memory:")
+    await client.create_collection(settings.qdrant_collection_name, **build_collection_kwargs(embeddings.dim))
+    vectors = embeddings.embed_documents([chunk.page_content for chunk in chunks])
+    for start in range(0, len(chunks), 256):
+        await client.upsert(
+            settings.qdrant_collection_name,
+            points=[
+                PointStruct(
+                    id=i,
+                    vector=vectors[i],
+                    payload={"page_content": chunks[i].page_content, "metadata": chunks[i].metadata}
+                )
+                for i in range(start, min(start + 256, len(chunks)))
+            ]
+        )
+    service.async_qdrant_client = client
+    service.collection_ready = True
+    return service, np.asarray(vectors, dtype=np.float32)
+
+
+async def measure_k(service, queries: List[str], truth: List[np.ndarray], chunks: List[Document],
+                    k: int, concurrency: int) -> dict:
+    # warm-up
+    await service.retrieve_relevant_documents(queries[0], k=k)
+
+    latencies = []
+    recalls = []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        docs = await service.retrieve_relevant_documents(query, k=k)
+        latencies.append(time.perf_counter() - started)
+        expected_content = {chunks[i].page_content for i in expected[:k]}
+        recalls.append(len({doc.page_content for doc in docs} & expected_content) / k)
+
+    counter = iter(queries)
+
+    async def worker():
+        for query in counter:
+            await service.retrieve_relevant_documents(query, k=k)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "k": k,
+        "recall_at_k": round(float(np.mean(recalls)), 4),
+        "latency_ms": {
+            "p50": percentile_ms(latencies, 50),
+            "p95": percentile_ms(latencies, 95),
+            "p99": percentile_ms(latencies, 99)
+        },
+        "qps": round(len(queries) / elapsed, 1) if elapsed > 0 else 0.0,
+        "concurrency": concurrency
+    }
+
+
+async def run_benchmark(args) -> dict:
+    chunks = generate_corpus(args.docs, args.chunk_size, args.chunk_overlap, args.seed)
+    queries = generate_queries(chunks, args.queries, args.seed)
+    embeddings = FakeEmbeddings(args.dim)
+    print(f"📚 Corpus: {args.docs} documents → {len(chunks)} chunks ({args.chunk_size}/{args.chunk_overlap} chars)")
+
+    service, doc_vectors = await build_service(chunks, embeddings, args)
+    query_vectors = np.asarray(embeddings.embed_documents(queries), dtype=np.float32)
+    truth = brute_force_top_k(doc_vectors, query_vectors, max(args.k))
+
+    # log ของ RAGService ต่อ query ทำให้ตัวเลข latency เพี้ยน จึงปิด stdout ระหว่างวัด
+    results = []
+    for k in args.k:
+        print(f"⏱️ k={k}...")
+        with open(os.devnull, "w") as devnull, redirect_stdout(sys.stdout if args.verbose else devnull):
+            result = await measure_k(service, queries, truth, chunks, k, args.concurrency)
+        print(f"   recall@{k}={result['recall_at_k']} p50={result['latency_ms']['p50']}ms qps={result['qps']}")
+        results.append(result)
+
+    await service.async_qdrant_client.close()
+
+    return {
+        "benchmark": "retrieval",
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": git_commit(),
+        "config": {
+            "docs": args.docs,
+            "chunks": len(chunks),
+            "chunk_size": args.chunk_size,
+            "chunk_overlap": args.chunk_overlap,
+            "queries": len(queries),
+            "dim": args.dim,
+            "hybrid": args.hybrid,
+            "hybrid_candidates": settings.hybrid_candidates,
+            "embedding_cache": args.embedding_cache,
+            "seed": args.seed
+        },
+        "results": results
+    }
+
+
+def compare(report: dict, baseline_path: str) -> dict:
+    """ส่วนต่างของแต่ละ k เทียบกับผลรอบก่อน (ค่าบวก = เพิ่มขึ้น)"""
+    baseline = json.loads(Path(baseline_path).read_text(encoding="utf-8"))
+    previous = {result["k"]: result for result in baseline.get("results", [])}
+    deltas = {}
+    for result in report["results"]:
+        before = previous.get(result["k"])
+        if before is None:
+            continue
+        deltas[str(result["k"])] = {
+            "recall_at_k": round(result["recall_at_k"] - before["recall_at_k"], 4),
+            "p50_ms": round(result["latency_ms"]["p50"] - before["latency_ms"]["p50"], 3),
+            "p95_ms": round(result["latency_ms"]["p95"] - before["latency_ms"]["p95"], 3),
+            "p99_ms": round(result["latency_ms"]["p99"] - before["latency_ms"]["p99"], 3),
+            "qps": round(result["qps"] - before["qps"], 1)
+        }
+    return {"baseline": baseline_path, "baseline_commit": baseline.get("git_commit"), "deltas": deltas}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark RAG retrieval latency and recall (in-memory Qdrant, fake embedder)")
+    parser.add_argument("--docs", type=int, default=1000, help="จำนวนเอกสารสังเคราะห์")
+    parser.add_argument("--chunk-size", type=int, default=settings.rag_chunk_size)
+    parser.add_argument("--chunk-overlap", type=int, default=settings.rag_chunk_overlap)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", nargs="+", type=int, default=[settings.rag_top_k])
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--hybrid", action="store_true", help="เปิด BM25 + vector (RRF)")
+    parser.add_argument("--embedding-cache", action="store_true", help="เปิด embedding cache ในหน่วยความจำ")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--verbose", action="store_true", help="แสดง log ของ RAGService ระหว่างวัด")
+    parser.add_argument("--compare", help="ไฟล์ JSON ผลรอบก่อนสำหรับเทียบ")
+    parser.add_argument("--output", help="บันทึกผลเป็น JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(run_benchmark(args))
+    if args.compare:
+        report["comparison"] = compare(report, args.compare)
+    print(json.dumps(report, indent=2, ensure_ascii=False))
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\n💾 Saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
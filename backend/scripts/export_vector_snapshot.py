@@ -0,0 +1,46 @@
+"""
+Export snapshot ของ collection ใน Qdrant สำหรับ local vector index
+(ใช้เป็น fallback เมื่อ Qdrant ล่ม หรือเป็น index หลักเมื่อตั้ง LOCAL_INDEX_MODE=primary)
+
+ใช้งาน:
+    python scripts/export_vector_snapshot.py
+    python scripts/export_vector_snapshot.py --output data/index/tax_knowledge
+"""
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+# เพิ่ม path เพื่อ import modules
+sys.path.append(str(Path(__file__).parent.parent))
+
+from app.config import settings
+from app.services.embedding_provider import create_embeddings
+from app.services.local_index import export_snapshot
+from app.services.qdrant_pool import get_async_qdrant_client, close_async_qdrant_client
+
+
+async def export(output: str) -> dict:
+    try:
+        return await export_snapshot(
+            get_async_qdrant_client(),
+            settings.qdrant_collection_name,
+            output,
+            model=create_embeddings().model
+        )
+    finally:
+        await close_async_qdrant_client()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export Qdrant collection to a local vector snapshot")
+    parser.add_argument("--output", default=settings.local_index_path)
+    args = parser.parse_args()
+
+    meta = asyncio.run(export(args.output))
+    print(f"✓ Exported {meta['count']} points ({meta['dim']} dims, hnsw={meta['hnsw']}) to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,133 +1,409 @@
 """
 สคริปต์สำหรับยัดข้อมูลเข้า Qdrant Vector Database
+
+ทำงานแบบ incremental: chunk มี ID ตายตัวจาก (ชื่อไฟล์, hash ของเนื้อหา)
+chunk ที่มีอยู่แล้วจะไม่ถูก embed ซ้ำ chunk ใหม่/ที่แก้ถูก upsert และ chunk ที่หายไปถูกลบ
+(upsert ก่อนลบ ระหว่าง ingest จึงไม่มีช่วงที่ collection ว่าง)
+เอกสารไหลผ่าน load → split → embed → upsert ทีละส่วนผ่าน queue จำกัดขนาด หน่วยความจำจึงคงที่
+สิ่งที่ ingest แล้วบันทึกไว้ใน manifest (settings.ingest_manifest_path)
+
+ใช้งาน:
+    python scripts/ingest_data.py            # incremental
+    python scripts/ingest_data.py --rebuild  # ลบ collection แล้วสร้างใหม่ทั้งหมด
 """
 
+import argparse
+import asyncio
+import hashlib
+import json
 import sys
 import os
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Iterable, Iterator, Optional
 
 # เพิ่ม path เพื่อ import modules
 sys.path.append(str(Path(__file__).parent.parent))
 
-from langchain_openai import OpenAIEmbeddings
-from langchain_community.vectorstores import Qdrant
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from langchain_core.documents import Document
-from qdrant_client import QdrantClient
-from qdrant_client.models import Distance, VectorParams
+from qdrant_client.models import PointIdsList, PointStruct
 from app.config import settings
+from app.services.collection_config import build_collection_kwargs
+from app.services.embedding_provider import create_embeddings, embedding_dimension
+from app.services.embedding_pipeline import EmbeddingPipeline
+from app.services.local_index import export_snapshot
+from app.services.pdf_loader import create_pdf_executor, iter_pdf_documents
+from app.services.lexical_index import LexicalIndex
+from app.services.qdrant_pool import get_async_qdrant_client, close_async_qdrant_client
 import glob
 
+# namespace คงที่สำหรับ uuid5 ของ chunk (ห้ามเปลี่ยน ไม่เช่นนั้น ID ของทุก chunk จะเปลี่ยน)
+CHUNK_ID_NAMESPACE = uuid.UUID("6f1c2a0e-9b7d-5e43-8a11-3c5d7e9f0b24")
+
+MANIFEST_VERSION = 1
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_id(source: str, text: str) -> str:
+    """ID ของ chunk จากชื่อไฟล์ + hash ของเนื้อหา (เนื้อหาเดิม → ID เดิม)"""
+    return str(uuid.uuid5(CHUNK_ID_NAMESPACE, f"{source}\n{content_hash(text)}"))
+
+
+def load_manifest(path: str) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            manifest = json.load(f)
+        return manifest if manifest.get("version") == MANIFEST_VERSION else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_manifest(path: str, manifest: dict):
+    """เขียน manifest แบบ atomic (เขียนไฟล์ชั่วคราวแล้ว rename)"""
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+async def run_stages(*stages):
+    """
+    รันทุกขั้นของ pipeline พร้อมกัน ถ้าขั้นใดล้มให้ยกเลิกขั้นที่เหลือ (ไม่ค้างรอ queue ที่ไม่มีใครอ่าน)
+    
+    Returns:
+        ผลของแต่ละขั้นตามลำดับ
+    """
+    tasks = [asyncio.create_task(stage) for stage in stages]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+
 class DataIngestor:
     """
     จัดการการยัดข้อมูลเข้า Vector Database
     """
     
     def __init__(self):
-        self.qdrant_client = QdrantClient(url=settings.qdrant_url)
-        self.embeddings = OpenAIEmbeddings(
-            openai_api_key=settings.openai_api_key
-        )
+        # ใช้ AsyncQdrantClient ตัวเดียวกับฝั่ง API (connection pool / gRPC ตาม Settings)
+        self.qdrant_client = get_async_qdrant_client()
+        self.embeddings = create_embeddings()
+        # embed แบบ batch พร้อมกันภายใต้ rate limit + checkpoint (รันใหม่แล้วทำต่อจากที่ค้าง)
+        self.embedding_pipeline = EmbeddingPipeline(self.embeddings)
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=settings.rag_chunk_size,
             chunk_overlap=settings.rag_chunk_overlap,
             separators=["\n\n", "\n", ". ", " ", ""]
         )
     
-    def load_documents_from_directory(self, directory: str) -> list[Document]:
-        """
-        โหลดเอกสารจาก directory
+    def iter_text_documents(self, paths: list[str], failed: Optional[list[str]] = None) -> Iterator[Document]:
         """
-        documents = []
+        โหลดไฟล์ .txt ทีละไฟล์ (Document ต่อไฟล์)
         
-        # หาไฟล์ .txt ทั้งหมด
-        txt_files = glob.glob(f"{directory}/*.txt")
-        
-        print(f"Found {len(txt_files)} text files")
-        
-        for file_path in txt_files:
+        Args:
+            failed: รับ path ของไฟล์ที่อ่านไม่สำเร็จ (sync_to_qdrant จะไม่ลบ chunk เดิมของไฟล์เหล่านี้)
+        """
+        for file_path in paths:
             try:
                 with open(file_path, 'r', encoding='utf-8') as f:
                     content = f.read()
-                    
-                # สร้าง Document object
-                doc = Document(
-                    page_content=content,
-                    metadata={
-                        "source": os.path.basename(file_path),
-                        "file_path": file_path
-                    }
-                )
-                documents.append(doc)
-                print(f"✓ Loaded: {os.path.basename(file_path)}")
-                
             except Exception as e:
                 print(f"✗ Error loading {file_path}: {e}")
+                if failed is not None:
+                    failed.append(file_path)
+                continue
+            
+            print(f"✓ Loaded: {os.path.basename(file_path)}")
+            yield Document(
+                page_content=content,
+                metadata={
+                    "source": os.path.basename(file_path),
+                    "file_path": file_path,
+                    "file_hash": content_hash(content)
+                }
+            )
+    
+    def iter_documents(
+        self,
+        txt_files: list[str],
+        pdf_files: list[str],
+        failed: Optional[list[str]] = None,
+        pdf_executor: Optional[ProcessPoolExecutor] = None
+    ) -> Iterator[Document]:
+        """
+        เอกสารทั้งหมดแบบ stream: ไฟล์ .txt แล้วตามด้วย PDF (Document ต่อหน้า มีเลขหน้าใน metadata)
         
-        return documents
+        PDF ดึงข้อความด้วย process pool และใช้ cache ตาม hash ของไฟล์ (ดู app/services/pdf_loader.py)
+        
+        Args:
+            failed: รับ path ของไฟล์ที่โหลดไม่สำเร็จ (ส่งต่อให้ sync_to_qdrant)
+            pdf_executor: process pool จาก create_pdf_executor (None = iter_pdf_documents สร้างเอง)
+        """
+        yield from self.iter_text_documents(txt_files, failed)
+        yield from iter_pdf_documents(pdf_files, failed=failed, executor=pdf_executor)
     
-    def split_documents(self, documents: list[Document]) -> list[Document]:
+    def split_document(self, document: Document) -> list[Document]:
         """
-        แบ่งเอกสารเป็น chunks เล็กๆ
+        แบ่งเอกสารหนึ่งตัวเป็น chunks เล็กๆ
         """
-        print(f"\nSplitting {len(documents)} documents into chunks...")
-        chunks = self.text_splitter.split_documents(documents)
-        print(f"✓ Created {len(chunks)} chunks")
+        chunks = self.text_splitter.split_documents([document])
+        for chunk in chunks:
+            chunk.metadata["content_hash"] = content_hash(chunk.page_content)
         return chunks
     
-    def create_collection(self):
+    async def ensure_collection(self, rebuild: bool = False) -> int:
+        """
+        ใช้ collection เดิมถ้าขนาด vector ตรงกับ embedding provider ไม่เช่นนั้นสร้างใหม่
+        
+        Returns:
+            ขนาด vector
+        """
+        vector_size = await asyncio.to_thread(embedding_dimension, self.embeddings)
+        if not rebuild and await self.qdrant_client.collection_exists(settings.qdrant_collection_name):
+            collection = await self.qdrant_client.get_collection(settings.qdrant_collection_name)
+            if collection.config.params.vectors.size == vector_size:
+                print(f"✓ Using existing collection: {settings.qdrant_collection_name} "
+                      f"({collection.points_count} points)")
+                return vector_size
+            print(f"⚠️ Vector size changed ({collection.config.params.vectors.size} → {vector_size}) - rebuilding")
+        await self.create_collection(vector_size)
+        return vector_size
+    
+    async def create_collection(self, vector_size: int):
         """
         สร้าง Collection ใน Qdrant
         """
         try:
             # ลบ collection เดิม (ถ้ามี)
             try:
-                self.qdrant_client.delete_collection(
+                await self.qdrant_client.delete_collection(
                     collection_name=settings.qdrant_collection_name
                 )
                 print(f"Deleted existing collection: {settings.qdrant_collection_name}")
             except:
                 pass
             
-            # สร้าง collection ใหม่
-            self.qdrant_client.create_collection(
+            # สร้าง collection ใหม่ (ขนาด vector ตาม embedding provider)
+            await self.qdrant_client.create_collection(
                 collection_name=settings.qdrant_collection_name,
-                vectors_config=VectorParams(
-                    size=1536,
-                    distance=Distance.COSINE
-                )
+                **build_collection_kwargs(vector_size)
             )
-            print(f"✓ Created collection: {settings.qdrant_collection_name}")
+            print(f"✓ Created collection: {settings.qdrant_collection_name} ({vector_size} dims, "
+                  f"quantization={settings.qdrant_quantization}, on_disk={settings.qdrant_on_disk_vectors})")
             
         except Exception as e:
             print(f"Error creating collection: {e}")
             raise
     
-    def ingest_to_qdrant(self, chunks: list[Document]):
+    async def existing_point_ids(self) -> set[str]:
+        """ID ของ point ทั้งหมดใน collection (ไม่ดึง vector/payload)"""
+        ids = set()
+        offset = None
+        while True:
+            records, offset = await self.qdrant_client.scroll(
+                collection_name=settings.qdrant_collection_name,
+                limit=1000,
+                offset=offset,
+                with_payload=False,
+                with_vectors=False
+            )
+            ids.update(str(record.id) for record in records)
+            if offset is None:
+                return ids
+    
+    async def sync_to_qdrant(
+        self,
+        documents: Iterable[Document],
+        manifest: dict,
+        failed_paths: Optional[list[str]] = None
+    ) -> dict:
         """
-        ยัดข้อมูลเข้า Qdrant
+        ทำให้ collection ตรงกับ documents: embed + upsert เฉพาะ chunk ที่ยังไม่มี แล้วลบ chunk ที่หายไป
+        
+        ทำงานเป็น pipeline 4 ขั้น (load → split → embed → upsert) ที่ต่อกันด้วย queue จำกัดขนาด
+        embed จึงเริ่มทันทีที่มี chunk แรก ขนานไปกับการอ่านไฟล์/แบ่ง chunk
+        และหน่วยความจำไม่โตตามขนาด corpus (เก็บไว้ตลอดทางแค่ ID ของ chunk)
+        
+        ถ้าโมเดล embedding ต่างจากใน manifest จะ embed ใหม่ทุก chunk (vector เดิมใช้ร่วมกันไม่ได้)
+        
+        Args:
+            failed_paths: ไฟล์ที่โหลดไม่สำเร็จในรอบนี้ (เติมระหว่างอ่าน documents)
+                chunk เดิมของไฟล์เหล่านี้ตาม manifest ไม่ถูกลบ และ entry ใน manifest คงเดิม
+                (อ่านไม่ได้ชั่วคราว เช่น สิทธิ์/encoding/ไฟล์กำลังถูกเขียน ไม่ได้แปลว่าไฟล์ถูกลบ)
+        
+        Returns:
+            manifest ใหม่
         """
-        print(f"\nIngesting {len(chunks)} chunks to Qdrant...")
+        existing = await self.existing_point_ids()
+        reusable = existing
+        if manifest and manifest.get("model") != self.embeddings.model:
+            print(f"⚠️ Embedding model changed ({manifest.get('model')} → {self.embeddings.model}) - re-embedding all chunks")
+            reusable = set()
         
-        try:
-            Qdrant.from_documents(
-                chunks,
-                self.embeddings,
-                url=settings.qdrant_url,
-                collection_name=settings.qdrant_collection_name,
+        pipeline = self.embedding_pipeline
+        print("\nStreaming chunks to Qdrant...")
+        print(f"  batch {pipeline.batch_size}, concurrency {pipeline.concurrency}, "
+              f"queue {settings.ingest_queue_size}, "
+              f"limit {settings.ingest_embedding_tokens_per_minute or 'unlimited'} tokens/min")
+        
+        document_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.ingest_queue_size)
+        chunk_queue: asyncio.Queue = asyncio.Queue(maxsize=settings.ingest_queue_size)
+        upsert_queue: asyncio.Queue = asyncio.Queue(maxsize=pipeline.concurrency)
+        seen: set[str] = set()
+        files: dict[str, dict] = {}
+        upserted = 0
+        started = time.perf_counter()
+        
+        async def load():
+            # generator อ่านไฟล์/แกะ PDF แบบ blocking จึงดึงทีละตัวใน thread
+            iterator = iter(documents)
+            while (document := await asyncio.to_thread(next, iterator, None)) is not None:
+                await document_queue.put(document)
+            await document_queue.put(None)
+        
+        async def split():
+            while (document := await document_queue.get()) is not None:
+                for chunk in await asyncio.to_thread(self.split_document, document):
+                    source = chunk.metadata["source"]
+                    point_id = chunk_id(source, chunk.page_content)
+                    entry = files.setdefault(source, {"file_hash": chunk.metadata.get("file_hash"), "chunk_ids": []})
+                    if point_id not in entry["chunk_ids"]:
+                        entry["chunk_ids"].append(point_id)
+                    if point_id in seen:
+                        continue
+                    seen.add(point_id)
+                    if point_id not in reusable:
+                        await chunk_queue.put((point_id, chunk))
+            await chunk_queue.put(None)
+        
+        async def new_chunks():
+            while (item := await chunk_queue.get()) is not None:
+                yield item
+        
+        async def embed():
+            stats = await pipeline.run(
+                new_chunks(),
+                lambda batch, vectors: upsert_queue.put((batch, vectors))
             )
-            print(f"✓ Successfully ingested all chunks!")
-            
+            await upsert_queue.put(None)
+            return stats
+        
+        async def upsert():
+            nonlocal upserted
+            while (item := await upsert_queue.get()) is not None:
+                batch, vectors = item
+                await self.qdrant_client.upsert(
+                    collection_name=settings.qdrant_collection_name,
+                    points=[
+                        PointStruct(
+                            id=point_id,
+                            vector=vector,
+                            payload={"page_content": chunk.page_content, "metadata": chunk.metadata}
+                        )
+                        for (point_id, chunk), vector in zip(batch, vectors)
+                    ]
+                )
+                upserted += len(batch)
+                elapsed = time.perf_counter() - started
+                print(f"  ✓ {upserted} chunks upserted ({upserted / elapsed:.1f} chunks/s)")
+        
+        try:
+            _, _, stats, _ = await run_stages(load(), split(), embed(), upsert())
         except Exception as e:
             print(f"Error ingesting data: {e}")
             raise
+        
+        if stats["chunks"]:
+            print(f"✓ Successfully ingested all chunks! {stats['chunks']} chunks in {stats['seconds']}s "
+                  f"({stats['chunks_per_second']} chunks/s, {stats['resumed_from_checkpoint']} from checkpoint, "
+                  f"{stats['rate_limit_wait_seconds']}s waiting for rate limit)")
+        else:
+            print("✓ Nothing to embed - collection is up to date")
+        
+        previous_files = manifest.get("files", {})
+        failed_sources = {os.path.basename(path) for path in failed_paths or []}
+        kept_ids: set[str] = set()
+        for source in failed_sources:
+            if source in previous_files:
+                files[source] = previous_files[source]
+                kept_ids.update(previous_files[source]["chunk_ids"])
+        if failed_sources:
+            print(f"⚠️ {len(failed_sources)} files failed to load - keeping their {len(kept_ids)} indexed chunks")
+        
+        # ลบหลัง upsert ครบ ระหว่าง ingest จึงไม่มีช่วงที่ collection ว่าง
+        removed_ids = list(existing - seen - kept_ids)
+        if removed_ids:
+            await self.qdrant_client.delete(
+                collection_name=settings.qdrant_collection_name,
+                points_selector=PointIdsList(points=removed_ids)
+            )
+            print(f"✓ Deleted {len(removed_ids)} stale chunks")
+        self.embedding_pipeline.clear_checkpoint()
+        
+        changed = [source for source, entry in files.items()
+                   if previous_files.get(source, {}).get("file_hash") != entry["file_hash"]]
+        deleted = [source for source in previous_files if source not in files]
+        print(f"Files: {len(files)} total, {len(changed)} new/changed, {len(deleted)} removed")
+        print(f"Chunks: {len(seen) - stats['chunks']} unchanged, {stats['chunks']} embedded, "
+              f"{len(removed_ids)} deleted")
+        
+        return {
+            "version": MANIFEST_VERSION,
+            "collection": settings.qdrant_collection_name,
+            "model": self.embeddings.model,
+            "chunk_size": settings.rag_chunk_size,
+            "chunk_overlap": settings.rag_chunk_overlap,
+            "points": len(seen | kept_ids),
+            "updated_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "files": files
+        }
+    
+    async def build_lexical_index(self):
+        """
+        สร้าง BM25 index (ตัดคำ newmm) จาก chunk ทั้งหมดใน collection สำหรับ hybrid search
+        
+        อ่านจาก Qdrant หลัง sync เสร็จ pipeline จึงไม่ต้องเก็บ chunk ทั้งหมดไว้
+        (ตัว index เองต้องครอบคลุมทั้ง corpus อยู่แล้ว)
+        """
+        chunks = []
+        offset = None
+        while True:
+            records, offset = await self.qdrant_client.scroll(
+                collection_name=settings.qdrant_collection_name,
+                limit=1000,
+                offset=offset,
+                with_payload=True,
+                with_vectors=False
+            )
+            chunks.extend(
+                Document(page_content=record.payload["page_content"], metadata=record.payload.get("metadata") or {})
+                for record in records
+            )
+            if offset is None:
+                break
+        index = LexicalIndex.build(chunks)
+        index.save(settings.lexical_index_path)
+        stats = index.stats()
+        print(f"✓ Lexical index: {stats['documents']} chunks, {stats['terms']} terms "
+              f"({stats['tokenizer']}) → {settings.lexical_index_path}")
     
-    def verify_ingestion(self):
+    async def verify_ingestion(self):
         """
         ตรวจสอบว่าข้อมูลถูกยัดเข้าไปแล้ว
         """
         try:
-            collection_info = self.qdrant_client.get_collection(
+            collection_info = await self.qdrant_client.get_collection(
                 collection_name=settings.qdrant_collection_name
             )
             print(f"\n✓ Collection Info:")
@@ -136,8 +412,20 @@ class DataIngestor:
             
         except Exception as e:
             print(f"Error verifying ingestion: {e}")
+    
+    async def export_local_snapshot(self):
+        """
+        Export vector + payload เป็น snapshot สำหรับ local vector index ของ API
+        """
+        meta = await export_snapshot(
+            self.qdrant_client,
+            settings.qdrant_collection_name,
+            settings.local_index_path,
+            model=self.embeddings.model
+        )
+        print(f"✓ Exported {meta['count']} points to {settings.local_index_path}")
 
-def main():
+async def main(rebuild: bool = False):
     """
     Main function
     """
@@ -145,57 +433,82 @@ def main():
     print("AI Tax Advisor - Data Ingestion")
     print("=" * 60)
     
-    # Path ไปยัง data directory
+    # Path ไปยัง data directory (.txt) และเอกสารต้นฉบับ PDF ที่ root ของ repo
     data_dir = Path(__file__).parent.parent / "data" / "tax_knowledge"
+    pdf_dir = Path(__file__).parent.parent.parent / "Tax_document"
     
-    if not data_dir.exists():
+    if not data_dir.exists() and not pdf_dir.exists():
         print(f"\nError: Directory not found: {data_dir}")
         print("Please create the directory and add .txt files")
         return
     
     print(f"\nData directory: {data_dir}")
+    print(f"PDF directory: {pdf_dir}")
     
     # Initialize Ingestor
     ingestor = DataIngestor()
     
-    # Step 1: Load documents
-    print("\n" + "=" * 60)
-    print("STEP 1: Loading documents")
-    print("=" * 60)
-    documents = ingestor.load_documents_from_directory(str(data_dir))
+    txt_files = sorted(glob.glob(f"{data_dir}/*.txt"))
+    pdf_files = sorted(glob.glob(f"{pdf_dir}/*.pdf"))
+    print(f"Found {len(txt_files)} text files, {len(pdf_files)} PDF files")
     
-    if not documents:
+    if not txt_files and not pdf_files:
         print("\nNo documents found! Please add .txt files to:")
         print(f"  {data_dir}")
+        print(f"or PDF files to:\n  {pdf_dir}")
         return
     
-    # Step 2: Split into chunks
+    # Step 1: Create collection (ถ้ายังไม่มี / ขนาด vector เปลี่ยน / --rebuild)
     print("\n" + "=" * 60)
-    print("STEP 2: Splitting documents")
+    print("STEP 1: Preparing Qdrant collection")
     print("=" * 60)
-    chunks = ingestor.split_documents(documents)
+    await ingestor.ensure_collection(rebuild=rebuild)
     
-    # Step 3: Create collection
+    # Step 2-4: Load → split → embed → upsert แบบ streaming (เฉพาะ chunk ที่เปลี่ยน)
     print("\n" + "=" * 60)
-    print("STEP 3: Creating Qdrant collection")
+    print("STEP 2-4: Loading, splitting and syncing chunks to Qdrant")
     print("=" * 60)
-    ingestor.create_collection()
+    manifest = {} if rebuild else load_manifest(settings.ingest_manifest_path)
+    failed: list[str] = []
+    # สร้าง process pool ที่นี่ครั้งเดียว (ไม่ใช่ใน thread ของขั้น load ทุกครั้งที่เรียก)
+    pdf_executor = create_pdf_executor() if pdf_files else None
+    try:
+        manifest = await ingestor.sync_to_qdrant(
+            ingestor.iter_documents(txt_files, pdf_files, failed, pdf_executor),
+            manifest,
+            failed_paths=failed
+        )
+    finally:
+        if pdf_executor is not None:
+            pdf_executor.shutdown(cancel_futures=True)
+    save_manifest(settings.ingest_manifest_path, manifest)
+    print(f"✓ Manifest: {settings.ingest_manifest_path}")
     
-    # Step 4: Ingest data
-    print("\n" + "=" * 60)
-    print("STEP 4: Ingesting data to Qdrant")
-    print("=" * 60)
-    ingestor.ingest_to_qdrant(chunks)
+    if settings.hybrid_search_enabled:
+        print("\nBuilding lexical (BM25) index...")
+        await ingestor.build_lexical_index()
     
     # Step 5: Verify
     print("\n" + "=" * 60)
     print("STEP 5: Verification")
     print("=" * 60)
-    ingestor.verify_ingestion()
+    await ingestor.verify_ingestion()
+    
+    # Step 6: Local snapshot
+    if settings.local_index_mode != "off":
+        print("\n" + "=" * 60)
+        print("STEP 6: Exporting local vector snapshot")
+        print("=" * 60)
+        await ingestor.export_local_snapshot()
     
     print("\n" + "=" * 60)
     print("✓ Data ingestion completed successfully!")
     print("=" * 60)
+    
+    await close_async_qdrant_client()
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Ingest tax knowledge into Qdrant (incremental)")
+    parser.add_argument("--rebuild", action="store_true", help="ลบ collection แล้ว embed ใหม่ทั้งหมด")
+    args = parser.parse_args()
+    asyncio.run(main(rebuild=args.rebuild))
\ No newline at end of file
@@ -0,0 +1,157 @@
+"""
+Load Test สำหรับ /api/calculate-tax
+ยิง request พร้อมกันหลาย client แล้ววัด throughput และ latency
+
+ใช้เปรียบเทียบก่อน/หลังการเปลี่ยนแปลง:
+    python scripts/load_test.py --label before --output before.json
+    (อัปเดตโค้ดแล้วรีสตาร์ท server)
+    python scripts/load_test.py --label after --output after.json
+    python scripts/load_test.py --compare before.json after.json
+"""
+
+import argparse
+import asyncio
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+import httpx
+
+
+# Payload ตัวอย่าง (รายได้ต่างกันเล็กน้อยเพื่อไม่ให้ cache ฝั่ง server ช่วย)
+BASE_PAYLOAD = {
+    "gross_income": 1200000,
+    "income_type": "40(1)",
+    "personal_deduction": 60000,
+    "child_deduction": 30000,
+    "parent_support": 60000,
+    "life_insurance": 20000,
+    "health_insurance": 15000,
+    "social_security": 9000,
+    "provident_fund": 60000,
+    "risk_tolerance": "medium"
+}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    """หาค่า percentile แบบ nearest-rank"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+
+async def run_load_test(
+    url: str,
+    concurrency: int,
+    total_requests: int,
+    timeout: float,
+    unique_payloads: bool
+) -> Dict[str, Any]:
+    """ยิง request ทั้งหมดด้วย client พร้อมกัน `concurrency` ตัว"""
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    counter = iter(range(total_requests))
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+
+        async def worker():
+            for i in counter:
+                payload = dict(BASE_PAYLOAD)
+                if unique_payloads:
+                    payload["gross_income"] += i
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, json=payload)
+                    if response.status_code == 200:
+                        latencies.append(time.perf_counter() - started)
+                    else:
+                        key = f"HTTP {response.status_code}"
+                        errors[key] = errors.get(key, 0) + 1
+                except Exception as e:
+                    key = type(e).__name__
+                    errors[key] = errors.get(key, 0) + 1
+
+        started_all = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started_all
+
+    return {
+        "url": url,
+        "concurrency": concurrency,
+        "total_requests": total_requests,
+        "successful": len(latencies),
+        "errors": errors,
+        "elapsed_seconds": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 3) if elapsed > 0 else 0.0,
+        "latency_seconds": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(max(latencies), 3) if latencies else 0.0
+        }
+    }
+
+
+def print_report(label: str, report: Dict[str, Any]):
+    """แสดงผลสรุป"""
+    latency = report["latency_seconds"]
+    print(f"\n📊 [{label}] {report['successful']}/{report['total_requests']} OK "
+          f"@ {report['concurrency']} concurrent clients")
+    print(f"   Throughput: {report['throughput_rps']} req/s (elapsed {report['elapsed_seconds']} s)")
+    print(f"   Latency p50={latency['p50']} s  p95={latency['p95']} s  "
+          f"p99={latency['p99']} s  max={latency['max']} s")
+    if report["errors"]:
+        print(f"   Errors: {report['errors']}")
+
+
+def compare_reports(before_path: str, after_path: str):
+    """เปรียบเทียบผลก่อน/หลัง"""
+    before = json.loads(Path(before_path).read_text(encoding="utf-8"))
+    after = json.loads(Path(after_path).read_text(encoding="utf-8"))
+    print_report(before.get("label", "before"), before)
+    print_report(after.get("label", "after"), after)
+    if before["throughput_rps"] > 0:
+        speedup = after["throughput_rps"] / before["throughput_rps"]
+        print(f"\n🚀 Throughput change: x{speedup:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /api/calculate-tax")
+    parser.add_argument("--url", default="http://localhost:8000/api/calculate-tax")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--same-payload", action="store_true",
+                        help="ส่ง payload เดียวกันทุก request (ค่าเริ่มต้นคือเปลี่ยนรายได้ทีละ 1 บาท)")
+    parser.add_argument("--label", default="run")
+    parser.add_argument("--output", help="บันทึกผลเป็น JSON")
+    parser.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"),
+                        help="เปรียบเทียบไฟล์ผลลัพธ์ 2 ไฟล์")
+    args = parser.parse_args()
+
+    if args.compare:
+        compare_reports(*args.compare)
+        return
+
+    print(f"🔥 Load testing {args.url} with {args.concurrency} clients, {args.requests} requests")
+    report = asyncio.run(run_load_test(
+        args.url,
+        args.concurrency,
+        args.requests,
+        args.timeout,
+        unique_payloads=not args.same_payload
+    ))
+    report["label"] = args.label
+    print_report(args.label, report)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+        print(f"\n💾 Saved: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,16 @@
+"""
+ตั้งค่าสำหรับ tests: ไม่เชื่อมต่อ OpenAI/Qdrant และไม่เขียน cache ลงดิสก์
+(ต้องตั้ง environment ก่อน import app.config)
+"""
+
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+os.environ.setdefault("OPENAI_API_KEY", "test-key")
+os.environ.setdefault("EMBEDDING_CACHE_PATH", "")
+os.environ.setdefault("RESPONSE_CACHE_ENABLED", "false")
+os.environ.setdefault("SEMANTIC_CACHE_ENABLED", "false")
+os.environ.setdefault("LOCAL_INDEX_MODE", "off")
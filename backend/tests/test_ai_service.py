@@ -0,0 +1,79 @@
+"""
+AIService.stream_recommendations: client ที่อ่าน stream ช้าต้องไม่ถือ admission slot ของ LLM
+"""
+
+import asyncio
+import json
+from types import SimpleNamespace
+
+from app.models import TaxCalculationRequest
+from app.services.ai_service import AIService
+from app.services.tax_calculator import tax_calculator_service
+
+
+def _plan(plan_id: str) -> dict:
+    return {
+        "plan_id": plan_id,
+        "plan_name": f"แผน {plan_id}",
+        "plan_type": "conservative",
+        "description": "แผนจาก LLM จำลอง",
+        "total_investment": 100000,
+        "total_tax_saving": 0,
+        "overall_risk": "low",
+        "allocations": [{
+            "category": "RMF",
+            "percentage": 100,
+            "risk_level": "low",
+            "pros": ["ลดหย่อนภาษี"],
+            "cons": ["ถือครองระยะยาว"]
+        }]
+    }
+
+
+class FakeStreamingLLM:
+    """ส่ง JSON ของ 3 แผนทีละแผนเหมือน LLM ที่ทยอยตอบ"""
+
+    async def astream(self, prompt):
+        text = json.dumps({"plans": [_plan("1"), _plan("2"), _plan("3")]}, ensure_ascii=False)
+        step = len(text) // 3 + 1
+        for start in range(0, len(text), step):
+            await asyncio.sleep(0)
+            yield SimpleNamespace(content=text[start:start + step])
+
+
+def test_slow_stream_consumer_does_not_hold_admission_slot():
+    service = AIService()
+    service.llm = FakeStreamingLLM()
+    request = TaxCalculationRequest(gross_income=600000)
+    tax_result = tax_calculator_service.calculate_tax(request)
+
+    async def consume():
+        received = []
+        active_while_reading = []
+        async for plan, is_fallback in service.stream_recommendations(request, tax_result, ""):
+            received.append((plan["plan_id"], is_fallback))
+            # client อ่านช้า: ให้ LLM task ทำงานจนจบก่อนอ่านแผนถัดไป
+            await asyncio.sleep(0.05)
+            active_while_reading.append(service.admission.stats()["active"])
+        return received, active_while_reading
+
+    received, active_while_reading = asyncio.run(consume())
+
+    assert received == [("1", False), ("2", False), ("3", False)]
+    assert active_while_reading == [0, 0, 0]
+
+
+def test_consumer_disconnect_releases_slot():
+    service = AIService()
+    service.llm = FakeStreamingLLM()
+    request = TaxCalculationRequest(gross_income=600000)
+    tax_result = tax_calculator_service.calculate_tax(request)
+
+    async def disconnect_after_first_plan():
+        stream = service.stream_recommendations(request, tax_result, "")
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0)
+        return service.admission.stats()["active"]
+
+    assert asyncio.run(disconnect_after_first_plan()) == 0
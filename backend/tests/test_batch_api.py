@@ -0,0 +1,67 @@
+"""
+/api/calculate-tax/batch: รายการที่ไม่ผ่าน validation ต้องได้ error ของตัวเอง ไม่ทำให้ทั้ง batch ได้ 422
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+
+
+FAKE_PLANS = {
+    "plans": [{
+        "plan_id": "A",
+        "plan_name": "แผนทดสอบ",
+        "plan_type": "conservative",
+        "description": "แผนจาก LLM จำลอง",
+        "total_investment": 0,
+        "total_tax_saving": 0,
+        "overall_risk": "low",
+        "allocations": [{
+            "category": "RMF",
+            "percentage": 100,
+            "risk_level": "low",
+            "pros": ["ลดหย่อนภาษี"],
+            "cons": ["ถือครองระยะยาว"]
+        }]
+    }]
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    calls = []
+
+    async def generate_recommendations(request, tax_result, context):
+        calls.append(request.gross_income)
+        return {"plans": [dict(plan) for plan in FAKE_PLANS["plans"]]}
+
+    monkeypatch.setattr(main.ai_service, "generate_recommendations", generate_recommendations)
+    monkeypatch.setattr(main.rag_service, "is_available", lambda: False)
+    client = TestClient(main.app)
+    client.calls = calls
+    return client
+
+
+def test_invalid_item_fails_alone(client):
+    response = client.post("/api/calculate-tax/batch", json=[
+        {"gross_income": 600000},
+        {"gross_income": -1},
+        {"gross_income": 1200000, "rmf": 50000}
+    ])
+
+    assert response.status_code == 200
+    body = response.json()
+    assert [item["index"] for item in body["results"]] == [0, 1, 2]
+    assert [item["success"] for item in body["results"]] == [True, False, True]
+    assert body["succeeded"] == 2
+    assert body["failed"] == 1
+    assert "gross_income" in body["results"][1]["error"]
+    assert body["results"][1]["result"] is None
+    assert sorted(client.calls) == [600000, 1200000]
+
+
+def test_batch_too_large(client, monkeypatch):
+    monkeypatch.setattr(main.settings, "batch_max_items", 2)
+    response = client.post("/api/calculate-tax/batch", json=[{"gross_income": 600000}] * 3)
+    assert response.status_code == 400
@@ -0,0 +1,62 @@
+"""
+app/services/embedding_pipeline.py: rate limit ต้องนับ token ด้วย tokenizer ของโมเดล embedding
+"""
+
+import asyncio
+
+import pytest
+
+tiktoken = pytest.importorskip("tiktoken")
+
+from app.services import embedding_pipeline
+
+
+class FakeEncoding:
+    def encode_batch(self, texts):
+        return [[0] * len(text.split()) for text in texts]
+
+
+class FakeEmbeddings:
+    model = "text-embedding-3-small"
+
+    async def aembed_documents(self, texts):
+        return [[1.0, 0.0] for _ in texts]
+
+
+@pytest.fixture(autouse=True)
+def clear_encoding_cache():
+    embedding_pipeline._embedding_encoding.cache_clear()
+    yield
+    embedding_pipeline._embedding_encoding.cache_clear()
+
+
+def test_limiter_is_charged_with_embedding_model_tokens(monkeypatch):
+    requested = []
+    monkeypatch.setattr(tiktoken, "encoding_for_model", lambda model: requested.append(model) or FakeEncoding())
+    pipeline = embedding_pipeline.EmbeddingPipeline(FakeEmbeddings(), tokens_per_minute=600, checkpoint_path="")
+    charged = []
+
+    async def acquire(tokens):
+        charged.append(tokens)
+
+    pipeline.limiter.acquire = acquire
+    asyncio.run(pipeline._embed_batch(["ลดหย่อน ภาษี", "ThaiESG RMF SSF"]))
+
+    assert requested == ["text-embedding-3-small"]
+    assert charged == [5]
+
+
+def test_unknown_model_uses_cl100k_base(monkeypatch):
+    def unknown(model):
+        raise KeyError(model)
+
+    monkeypatch.setattr(tiktoken, "encoding_for_model", unknown)
+    monkeypatch.setattr(tiktoken, "get_encoding", lambda name: FakeEncoding() if name == "cl100k_base" else None)
+
+    assert embedding_pipeline.count_embedding_tokens(["a b c"], "local-model") == 3
+
+
+def test_fallback_estimate_does_not_undercount_thai(monkeypatch):
+    monkeypatch.setattr(embedding_pipeline, "_embedding_encoding", lambda model: None)
+
+    assert embedding_pipeline.count_embedding_tokens(["ลดหย่อนภาษี"], "text-embedding-3-small") == len("ลดหย่อนภาษี")
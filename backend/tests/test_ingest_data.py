@@ -0,0 +1,110 @@
+"""
+scripts/ingest_data.py: ไฟล์ที่โหลดไม่สำเร็จชั่วคราวต้องไม่ทำให้ chunk เดิมของไฟล์ถูกลบ
+"""
+
+import asyncio
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("langchain_text_splitters")
+
+from app.config import settings
+from app.services.qdrant_pool import create_async_qdrant_client
+
+
+SCRIPT_PATH = Path(__file__).resolve().parent.parent / "scripts" / "ingest_data.py"
+
+
+def _load_ingest_module():
+    spec = importlib.util.spec_from_file_location("ingest_data", SCRIPT_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+class FakeEmbeddings:
+    model = "fake-embedding"
+
+    def embed_query(self, text):
+        return [1.0, 0.0, 0.0, float(len(text))]
+
+    async def aembed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+@pytest.fixture
+def ingest(monkeypatch, tmp_path):
+    module = _load_ingest_module()
+    client = create_async_qdrant_client(location=":memory:")
+    monkeypatch.setattr(module, "get_async_qdrant_client", lambda: client)
+    monkeypatch.setattr(module, "create_embeddings", FakeEmbeddings)
+    monkeypatch.setattr(module, "embedding_dimension", lambda embeddings: 4)
+    monkeypatch.setattr(settings, "ingest_checkpoint_path", "")
+    monkeypatch.setattr(settings, "ingest_embedding_tokens_per_minute", 0)
+    return module, client
+
+
+def _write_corpus(directory: Path) -> list[str]:
+    paths = []
+    for name in ("deductions.txt", "pension.txt"):
+        path = directory / name
+        path.write_text("\n\n".join(f"{name} ย่อหน้าที่ {i}" for i in range(5)), encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+
+async def _sync(ingestor, paths, manifest):
+    failed = []
+    manifest = await ingestor.sync_to_qdrant(ingestor.iter_documents(paths, [], failed), manifest, failed_paths=failed)
+    return manifest, failed
+
+
+async def _point_ids(client) -> set:
+    records, _ = await client.scroll(settings.qdrant_collection_name, limit=1000)
+    return {str(record.id) for record in records}
+
+
+def test_points_of_file_that_fails_to_load_survive(ingest, tmp_path):
+    module, client = ingest
+    paths = _write_corpus(tmp_path)
+
+    async def run():
+        ingestor = module.DataIngestor()
+        await ingestor.ensure_collection(rebuild=True)
+        first, failed = await _sync(ingestor, paths, {})
+        assert failed == []
+        before = await _point_ids(client)
+
+        # pension.txt อ่านไม่ได้ชั่วคราว (encoding เสีย)
+        Path(paths[1]).write_bytes(b"\xff\xfe\x00broken")
+        second, failed = await _sync(ingestor, paths, first)
+        after = await _point_ids(client)
+        return first, second, failed, before, after
+
+    first, second, failed, before, after = asyncio.run(run())
+
+    assert failed == [paths[1]]
+    assert after == before
+    assert second["files"]["pension.txt"] == first["files"]["pension.txt"]
+    assert set(second["files"]["pension.txt"]["chunk_ids"]) <= after
+    assert second["points"] == first["points"]
+
+
+def test_deleted_file_points_are_removed(ingest, tmp_path):
+    module, client = ingest
+    paths = _write_corpus(tmp_path)
+
+    async def run():
+        ingestor = module.DataIngestor()
+        await ingestor.ensure_collection(rebuild=True)
+        first, _ = await _sync(ingestor, paths, {})
+        Path(paths[1]).unlink()
+        second, _ = await _sync(ingestor, paths[:1], first)
+        return first, second, await _point_ids(client)
+
+    first, second, after = asyncio.run(run())
+
+    assert "pension.txt" not in second["files"]
+    assert after == set(first["files"]["deductions.txt"]["chunk_ids"])
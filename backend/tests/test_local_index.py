@@ -0,0 +1,73 @@
+"""
+app/services/local_index.py: export ต้องสลับ snapshot ทั้งชุด และไม่โหลด HNSW graph ที่ไม่ตรงกับ matrix
+"""
+
+import asyncio
+import json
+
+from qdrant_client.models import Distance, PointStruct, VectorParams
+
+from app.services import local_index
+from app.services.qdrant_pool import create_async_qdrant_client
+
+
+COLLECTION = "snapshot_test"
+
+
+async def _export(path, vectors):
+    client = create_async_qdrant_client(location=":memory:")
+    await client.create_collection(COLLECTION, vectors_config=VectorParams(size=3, distance=Distance.COSINE))
+    await client.upsert(COLLECTION, points=[
+        PointStruct(id=i, vector=vector, payload={"page_content": f"doc-{i}", "metadata": {"i": i}})
+        for i, vector in enumerate(vectors)
+    ])
+    return await local_index.export_snapshot(client, COLLECTION, str(path), model="fake-embedding")
+
+
+def test_export_publishes_whole_version(tmp_path):
+    asyncio.run(_export(tmp_path, [[1, 0, 0], [0, 1, 0]]))
+    first = (tmp_path / local_index.CURRENT_LINK).resolve()
+    held = local_index.load_local_index(str(tmp_path), "fake-embedding")
+
+    asyncio.run(_export(tmp_path, [[0, 0, 1], [0, 1, 0], [1, 0, 0]]))
+    second = (tmp_path / local_index.CURRENT_LINK).resolve()
+    reloaded = local_index.load_local_index(str(tmp_path), "fake-embedding")
+
+    assert first != second
+    assert first.exists()
+    assert len(held) == 2
+    assert len(reloaded) == 3
+    assert reloaded.search_batch([[0, 0, 1]], k=1)[0][0].page_content == "doc-0"
+    assert not list(tmp_path.glob(".tmp-*"))
+
+
+def test_old_versions_are_pruned(tmp_path):
+    for _ in range(local_index.KEEP_VERSIONS + 2):
+        asyncio.run(_export(tmp_path, [[1, 0, 0]]))
+
+    versions = [p for p in tmp_path.iterdir() if p.name.startswith(local_index.VERSION_PREFIX)]
+    assert len(versions) == local_index.KEEP_VERSIONS
+    assert (tmp_path / local_index.CURRENT_LINK).resolve() in versions
+
+
+def test_stale_hnsw_graph_is_ignored(tmp_path, monkeypatch):
+    # layout เดิม: hnsw.bin จาก export ครั้งก่อนค้างอยู่ แต่ meta บอกว่า snapshot นี้ไม่มี graph
+    asyncio.run(_export(tmp_path, [[1, 0, 0], [0, 1, 0]]))
+    root = (tmp_path / local_index.CURRENT_LINK).resolve()
+    (root / local_index.HNSW_FILE).write_bytes(b"stale graph")
+    assert json.loads((root / local_index.META_FILE).read_text())["hnsw"] is False
+
+    monkeypatch.setattr(local_index, "_load_hnswlib", lambda: (_ for _ in ()).throw(AssertionError("loaded stale graph")))
+    index = local_index.load_local_index(str(tmp_path), "fake-embedding", use_hnsw=True)
+
+    assert index.stats()["search"] == "exact"
+
+
+def test_export_removes_legacy_flat_files(tmp_path):
+    (tmp_path / local_index.HNSW_FILE).write_bytes(b"stale graph")
+    (tmp_path / local_index.META_FILE).write_text("{}")
+
+    asyncio.run(_export(tmp_path, [[1, 0, 0]]))
+
+    assert not (tmp_path / local_index.HNSW_FILE).exists()
+    assert not (tmp_path / local_index.META_FILE).exists()
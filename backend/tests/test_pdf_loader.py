@@ -0,0 +1,49 @@
+"""
+app/services/pdf_loader.py: ไฟล์ที่อ่านไม่ได้หรือไม่มีข้อความต้องถูกรายงานกลับ ไม่ใช่หายไปเงียบ ๆ
+"""
+
+import pytest
+
+pypdf = pytest.importorskip("pypdf")
+
+from app.services.pdf_loader import create_pdf_executor, iter_pdf_documents
+
+
+def _blank_pdf(path):
+    writer = pypdf.PdfWriter()
+    writer.add_blank_page(width=595, height=842)
+    with open(path, "wb") as f:
+        writer.write(f)
+    return path
+
+
+def test_unreadable_pdf_is_reported(tmp_path):
+    blank = _blank_pdf(tmp_path / "blank.pdf")
+    broken = tmp_path / "broken.pdf"
+    broken.write_bytes(b"%PDF-1.4 not really a pdf")
+    missing = tmp_path / "missing.pdf"
+
+    failed = []
+    documents = list(iter_pdf_documents(
+        [str(blank), str(broken), str(missing)],
+        max_workers=1,
+        cache_dir="",
+        failed=failed
+    ))
+
+    # PDF ที่ไม่มีข้อความเลยนับเป็นไฟล์ที่ล้ม (incremental sync จึงไม่ลบ chunk เดิมของไฟล์)
+    assert documents == []
+    assert sorted(failed) == sorted([str(blank), str(broken), str(missing)])
+
+
+def test_shared_executor_is_left_open(tmp_path):
+    blank = _blank_pdf(tmp_path / "blank.pdf")
+    executor = create_pdf_executor(max_workers=1)
+    try:
+        for _ in range(2):
+            failed = []
+            assert list(iter_pdf_documents([str(blank)], cache_dir="", failed=failed, executor=executor)) == []
+            assert failed == [str(blank)]
+        assert executor.submit(sum, [1, 2]).result() == 3
+    finally:
+        executor.shutdown()
@@ -0,0 +1,63 @@
+"""
+app.main._get_semantic_plans: แผนจาก semantic cache ต้องถูกตรวจวงเงินตามรายได้ของ request ใหม่
+"""
+
+import app.main as main
+from app.models import TaxCalculationRequest
+from app.services.semantic_cache import SemanticPlanCache
+from app.services.tax_calculator import tax_calculator_service
+
+
+def _plan(pension_percentage: float) -> dict:
+    return {
+        "plan_id": "A",
+        "plan_name": "เน้นบำนาญ",
+        "plan_type": "conservative",
+        "description": "แผนทดสอบ",
+        "total_investment": 100000,
+        "total_tax_saving": 0,
+        "overall_risk": "low",
+        "allocations": [
+            {
+                "category": "ประกันบำนาญ",
+                "percentage": pension_percentage,
+                "risk_level": "low",
+                "pros": ["ลดหย่อนภาษี"],
+                "cons": ["ถอนก่อนกำหนดไม่ได้"]
+            },
+            {
+                "category": "RMF",
+                "percentage": 100 - pension_percentage,
+                "risk_level": "medium",
+                "pros": ["ลดหย่อนภาษี"],
+                "cons": ["ถือครองระยะยาว"]
+            }
+        ]
+    }
+
+
+def test_cached_pension_is_corrected_to_new_income_limit(monkeypatch):
+    cache = SemanticPlanCache(max_distance=0.03, max_entries=16, ttl_seconds=60)
+    monkeypatch.setattr(main, "semantic_cache", cache)
+
+    # 91,000 บาท อยู่ในวงเงินของรายได้ 610,000 (91,500) แต่เกินวงเงินของ 600,000 (90,000)
+    cached_for = TaxCalculationRequest(gross_income=610000)
+    cache.set(cached_for, {"plans": [_plan(91)]})
+
+    request = TaxCalculationRequest(gross_income=600000)
+    tax_result = tax_calculator_service.calculate_tax(request)
+    plans = main._get_semantic_plans(request, tax_result)
+
+    pension = plans["plans"][0]["allocations"][0]
+    assert pension["percentage"] == 90.0
+    assert pension["investment_amount"] == 90000
+
+    # entry ใน cache ไม่ถูกแก้ตาม request ก่อนหน้า
+    again = main._get_semantic_plans(cached_for, tax_calculator_service.calculate_tax(cached_for))
+    assert again["plans"][0]["allocations"][0]["percentage"] == 91
+
+
+def test_miss_returns_none(monkeypatch):
+    monkeypatch.setattr(main, "semantic_cache", SemanticPlanCache(0.03, 16, 60))
+    request = TaxCalculationRequest(gross_income=600000)
+    assert main._get_semantic_plans(request, tax_calculator_service.calculate_tax(request)) is None